@@ -0,0 +1,279 @@
+"""
+Backup completo da instância em um único arquivo ZIP.
+
+Conteúdo do arquivo:
+    board.json        versão e conteúdo do board
+    lists.ndjson      uma lista por linha
+    items.ndjson      um item por linha
+    photos.ndjson     uma foto por linha (metadados e variantes)
+    media/<nome>      os arquivos das fotos, originais e derivados, e as imagens
+                      embutidas no board (board/blobs/), com o nome do storage
+    manifest.json     formato e contagens, gravado por último
+
+A exportação escreve o ZIP aos poucos: as linhas vêm de querysets com
+.iterator() e os arquivos são lidos em blocos, então a memória não depende da
+quantidade de dados. O ZIP aceita membros de tamanho desconhecido em um stream
+sem seek, o que permite enviá-lo direto na resposta HTTP. No Postgres tudo é
+lido de um mesmo snapshot (REPEATABLE READ), então itens e listas são
+consistentes entre si mesmo com escritas durante a exportação.
+
+A importação restaura em uma instância sem listas nem fotos: as linhas entram
+com bulk_create em lotes, mantendo ids e datas, e os arquivos são copiados do
+ZIP para o storage em blocos. Se a importação falhar, os arquivos copiados
+até ali são removidos.
+"""
+import io
+import zipfile
+from contextlib import contextmanager
+
+import orjson
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from board.blobs import BLOB_DIR, referenced_blobs
+from board.buffer import readable_board, writable_board, commit_content
+from config.cache import bump
+from lists.models import List, Item
+from photos.models import Photo
+
+FORMAT_VERSION = 1
+MEDIA_PREFIX = 'media/'
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 1000
+# Diretórios do storage que o backup leva e aceita de volta
+MEDIA_DIRS = ('photos/', BLOB_DIR + '/')
+
+LIST_FIELDS = ('id', 'name', 'created_at', 'updated_at')
+ITEM_FIELDS = ('id', 'list_id', 'name', 'completed', 'position', 'created_at', 'updated_at')
+PHOTO_FIELDS = ('id', 'image', 'uploaded_at', 'variants', 'width', 'height', 'size', 'color', 'content_hash')
+TABLES = (
+    ('lists.ndjson', List, LIST_FIELDS),
+    ('items.ndjson', Item, ITEM_FIELDS),
+    ('photos.ndjson', Photo, PHOTO_FIELDS),
+)
+
+
+class BackupError(Exception):
+    pass
+
+
+class StreamSink(io.RawIOBase):
+    """Destino sem seek para o ZipFile: acumula o que foi escrito até `drain`"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+@contextmanager
+def snapshot():
+    """Todas as leituras da exportação enxergam o mesmo estado do banco"""
+    # Só no início da transação; dentro de outra (ex.: testes) vale o isolamento dela
+    repeatable = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if repeatable:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def photo_files(photo):
+    return [photo['image'], *(variant['name'] for variant in photo['variants'] or [])]
+
+
+def write_file(archive, storage_name, manifest):
+    """Copia um arquivo do storage para o ZIP, em blocos; retorna quantos foram copiados (0 ou 1)"""
+    try:
+        source = default_storage.open(storage_name, 'rb')
+    except OSError:
+        # Removido do storage depois do snapshot ou perdido: o backup vai sem ele
+        manifest["missing_files"] += 1
+        return 0
+    with source:
+        info = zipfile.ZipInfo(MEDIA_PREFIX + storage_name, timezone.now().timetuple()[:6])
+        # Imagens já são comprimidas
+        info.compress_type = zipfile.ZIP_STORED
+        info.file_size = source.size
+        with archive.open(info, 'w') as member:
+            for chunk in source.chunks(CHUNK_SIZE):
+                member.write(chunk)
+                yield
+    return 1
+
+
+def write_archive(archive, manifest):
+    """
+    Escreve o backup em `archive` (um ZipFile aberto para escrita) e preenche
+    `manifest`. É um gerador: cede o controle a cada lote de linhas e a cada
+    bloco de arquivo, para quem transmite o ZIP enviar o que já foi escrito.
+    """
+    manifest.update(format=FORMAT_VERSION, created_at=timezone.now().isoformat(), missing_files=0)
+    with snapshot():
+        board = readable_board()
+        archive.writestr('board.json', orjson.dumps({"version": board.version, "content": board.content}))
+        yield
+
+        for name, model, fields in TABLES:
+            count = 0
+            with archive.open(name, 'w', force_zip64=True) as member:
+                for row in model.objects.order_by('id').values(*fields).iterator(chunk_size=BATCH_SIZE):
+                    member.write(orjson.dumps(row) + b'\n')
+                    count += 1
+                    if count % BATCH_SIZE == 0:
+                        yield
+            manifest[name.split('.')[0]] = count
+            yield
+
+        files = 0
+        for photo in Photo.objects.order_by('id').values('image', 'variants').iterator(chunk_size=BATCH_SIZE):
+            for storage_name in photo_files(photo):
+                files += yield from write_file(archive, storage_name, manifest)
+        # As imagens embutidas no board, referenciadas pelas URLs do conteúdo
+        for storage_name in sorted(set(referenced_blobs(board.content))):
+            files += yield from write_file(archive, storage_name, manifest)
+        manifest["files"] = files
+
+    archive.writestr('manifest.json', orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+
+
+def export_to_file(file):
+    """Grava o backup em um caminho ou arquivo binário; retorna o manifest"""
+    manifest = {}
+    with zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for _ in write_archive(archive, manifest):
+            pass
+    return manifest
+
+
+def export_stream():
+    """O backup como um iterador de blocos de bytes, para respostas em streaming"""
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for _ in write_archive(archive, {}):
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+@contextmanager
+def original_timestamps(*models):
+    """Desliga auto_now/auto_now_add para as datas do backup serem mantidas"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def read_rows(archive, name):
+    with archive.open(name) as member:
+        for line in member:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def import_rows(archive, name, model):
+    batch = []
+    count = 0
+    for row in read_rows(archive, name):
+        batch.append(model(**row))
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def import_files(archive, copied):
+    """
+    Copia os arquivos do ZIP para o storage; os já existentes (mesmo hash) são
+    mantidos. Os nomes gravados entram em `copied`, para a remoção em caso de falha.
+    """
+    for info in archive.infolist():
+        if not info.filename.startswith(MEDIA_PREFIX) or info.is_dir():
+            continue
+        storage_name = info.filename[len(MEDIA_PREFIX):]
+        if not storage_name.startswith(MEDIA_DIRS) or '..' in storage_name.split('/'):
+            raise BackupError(f'Nome de arquivo inválido no backup: {info.filename}')
+        if default_storage.exists(storage_name):
+            continue
+        with archive.open(info) as source:
+            saved = default_storage.save(storage_name, File(source, name=storage_name))
+        copied.append(saved)
+        if saved != storage_name:
+            raise BackupError(f'{storage_name} foi gravado como {saved}')
+
+
+def import_archive(file):
+    """
+    Restaura o backup de `file` (caminho ou arquivo binário com seek). Os
+    arquivos vão primeiro, para nenhuma foto importada apontar para um arquivo
+    ausente; as linhas entram em uma única transação. Se algo falhar, os
+    arquivos copiados são removidos. Retorna as contagens.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as exc:
+        raise BackupError(f'Arquivo de backup inválido: {exc}')
+
+    with archive:
+        try:
+            manifest = orjson.loads(archive.read('manifest.json'))
+        except KeyError:
+            raise BackupError('Backup incompleto: manifest.json não encontrado')
+        if manifest.get('format') != FORMAT_VERSION:
+            raise BackupError(f'Formato de backup não suportado: {manifest.get("format")}')
+        if List.objects.exists() or Photo.objects.exists():
+            raise BackupError('A importação exige uma instância sem listas nem fotos')
+
+        copied = []
+        try:
+            import_files(archive, copied)
+            result = {"files": len(copied)}
+            with transaction.atomic(), original_timestamps(List, Item, Photo):
+                for name, model, _ in TABLES:
+                    result[name.split('.')[0]] = import_rows(archive, name, model)
+
+                # Com os ids do backup, as sequências precisam continuar depois deles
+                with connection.cursor() as cursor:
+                    for statement in connection.ops.sequence_reset_sql(no_style(), [List, Item, Photo]):
+                        cursor.execute(statement)
+
+                board = orjson.loads(archive.read('board.json'))
+                with writable_board() as current:
+                    # Uma nova versão, maior que a do backup: ETags antigas não coincidem
+                    current.version = max(current.version, board['version'])
+                    commit_content(current, board['content'])
+
+                # bulk_create não dispara os sinais que invalidam o cache de respostas
+                bump('lists', 'photos')
+        except BaseException:
+            for storage_name in copied:
+                default_storage.delete(storage_name)
+            raise
+    return result
@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from backup.archive import export_to_file
+
+
+class Command(BaseCommand):
+    help = 'Exporta board, listas, itens e fotos (com os arquivos) para um arquivo ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo de destino, ou '-' para a saída padrão")
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            manifest = export_to_file(sys.stdout.buffer)
+            self.stderr.write(self.summary(manifest))
+            return
+        manifest = export_to_file(options['path'])
+        self.stdout.write(self.style.SUCCESS(self.summary(manifest)))
+
+    def summary(self, manifest):
+        line = (
+            f'{manifest["lists"]} listas, {manifest["items"]} itens, {manifest["photos"]} fotos '
+            f'e {manifest["files"]} arquivos exportados'
+        )
+        if manifest["missing_files"]:
+            line += f' ({manifest["missing_files"]} arquivos ausentes no storage)'
+        return line
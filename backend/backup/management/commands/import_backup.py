@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backup.archive import BackupError, import_archive
+
+
+class Command(BaseCommand):
+    help = 'Restaura um backup de export_backup em uma instância sem listas nem fotos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo ZIP gerado por export_backup ou por /api/backup/')
+
+    def handle(self, *args, **options):
+        try:
+            result = import_archive(options['path'])
+        except (BackupError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["lists"]} listas, {result["items"]} itens e {result["photos"]} fotos importadas; '
+            f'{result["files"]} arquivos copiados para o storage'
+        ))
@@ -0,0 +1,156 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timezone
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from board.blobs import store_data_url
+from board.models import Board
+from lists.models import List, Item
+from photos.models import Photo
+
+from .archive import BATCH_SIZE, ITEM_FIELDS, LIST_FIELDS, PHOTO_FIELDS, BackupError, import_archive
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='off', BOARD_WRITE_BEHIND_SECONDS=0)
+class BackupTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        market = List.objects.create(name='Mercado')
+        Item.objects.create(list=market, name='Arroz', position='a', completed=True)
+        Item.objects.create(list=market, name='Feijão', position='b')
+        List.objects.create(name='Casa')
+        # Datas antigas, que a importação precisa manter
+        List.objects.filter(id=market.id).update(updated_at=datetime(2020, 5, 1, tzinfo=timezone.utc))
+
+        original = default_storage.save(f'photos/{"a" * 64}.jpg', ContentFile(b'jpeg' * 1000))
+        variant = default_storage.save(f'photos/derivatives/1/480-{"a" * 16}.webp', ContentFile(b'webp'))
+        photo = Photo.objects.create(
+            image=original, content_hash='a' * 64, width=640, height=480, size=4000,
+            variants=[{"name": variant, "width": 480, "height": 360, "type": 'image/webp'}],
+        )
+        Photo.objects.filter(id=photo.id).update(uploaded_at=date(2020, 5, 1))
+        self.files = {original: b'jpeg' * 1000, variant: b'webp'}
+
+        Board.get_instance().save_content({"objects": [{"type": 'rect', "left": 10}]})
+
+    def rows(self):
+        return (
+            list(List.objects.order_by('id').values(*LIST_FIELDS)),
+            list(Item.objects.order_by('id').values(*ITEM_FIELDS)),
+            list(Photo.objects.order_by('id').values(*PHOTO_FIELDS)),
+        )
+
+    def export(self):
+        response = self.client.get('/api/backup/')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return b''.join(response.streaming_content)
+
+    def wipe(self):
+        List.objects.all().delete()
+        Photo.objects.all().delete()
+        shutil.rmtree(os.path.join(self.media_root, 'photos'))
+
+    def test_round_trip(self):
+        expected = self.rows()
+        board_version = Board.current_version()
+        data = self.export()
+
+        self.wipe()
+        result = import_archive(io.BytesIO(data))
+
+        self.assertEqual(result, {"files": 2, "lists": 2, "items": 2, "photos": 1})
+        self.assertEqual(self.rows(), expected)
+        for name, content in self.files.items():
+            with default_storage.open(name) as file:
+                self.assertEqual(file.read(), content)
+        board = Board.get_instance()
+        self.assertEqual(board.content, {"objects": [{"type": 'rect', "left": 10}]})
+        self.assertGreater(board.version, board_version)
+        # Novas linhas continuam depois dos ids importados
+        self.assertGreater(List.objects.create(name='Nova').id, expected[0][-1]['id'])
+
+    def test_round_trip_with_board_images(self):
+        png = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+        url = store_data_url('data:image/png;base64,' + base64.b64encode(png).decode())
+        content = {"objects": [{"type": 'image', "src": url}, {"type": 'image', "src": url}]}
+        Board.get_instance().save_content(content)
+        data = self.export()
+
+        self.wipe()
+        shutil.rmtree(os.path.join(self.media_root, 'board'))
+        result = import_archive(io.BytesIO(data))
+
+        self.assertEqual(result["files"], 3)
+        self.assertEqual(Board.get_instance().content, content)
+        storage_name = url[len(default_storage.url('')):]
+        self.assertTrue(storage_name.startswith('board/blobs/'))
+        with default_storage.open(storage_name) as file:
+            self.assertEqual(file.read(), png)
+
+    def test_failed_import_removes_copied_files(self):
+        data = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(self.export())) as source, zipfile.ZipFile(data, 'w') as archive:
+            for info in source.infolist():
+                # Uma linha inválida faz a transação das linhas falhar
+                content = b'{"id": 1, "nome": "x"}\n' if info.filename == 'items.ndjson' else source.read(info)
+                archive.writestr(info, content)
+
+        self.wipe()
+        with self.assertRaises(TypeError):
+            import_archive(data)
+
+        self.assertFalse(List.objects.exists())
+        for name in self.files:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_import_requires_an_empty_instance(self):
+        data = self.export()
+
+        with self.assertRaises(BackupError):
+            import_archive(io.BytesIO(data))
+
+    def test_export_is_streamed_in_chunks(self):
+        market = List.objects.get(name='Mercado')
+        Item.objects.bulk_create(
+            Item(list=market, name=f'Item {i}', position=f'c{i:05d}') for i in range(BATCH_SIZE * 2)
+        )
+        response = self.client.get('/api/backup/')
+
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            with archive.open('items.ndjson') as member:
+                self.assertEqual(sum(1 for _ in member), BATCH_SIZE * 2 + 2)
+
+    async def test_export_under_asgi(self):
+        response = await self.async_client.get('/api/backup/')
+
+        data = b''.join([chunk async for chunk in response.streaming_content])
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIn(f'media/photos/{"a" * 64}.jpg', archive.namelist())
+            self.assertIn(b'"photos": 1', archive.read('manifest.json'))
+
+    def test_commands(self):
+        path = os.path.join(self.media_root, 'backup.zip')
+        call_command('export_backup', path, stdout=io.StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('import_backup', path, stdout=io.StringIO())
+
+        self.wipe()
+        call_command('import_backup', path, stdout=io.StringIO())
+        self.assertEqual(List.objects.count(), 2)
@@ -0,0 +1,34 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .archive import export_stream
+
+
+async def aiterate(chunks):
+    """
+    Sob ASGI, o Django leria um iterador síncrono inteiro antes de enviar o
+    primeiro byte. Cada bloco é gerado na thread da requisição, onde estão a
+    conexão e a transação da exportação.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Cliente desconectado: encerra a transação na mesma thread
+        await sync_to_async(chunks.close)()
+
+
+@require_GET
+def export(request):
+    chunks = export_stream()
+    if isinstance(request, ASGIRequest):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="backup-{timezone.now():%Y%m%d-%H%M%S}.zip"'
+    # O nginx repassa os blocos conforme chegam, sem acumular o ZIP em disco
+    response['X-Accel-Buffering'] = 'no'
+    return response
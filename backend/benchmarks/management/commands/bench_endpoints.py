@@ -0,0 +1,98 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks.suite import DATASETS, run_suite, compare
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência, vazão e consultas por requisição dos endpoints da API em um banco '
+        'descartável e falha se algum endpoint passar do orçamento de consultas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=DATASETS, default='default', help='Tamanho dos dados sintéticos')
+        parser.add_argument('--iterations', type=int, default=30, help='Requisições medidas por endpoint')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Clientes simultâneos na medida de vazão dos GETs')
+        parser.add_argument('--database', choices=['sqlite', 'configured'], default='sqlite',
+                            help='sqlite: banco em memória, sem serviços externos; '
+                                 'configured: banco de teste criado a partir de DATABASES')
+        parser.add_argument('--output', help='Grava o relatório JSON neste arquivo (linha de base)')
+        parser.add_argument('--compare', help='Relatório JSON anterior para comparar o p50')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def use_sqlite(self):
+        """Troca o banco default por um SQLite em memória só neste processo"""
+        connection.close()
+        default = connections.settings['default']
+        connections.settings['default'] = {
+            **default, 'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:', 'OPTIONS': {},
+            'TEST': {**default['TEST'], 'NAME': ':memory:'},
+        }
+        del connections['default']
+        # Sem réplica: as leituras roteadas iriam para o banco real
+        connections.settings.pop('replica', None)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Não foi possível ler {options["compare"]}: {exc}')
+
+        if options['database'] == 'sqlite':
+            self.use_sqlite()
+
+        # O banco de teste é criado do zero e destruído no fim: os dados reais não são tocados
+        setup_test_environment()
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = run_suite(options['dataset'], options['iterations'], options['concurrency'])
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+            teardown_test_environment()
+
+        if baseline is not None:
+            report["p50_change_percent"] = compare(report, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            self.print_report(report)
+
+        if report["budget_failures"]:
+            raise CommandError('Orçamento de consultas estourado:\n  ' + '\n  '.join(report["budget_failures"]))
+
+    def print_report(self, report):
+        dataset = report["dataset"]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{dataset["lists"]} listas x {dataset["items_per_list"]} itens, {dataset["photos"]} fotos, '
+            f'board com {dataset["board_bytes"] / 1024:.0f} KB ({report["vendor"]}, '
+            f'{report["iterations"]} requisições por endpoint)'
+        ))
+        changes = report.get("p50_change_percent", {})
+        for name, results in report["endpoints"].items():
+            for mode in ('db', 'cached'):
+                if mode not in results:
+                    continue
+                data = results[mode]
+                budget = results["budget"] if mode == 'db' else 0
+                line = (
+                    f'  {name:<14} {mode:<6} {data["queries"]:>2}/{budget} consultas  '
+                    f'p50 {data["p50_ms"]:>8} ms  p95 {data["p95_ms"]:>8} ms  p99 {data["p99_ms"]:>8} ms  '
+                    f'{data["requests_per_second"]:>8} req/s  {data["response_bytes"] / 1024:>8.1f} KB'
+                )
+                if "concurrent_requests_per_second" in data:
+                    line += f'  {data["concurrent_requests_per_second"]:>8} req/s ({report["concurrency"]} clientes)'
+                if mode in changes.get(name, {}):
+                    line += f'  {changes[name][mode]:+.1f}%'
+                self.stdout.write(self.style.ERROR(line) if data["queries"] > budget else line)
@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from benchmarks.servers import MODES, run_mode
+from benchmarks.suite import DATASETS, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara vazão, latência e memória por worker do gunicorn em modo ASGI (uvicorn e views '
+        'assíncronas) e WSGI, sob GETs concorrentes e uploads lentos, em um banco descartável'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=DATASETS, default='default', help='Tamanho dos dados sintéticos')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help='Modos comparados')
+        parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn em cada modo')
+        parser.add_argument('--concurrency', type=int, default=32, help='Clientes de GET simultâneos')
+        parser.add_argument('--slow-uploads', type=int, default=4, help='Clientes enviando uploads devagar')
+        parser.add_argument('--duration', type=float, default=20, help='Segundos de carga em cada modo')
+        parser.add_argument('--port', type=int, default=8765, help='Porta local dos servidores')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def handle(self, *args, **options):
+        # Os servidores são outros processos: o banco de teste precisa existir fora deste
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+                raise CommandError('O banco de teste é um SQLite em memória; configure DATABASES TEST NAME')
+            with override_settings(BOARD_WRITE_BEHIND_SECONDS=0):
+                ids = seed(DATASETS[options['dataset']])
+            board_bytes = ids.pop('board_bytes')
+            connection.close()
+
+            report = {
+                "dataset": {"name": options['dataset'], **DATASETS[options['dataset']], "board_bytes": board_bytes},
+                "workers": options['workers'],
+                "concurrency": options['concurrency'],
+                "slow_uploads": options['slow_uploads'],
+                "duration": options['duration'],
+                "modes": {},
+            }
+            for mode in options['modes']:
+                try:
+                    report["modes"][mode] = run_mode(
+                        mode, ids, options['port'], options['workers'], options['concurrency'],
+                        options['slow_uploads'], options['duration'], test_db,
+                    )
+                except RuntimeError as exc:
+                    raise CommandError(f'{mode}: {exc}')
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            self.print_report(report)
+
+    def print_report(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{report["workers"]} workers, {report["concurrency"]} clientes de GET e '
+            f'{report["slow_uploads"]} uploads lentos por {report["duration"]:.0f} s'
+        ))
+        for mode, data in report["modes"].items():
+            self.stdout.write(
+                f'  {mode:<5} {data["requests_per_second"]:>8} req/s  p50 {data["p50_ms"]:>8} ms  '
+                f'p95 {data["p95_ms"]:>8} ms  p99 {data["p99_ms"]:>8} ms  {data["errors"]:>4} erros  '
+                f'{data["upload_chunks"]:>4} partes enviadas  {data["rss_mb_per_worker"]} MB/worker'
+            )
+        modes = report["modes"]
+        if 'asgi' in modes and 'wsgi' in modes and modes['wsgi']['requests_per_second']:
+            ratio = modes['asgi']['requests_per_second'] / modes['wsgi']['requests_per_second']
+            self.stdout.write(f'  asgi/wsgi: {ratio:.2f}x a vazão')
@@ -0,0 +1,230 @@
+"""
+Comparação dos modos do servidor de produção (gunicorn.conf.py): ASGI com
+workers uvicorn e views assíncronas contra WSGI com workers síncronos.
+
+Cada modo sobe um gunicorn de verdade sobre o mesmo banco já populado e
+recebe a mesma carga por HTTP: clientes com keep-alive repetindo os GETs da
+API e, ao mesmo tempo, clientes que enviam partes de upload devagar, como um
+celular em rede ruim. No WSGI cada upload lento ocupa um worker até terminar;
+no ASGI o corpo chega pelo event loop e os GETs seguem sendo atendidos. No fim
+da carga, a memória de cada worker é lida de /proc.
+"""
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from .suite import percentile
+
+GET_PATHS = [
+    '/api/lists/',
+    '/api/lists/{list_id}/items/',
+    '/api/photos/?limit=50',
+    '/api/board/',
+]
+
+MODES = {
+    'asgi': {"SERVER_MODE": 'asgi', "API_ASYNC_VIEWS": 'True'},
+    'wsgi': {"SERVER_MODE": 'wsgi', "API_ASYNC_VIEWS": 'False'},
+}
+
+# Partes de upload de 256 KB enviadas a 64 KB/s
+UPLOAD_CHUNK_BYTES = 256 * 1024
+UPLOAD_PIECE_BYTES = 16 * 1024
+UPLOAD_PIECE_INTERVAL = 0.25
+
+
+class Server:
+    """Um gunicorn em segundo plano, no modo `mode`, servindo o banco `db_name`"""
+
+    def __init__(self, mode, port, workers, db_name):
+        self.port = port
+        env = {
+            **os.environ, **MODES[mode],
+            "BIND": f'127.0.0.1:{port}',
+            "WEB_CONCURRENCY": str(workers),
+            "DB_NAME": db_name,
+            "ALLOWED_HOSTS": '127.0.0.1',
+            # O caminho do banco, não o do cache; métricas ficam no próprio processo
+            "RESPONSE_CACHE_BACKEND": 'off',
+            "BOARD_WRITE_BEHIND_SECONDS": '0',
+            "METRICS_DIR": '',
+        }
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', os.devnull],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+
+    def wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'o servidor terminou: {self.process.stderr.read().decode()[-2000:]}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                connection.request('GET', '/api/lists/?limit=1')
+                if connection.getresponse().status == 200:
+                    connection.close()
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('o servidor não respondeu a tempo')
+
+    def worker_memory(self):
+        """VmRSS e VmHWM (pico) de cada worker, em MB"""
+        workers = []
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            status = read_status(pid)
+            if status.get('PPid') == str(self.process.pid):
+                workers.append({
+                    "pid": int(pid),
+                    "rss_mb": round(int(status['VmRSS'].split()[0]) / 1024, 1),
+                    "peak_mb": round(int(status['VmHWM'].split()[0]) / 1024, 1),
+                })
+        return sorted(workers, key=lambda worker: worker['pid'])
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def read_status(pid):
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            return dict(line.rstrip('\n').split(':\t', 1) for line in file if ':\t' in line)
+    except OSError:
+        return {}
+
+
+class Load:
+    """Resultados compartilhados pelas threads de carga"""
+
+    def __init__(self, duration):
+        self.deadline = time.monotonic() + duration
+        self.lock = threading.Lock()
+        self.timings = []
+        self.errors = 0
+        self.chunks = 0
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+
+def get_client(port, paths, load):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    index = 0
+    while load.running():
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            ok = False
+            connection.close()
+        elapsed = (time.perf_counter() - start) * 1000
+        with load.lock:
+            if ok:
+                load.timings.append(elapsed)
+            else:
+                load.errors += 1
+    connection.close()
+
+
+def slow_upload_client(port, load):
+    """Envia partes de upload aos poucos enquanto durar a carga"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    # Mais partes do que cabem na duração da carga, abaixo de PHOTO_UPLOAD_MAX_BYTES
+    size = UPLOAD_CHUNK_BYTES * 100
+    connection.request(
+        'POST', '/api/photos/uploads/', json.dumps({"filename": 'bench.jpg', "size": size}),
+        {"Content-Type": 'application/json'},
+    )
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 201:
+        with load.lock:
+            load.errors += 1
+        return
+    upload_id = json.loads(body)['id']
+
+    piece = b'\0' * UPLOAD_PIECE_BYTES
+    offset = 0
+    while load.running() and offset < size:
+        end = offset + UPLOAD_CHUNK_BYTES - 1
+        try:
+            connection.putrequest('PUT', f'/api/photos/uploads/{upload_id}/')
+            connection.putheader('Content-Type', 'application/octet-stream')
+            connection.putheader('Content-Length', str(UPLOAD_CHUNK_BYTES))
+            connection.putheader('Content-Range', f'bytes {offset}-{end}/{size}')
+            connection.endheaders()
+            for _ in range(UPLOAD_CHUNK_BYTES // UPLOAD_PIECE_BYTES):
+                connection.send(piece)
+                time.sleep(UPLOAD_PIECE_INTERVAL)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            break
+        if response.status != 200:
+            with load.lock:
+                load.errors += 1
+            break
+        offset = end + 1
+        with load.lock:
+            load.chunks += 1
+    connection.close()
+
+
+def run_mode(mode, ids, port, workers, concurrency, slow_uploads, duration, db_name):
+    paths = [path.format(**ids) for path in GET_PATHS]
+    server = Server(mode, port, workers, db_name)
+    try:
+        server.wait_ready()
+        # Aquece cada worker antes de medir
+        for path in paths * workers:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.request('GET', path)
+            connection.getresponse().read()
+            connection.close()
+
+        load = Load(duration)
+        threads = [threading.Thread(target=slow_upload_client, args=(port, load)) for _ in range(slow_uploads)]
+        threads += [threading.Thread(target=get_client, args=(port, paths, load)) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        memory = server.worker_memory()
+    finally:
+        server.stop()
+
+    timings = load.timings or [0]
+    return {
+        "requests": len(load.timings),
+        "errors": load.errors,
+        "requests_per_second": round(len(load.timings) / elapsed, 1),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "upload_chunks": load.chunks,
+        "workers": memory,
+        "rss_mb_per_worker": round(statistics.mean(w['rss_mb'] for w in memory), 1) if memory else None,
+    }
@@ -0,0 +1,216 @@
+"""
+Benchmark dos endpoints da API com orçamento de consultas.
+
+`seed` popula um banco descartável com um conjunto realista (milhares de
+itens, centenas de fotos, um board do fabric.js com alguns MB) e `run_suite`
+mede cada endpoint pelo cliente de teste do Django, passando por middlewares,
+views e renderização. Cada endpoint é medido duas vezes: sem o cache de
+respostas (o caminho do banco, onde vale o orçamento de consultas) e com ele
+(acertos, que não podem fazer consulta nenhuma).
+
+Estourar um orçamento indica uma consulta a mais por requisição, tipicamente
+um N+1: o número não depende do tamanho dos dados.
+"""
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from board.management.commands.bench_board_storage import synthetic_board
+from board.models import Board
+from lists.models import List, Item
+from lists.positions import evenly_spaced
+from photos.models import Photo
+
+DATASETS = {
+    # Para os testes: rápido, mas com mais de uma linha em cada tabela
+    'small': {"lists": 5, "items_per_list": 20, "photos": 30, "board_objects": 50},
+    'default': {"lists": 50, "items_per_list": 100, "photos": 300, "board_objects": 1500},
+    'large': {"lists": 200, "items_per_list": 250, "photos": 1000, "board_objects": 5000},
+}
+
+WORDS = ['arroz', 'feijão', 'açúcar', 'café', 'leite', 'pão', 'tomate', 'presente', 'viagem', 'filme', 'livro']
+
+# Consultas por requisição no caminho do banco. 'board.patch' inclui
+# SAVEPOINT/RELEASE, a revisão anterior e o INSERT da nova revisão. O feed de
+# mudanças depende do relógio, então não passa pelo cache de respostas
+ENDPOINTS = [
+    {"name": 'lists.all', "method": 'GET', "path": '/api/lists/', "budget": 2},
+    {"name": 'lists.summary', "method": 'GET', "path": '/api/lists/?summary=1&items=5', "budget": 2},
+    {"name": 'lists.detail', "method": 'GET', "path": '/api/lists/{list_id}/', "budget": 2},
+    {"name": 'lists.items', "method": 'GET', "path": '/api/lists/{list_id}/items/', "budget": 1},
+    {"name": 'lists.search', "method": 'GET', "path": '/api/lists/search/?q=acucar', "budget": 2},
+    {"name": 'lists.changes', "method": 'GET', "path": '/api/lists/changes/?list={list_id}', "budget": 2,
+     "cached": False},
+    {"name": 'items.patch', "method": 'PATCH', "path": '/api/lists/{list_id}/items/{item_id}/',
+     "body": {"completed": True}, "budget": 1},
+    {"name": 'photos.page', "method": 'GET', "path": '/api/photos/?limit=50', "budget": 1},
+    {"name": 'photos.all', "method": 'GET', "path": '/api/photos/?all=1', "budget": 1},
+    {"name": 'board', "method": 'GET', "path": '/api/board/', "budget": 1},
+    {"name": 'board.patch', "method": 'PATCH', "path": '/api/board/',
+     "body": [{"op": "replace", "path": "/background", "value": "#fafafa"}],
+     "content_type": 'application/json-patch+json', "budget": 6},
+]
+
+
+def seed(dataset):
+    """Popula o banco e retorna os ids usados nos caminhos dos endpoints"""
+    rng = random.Random(42)
+    lists = List.objects.bulk_create(List(name=f'Lista {i:04d}') for i in range(dataset['lists']))
+    positions = evenly_spaced(dataset['items_per_list'])
+    Item.objects.bulk_create(
+        (
+            Item(
+                list=list_obj, position=position, completed=rng.random() < 0.3,
+                name=' '.join(rng.sample(WORDS, rng.randint(1, 3))).capitalize(),
+            )
+            for list_obj in lists
+            for position in positions
+        ),
+        batch_size=2000,
+    )
+
+    photos = []
+    for i in range(dataset['photos']):
+        digest = f'{i:064x}'
+        photos.append(Photo(
+            image=f'photos/{digest}.jpg', content_hash=digest, width=4000, height=3000, size=2_500_000,
+            color='#a0a0a0', variants=[
+                {"name": f'photos/derivatives/{i}/{width}-{digest[:16]}.webp', "width": width,
+                 "height": width * 3 // 4, "type": 'image/webp'}
+                for width in (480, 960, 1920)
+            ],
+        ))
+    Photo.objects.bulk_create(photos, batch_size=1000)
+
+    board = Board.get_instance()
+    board.save_content(synthetic_board(dataset['board_objects']))
+
+    item = Item.objects.filter(list=lists[0]).order_by('position').first()
+    return {"list_id": lists[0].id, "item_id": item.id, "board_bytes": len(json.dumps(board.content))}
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def request(client, endpoint, ids):
+    body = endpoint.get('body')
+    content_type = endpoint.get('content_type', 'application/json')
+    return client.generic(
+        endpoint['method'], endpoint['path'].format(**ids),
+        json.dumps(body) if body is not None else '', content_type=content_type,
+    )
+
+
+def measure(endpoint, ids, iterations, concurrency=1):
+    """Latências e consultas de `iterations` requisições; a primeira só aquece"""
+    client = Client()
+    request(client, endpoint, ids)
+
+    timings, queries, sizes = [], [], []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = request(client, endpoint, ids)
+            timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{endpoint["name"]}: HTTP {response.status_code}')
+        queries.append(len(captured.captured_queries))
+        sizes.append(len(response.content))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "status": response.status_code,
+        "response_bytes": max(sizes),
+        "queries": max(queries),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "requests_per_second": round(iterations / elapsed, 1),
+    }
+    if concurrency > 1 and endpoint['method'] == 'GET':
+        result["concurrent_requests_per_second"] = round(throughput(endpoint, ids, iterations, concurrency), 1)
+    return result
+
+
+def throughput(endpoint, ids, iterations, concurrency):
+    """Requisições por segundo com `concurrency` clientes simultâneos"""
+    def worker(_):
+        client = Client()
+        try:
+            for _ in range(iterations):
+                request(client, endpoint, ids)
+        finally:
+            close_old_connections()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return iterations * concurrency / (time.perf_counter() - started)
+
+
+def run_suite(dataset_name='default', iterations=30, concurrency=1):
+    """Mede todos os endpoints e retorna o relatório, incluindo os orçamentos estourados"""
+    dataset = DATASETS[dataset_name]
+    report = {
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "vendor": connection.vendor,
+        "dataset": {"name": dataset_name, **dataset},
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "endpoints": {},
+        "budget_failures": [],
+    }
+
+    with override_settings(BOARD_WRITE_BEHIND_SECONDS=0):
+        ids = seed(dataset)
+        report["dataset"]["board_bytes"] = ids.pop("board_bytes")
+
+        for endpoint in ENDPOINTS:
+            with override_settings(RESPONSE_CACHE_BACKEND='off'):
+                db = measure(endpoint, ids, iterations, concurrency)
+            results = {"budget": endpoint['budget'], "db": db}
+            if db['queries'] > endpoint['budget']:
+                report["budget_failures"].append(
+                    f'{endpoint["name"]}: {db["queries"]} consultas (orçamento {endpoint["budget"]})'
+                )
+
+            if endpoint['method'] == 'GET' and endpoint.get('cached', True):
+                responses_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}
+                with override_settings(RESPONSE_CACHE_BACKEND='locmem', CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'responses': responses_cache,
+                }):
+                    caches['responses'].clear()
+                    cached = measure(endpoint, ids, iterations, concurrency)
+                results["cached"] = cached
+                if cached['queries'] > 0:
+                    report["budget_failures"].append(
+                        f'{endpoint["name"]} (cache): {cached["queries"]} consultas (orçamento 0)'
+                    )
+            report["endpoints"][endpoint['name']] = results
+    return report
+
+
+def compare(report, baseline):
+    """Variação percentual do p50 de cada endpoint em relação a um relatório anterior"""
+    changes = {}
+    for name, results in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        changes[name] = {
+            mode: round((results[mode]["p50_ms"] / previous[mode]["p50_ms"] - 1) * 100, 1)
+            for mode in ('db', 'cached')
+            if mode in results and mode in previous and previous[mode]["p50_ms"]
+        }
+    return changes
@@ -0,0 +1,18 @@
+from django.core.cache import caches
+from django.test import TransactionTestCase
+
+from .suite import ENDPOINTS, run_suite
+
+
+class EndpointBudgetTests(TransactionTestCase):
+    """Roda a suíte com poucos dados: uma consulta a mais em qualquer endpoint falha aqui"""
+
+    def setUp(self):
+        caches['responses'].clear()
+
+    def test_endpoints_within_query_budget(self):
+        report = run_suite('small', iterations=2)
+
+        self.assertEqual(report["budget_failures"], [])
+        self.assertEqual(set(report["endpoints"]), {endpoint['name'] for endpoint in ENDPOINTS})
+        self.assertEqual(report["endpoints"]["board"]["cached"]["queries"], 0)
@@ -0,0 +1,133 @@
+"""
+Armazenamento endereçado por conteúdo das imagens embutidas no board.
+
+O fabric.js serializa imagens como data URLs em base64 dentro do JSON do
+canvas. Aqui esses dados são decodificados, gravados uma única vez em
+MEDIA_ROOT sob o SHA-256 do conteúdo (no mesmo storage usado pelas fotos) e
+substituídos pela URL curta do arquivo.
+"""
+import base64
+import binascii
+import hashlib
+import mimetypes
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+BLOB_DIR = 'board/blobs'
+DATA_URL_RE = re.compile(r'^data:(image/[\w.+-]+);base64,', re.IGNORECASE)
+
+
+def blob_path(digest, mime_type):
+    extension = mimetypes.guess_extension(mime_type) or '.bin'
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+def image_blob(value):
+    """
+    Decodifica uma data URL de imagem. Retorna (caminho no storage, bytes), ou
+    None quando o valor não é uma data URL válida.
+    """
+    match = DATA_URL_RE.match(value)
+    if not match:
+        return None
+    try:
+        data = base64.b64decode(value[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return blob_path(hashlib.sha256(data).hexdigest(), match.group(1).lower()), data
+
+
+def save_blobs(pending):
+    """Grava os blobs de `pending` ({caminho: bytes}) que ainda não existem"""
+    for path, data in pending.items():
+        # Mesmo conteúdo, mesmo caminho: imagens repetidas são gravadas uma vez só
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(data))
+
+
+def store_data_url(value):
+    """
+    Grava o conteúdo de uma data URL de imagem e retorna sua URL curta, ou
+    None quando o valor não é uma data URL válida.
+    """
+    blob = image_blob(value)
+    if blob is None:
+        return None
+    save_blobs(dict([blob]))
+    return default_storage.url(blob[0])
+
+
+def referenced_blobs(value):
+    """Nomes no storage dos blobs cujas URLs aparecem em `value`"""
+    prefix = default_storage.url(BLOB_DIR)
+    if isinstance(value, str):
+        if value.startswith(prefix + '/'):
+            yield BLOB_DIR + value[len(prefix):]
+    elif isinstance(value, dict):
+        for child in value.values():
+            yield from referenced_blobs(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from referenced_blobs(child)
+
+
+def image_url(value, pending):
+    """URL do blob de `value` se for uma data URL de imagem; os bytes ficam em `pending`"""
+    if not isinstance(value, str) or not value.startswith('data:'):
+        return None
+    blob = image_blob(value)
+    if blob is None:
+        return None
+    pending[blob[0]] = blob[1]
+    return default_storage.url(blob[0])
+
+
+def extract_images(value, pending=None):
+    """
+    Substitui, no lugar, as data URLs dos campos `src` de `value` (onde o
+    fabric.js guarda imagens) pela URL do blob correspondente. Retorna o valor
+    resultante e quantos bytes de texto foram removidos do JSON.
+
+    Sem `pending` os blobs são gravados na hora; com ele, os bytes ficam no
+    dicionário para `save_blobs` gravar só se a escrita for adiante.
+    """
+    deferred = {} if pending is None else pending
+    saved = 0
+    if isinstance(value, dict):
+        for key, child in value.items():
+            url = image_url(child, deferred) if key == 'src' else None
+            if url is not None:
+                value[key] = url
+                saved += len(child) - len(url)
+            else:
+                value[key], child_saved = extract_images(child, deferred)
+                saved += child_saved
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            value[index], child_saved = extract_images(child, deferred)
+            saved += child_saved
+
+    if pending is None:
+        save_blobs(deferred)
+    return value, saved
+
+
+def extract_patch_images(operations, pending):
+    """
+    Como `extract_images`, para os valores das operações `add` e `replace` de
+    um JSON Patch; os de `test` ficam como vieram, para comparar com o conteúdo.
+    """
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in ('add', 'replace'):
+            continue
+        path = operation.get('path')
+        if isinstance(path, str) and path.rsplit('/', 1)[-1] == 'src':
+            # O valor é o próprio `src`: .../objects/3/src
+            url = image_url(operation.get('value'), pending)
+            if url is not None:
+                operation['value'] = url
+        else:
+            extract_images(operation.get('value'), pending)
+    return operations
@@ -0,0 +1,200 @@
+"""
+Acesso ao board para leitura e escrita, com modo write-behind opcional.
+
+Com `BOARD_WRITE_BEHIND_SECONDS` > 0, as escritas são confirmadas ao cliente
+assim que aplicadas em memória e o estado mais recente é gravado na linha do
+`Board` no máximo uma vez por intervalo (e ao encerrar o processo). Leituras
+no mesmo worker sempre veem o estado em memória. O estado é por processo, então
+o modo é indicado para um único worker de aplicação.
+"""
+import atexit
+import copy
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from config.cache import bump
+from realtime.broker import publish
+
+from .history import record_revision
+from .patch import apply_patch
+from .models import Board
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self._board = None
+        self._pending = 0
+        self._timer = None
+        # Estatísticas expostas em /api/board/write-behind/
+        self.writes = 0
+        self.flushes = 0
+        self.coalesced = 0
+
+    def board(self):
+        """Estado atual do board neste processo, carregado do banco na primeira vez"""
+        with self.lock:
+            if self._board is None:
+                self._board = Board.get_instance()
+            return self._board
+
+    def version(self):
+        with self.lock:
+            return self._board.version if self._board is not None else None
+
+    def stage(self, content, delta=None):
+        """Aplica uma escrita em memória e agenda a gravação no banco"""
+        with self.lock:
+            board = self.board()
+            board.content = content
+            board.version += 1
+            self.writes += 1
+            self._pending += 1
+            self._schedule()
+
+        bump('board')
+        if delta is not None:
+            publish('board.patch', {"version": board.version, "patch": delta})
+        else:
+            publish('board.replaced', {"version": board.version})
+
+    def _schedule(self):
+        """Agenda a próxima gravação; chamar com `lock`"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # A thread do timer termina aqui: sua conexão não seria reaproveitada
+            connections.close_all()
+
+    def flush(self):
+        """Grava o estado em memória no banco, se houver escritas pendentes"""
+        # Uma gravação por vez; leituras e escritas seguem usando só `lock`
+        with self.flush_lock:
+            with self.lock:
+                self._timer = None
+                if not self._pending:
+                    return
+                # O conteúdo é substituído a cada escrita, nunca alterado no
+                # lugar, então a referência é um retrato consistente
+                pending = self._pending
+                content, version = self._board.content, self._board.version
+
+            try:
+                with transaction.atomic():
+                    stored = Board.get_instance(for_update=True)
+                    previous, previous_version = stored.content, stored.version
+                    stored.content = content
+                    stored.version = version
+                    stored.save(update_fields=['content', 'version', 'updated_at'])
+                    # Uma única revisão cobre todas as escritas agrupadas no intervalo
+                    record_revision(stored, previous, previous_version=previous_version)
+            except Exception:
+                logger.exception('Falha ao gravar o board do write-behind; nova tentativa em %ss', self.interval)
+                with self.lock:
+                    self._schedule()
+                return
+
+            with self.lock:
+                # Todas as escritas gravadas menos a que foi de fato persistida
+                self.coalesced += pending - 1
+                self._pending -= pending
+                self.flushes += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "interval": self.interval,
+                "pending": self._pending,
+                "writes": self.writes,
+                "flushes": self.flushes,
+                "coalesced": self.coalesced,
+            }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Retorna o buffer write-behind do processo, ou None se o modo estiver desligado"""
+    global _buffer
+    if settings.BOARD_WRITE_BEHIND_SECONDS <= 0:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(settings.BOARD_WRITE_BEHIND_SECONDS)
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def current_version():
+    """Versão atual do board sem carregar o conteúdo (None se não existir)"""
+    buffer = get_buffer()
+    if buffer is not None and buffer.version() is not None:
+        return buffer.version()
+    return Board.current_version()
+
+
+async def acurrent_version():
+    buffer = get_buffer()
+    if buffer is not None and buffer.version() is not None:
+        return buffer.version()
+    return await Board.acurrent_version()
+
+
+def readable_board():
+    buffer = get_buffer()
+    if buffer is not None:
+        return buffer.board()
+    # Uma leitura comum, que pode ir para a réplica; o get_or_create é de escrita
+    return Board.objects.filter(pk=1).first() or Board.get_instance()
+
+
+@contextmanager
+def writable_board():
+    """
+    Entrega o board com acesso exclusivo para escrita: a linha travada dentro
+    de uma transação, ou o estado em memória sob o lock do buffer.
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        with transaction.atomic():
+            yield Board.get_instance(for_update=True)
+    else:
+        with buffer.lock:
+            yield buffer.board()
+
+
+def commit_content(board, content, delta=None):
+    """Grava o conteúdo do board obtido por `writable_board`"""
+    buffer = get_buffer()
+    if buffer is None:
+        board.save_content(content, delta)
+    else:
+        buffer.stage(content, delta)
+
+
+def patch_content(board, operations):
+    """
+    Aplica um JSON Patch ao conteúdo obtido por `writable_board`. No modo
+    write-behind o conteúdo é compartilhado entre requisições, então o patch é
+    aplicado em uma cópia para que uma falha no meio não deixe estado parcial.
+    """
+    content = board.content if board.content is not None else {}
+    if get_buffer() is not None:
+        content = copy.deepcopy(content)
+    return apply_patch(content, operations)
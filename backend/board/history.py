@@ -0,0 +1,205 @@
+"""
+Histórico de revisões do board.
+
+Cada escrita gera uma revisão. A cada `BOARD_HISTORY_KEYFRAME_INTERVAL`
+revisões é gravado um keyframe com o conteúdo completo; entre keyframes só é
+guardado o JSON Patch em relação à revisão anterior. Tudo é comprimido com
+zlib, e reconstruir qualquer revisão exige no máximo `intervalo - 1` deltas.
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .patch import apply_patch, make_patch
+
+# Escritas online priorizam velocidade; a compactação offline recomprime no máximo
+ONLINE_COMPRESSION_LEVEL = 1
+COMPACT_COMPRESSION_LEVEL = 9
+
+
+class RevisionNotFound(LookupError):
+    """A revisão pedida não existe (ou já foi removida pela retenção)."""
+
+
+def encode(value, level=ONLINE_COMPRESSION_LEVEL):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode(), level)
+
+
+def decode(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def record_revision(board, previous_content, delta=None, previous_version=None):
+    """
+    Registra a versão atual do board. Deve ser chamada dentro da mesma
+    transação da escrita, depois de `board.version` ter sido avançada.
+    `previous_version` só difere de `version - 1` quando várias escritas
+    foram agrupadas em uma só (ver `board.buffer`).
+    """
+    from .models import BoardRevision
+
+    interval = max(settings.BOARD_HISTORY_KEYFRAME_INTERVAL, 1)
+    last = (
+        BoardRevision.objects.filter(board=board)
+        .only('version', 'chain_length')
+        .order_by('-version')
+        .first()
+    )
+
+    # Só dá para gravar um delta se a revisão anterior for exatamente a versão
+    # que estava no board; qualquer lacuna começa uma nova cadeia
+    if previous_version is None:
+        previous_version = board.version - 1
+    continues_chain = last is not None and last.version == previous_version
+    if continues_chain and last.chain_length + 1 < interval:
+        revision = BoardRevision(
+            board=board,
+            version=board.version,
+            is_keyframe=False,
+            chain_length=last.chain_length + 1,
+            data=encode(delta if delta is not None else make_patch(previous_content or {}, board.content or {})),
+        )
+    else:
+        revision = BoardRevision(
+            board=board,
+            version=board.version,
+            is_keyframe=True,
+            chain_length=0,
+            data=encode(board.content or {}),
+        )
+    revision.size = len(revision.data)
+    revision.save()
+
+    # A poda roda junto com os keyframes para não pesar em toda escrita
+    if revision.is_keyframe:
+        prune_revisions(board)
+    return revision
+
+
+def rebuild(board, version):
+    """Reconstrói o conteúdo do board em uma determinada versão"""
+    from .models import BoardRevision
+
+    target = BoardRevision.objects.filter(board=board, version=version).only('version').first()
+    if target is None:
+        raise RevisionNotFound(version)
+
+    # As versões podem ter lacunas (escritas agrupadas), então a cadeia começa
+    # no último keyframe até a revisão pedida
+    keyframe_version = (
+        BoardRevision.objects.filter(board=board, version__lte=target.version, is_keyframe=True)
+        .values_list('version', flat=True)
+        .order_by('-version')
+        .first()
+    )
+    chain = list(
+        BoardRevision.objects.filter(
+            board=board,
+            version__gte=keyframe_version,
+            version__lte=target.version,
+        )
+        .only('data', 'is_keyframe')
+        .order_by('version')
+    )
+    content = decode(chain[0].data)
+    for delta in chain[1:]:
+        content = apply_patch(content, decode(delta.data))
+    return content
+
+
+def retention_cutoff(board, max_revisions=None, max_age_days=None, max_bytes=None):
+    """
+    Retorna a versão mais antiga que cabe nos limites de retenção (quantidade,
+    idade e bytes), ou None se todo o histórico cabe.
+    """
+    from .models import BoardRevision
+
+    max_revisions = settings.BOARD_HISTORY_MAX_REVISIONS if max_revisions is None else max_revisions
+    max_age_days = settings.BOARD_HISTORY_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = settings.BOARD_HISTORY_MAX_BYTES if max_bytes is None else max_bytes
+    min_created = timezone.now() - timedelta(days=max_age_days) if max_age_days else None
+
+    revisions = BoardRevision.objects.filter(board=board).order_by('-version')
+    cutoff = None
+    total = 0
+    for count, (version, size, created_at) in enumerate(
+        revisions.values_list('version', 'size', 'created_at').iterator(), start=1
+    ):
+        total += size
+        exceeded = (
+            (max_revisions and count > max_revisions)
+            or (max_bytes and total > max_bytes)
+            or (min_created and created_at < min_created)
+        )
+        # A revisão mais recente é sempre mantida
+        if exceeded and cutoff is not None:
+            break
+        cutoff = version
+
+    if cutoff is None or not revisions.filter(version__lt=cutoff).exists():
+        return None
+    return cutoff
+
+
+@transaction.atomic
+def prune_revisions(board, **limits):
+    """
+    Remove as revisões fora dos limites de retenção. A revisão mais antiga que
+    sobra vira keyframe para que as cadeias seguintes continuem completas.
+    Retorna a quantidade de revisões removidas.
+    """
+    from .models import BoardRevision
+
+    cutoff = retention_cutoff(board, **limits)
+    if cutoff is None:
+        return 0
+
+    oldest = BoardRevision.objects.select_for_update().get(board=board, version=cutoff)
+    if not oldest.is_keyframe:
+        promote_to_keyframe(board, oldest)
+
+    deleted, _ = BoardRevision.objects.filter(board=board, version__lt=cutoff).delete()
+    return deleted
+
+
+def promote_to_keyframe(board, revision, level=ONLINE_COMPRESSION_LEVEL):
+    """Materializa uma revisão delta como keyframe, encurtando as cadeias seguintes"""
+    from .models import BoardRevision
+
+    offset = revision.chain_length
+    revision.data = encode(rebuild(board, revision.version), level)
+    revision.size = len(revision.data)
+    revision.is_keyframe = True
+    revision.chain_length = 0
+    revision.save(update_fields=['data', 'size', 'is_keyframe', 'chain_length'])
+
+    # Os deltas seguintes da mesma cadeia passam a contar a partir daqui
+    next_keyframe = (
+        BoardRevision.objects.filter(board=board, version__gt=revision.version, is_keyframe=True)
+        .values_list('version', flat=True)
+        .order_by('version')
+        .first()
+    )
+    following = BoardRevision.objects.filter(board=board, version__gt=revision.version)
+    if next_keyframe is not None:
+        following = following.filter(version__lt=next_keyframe)
+    following.update(chain_length=F('chain_length') - offset)
+
+
+def compact_revisions(board):
+    """Recomprime todas as revisões no nível máximo. Retorna os bytes economizados"""
+    from .models import BoardRevision
+
+    saved = 0
+    revisions = BoardRevision.objects.filter(board=board).only('data', 'size').order_by('version')
+    for revision in revisions.iterator():
+        data = zlib.compress(zlib.decompress(bytes(revision.data)), COMPACT_COMPRESSION_LEVEL)
+        if len(data) < revision.size:
+            saved += revision.size - len(data)
+            BoardRevision.objects.filter(pk=revision.pk).update(data=data, size=len(data))
+    return saved
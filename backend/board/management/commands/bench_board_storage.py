@@ -0,0 +1,100 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from board.models import Board
+from board.views import BoardView
+
+
+def synthetic_board(objects, seed=42):
+    """Gera um canvas do fabric.js com desenhos à mão livre e textos"""
+    rng = random.Random(seed)
+    items = []
+    for index in range(objects):
+        if index % 10 == 0:
+            items.append({
+                "type": "IText", "left": rng.uniform(0, 800), "top": rng.uniform(0, 600),
+                "text": "Te amo " * rng.randint(1, 5), "fontFamily": "Arial", "fill": "#e11d48",
+                "fontSize": 25, "scaleX": 1, "scaleY": 1, "angle": 0,
+            })
+        else:
+            x, y = rng.uniform(0, 800), rng.uniform(0, 600)
+            path = [["M", x, y]]
+            for _ in range(rng.randint(20, 80)):
+                x, y = x + rng.uniform(-5, 5), y + rng.uniform(-5, 5)
+                path.append(["Q", x, y, x + rng.uniform(-2, 2), y + rng.uniform(-2, 2)])
+            items.append({
+                "type": "Path", "left": x, "top": y, "stroke": "#000000", "strokeWidth": 5,
+                "fill": None, "strokeLineCap": "round", "path": path,
+            })
+    return {"version": "6.7.0", "objects": items, "background": "#ffffff"}
+
+
+class Command(BaseCommand):
+    help = 'Compara tamanho armazenado e latência do GET do board em JSON e em gzip'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=3000, help='Objetos no canvas sintético')
+        parser.add_argument('--iterations', type=int, default=20, help='Requisições GET por cenário')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def measure(self, iterations, **headers):
+        view = BoardView.as_view()
+        factory = RequestFactory()
+        timings = []
+        size = 0
+        for _ in range(iterations):
+            request = factory.get('/api/board/', headers=headers)
+            start = time.perf_counter()
+            response = view(request)
+            if hasattr(response, 'render'):
+                response.render()
+            body = b''.join(response) if response.streaming else response.content
+            timings.append((time.perf_counter() - start) * 1000)
+            size = len(body)
+        return {
+            "response_bytes": size,
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1], 2),
+        }
+
+    def handle(self, *args, **options):
+        content = synthetic_board(options['objects'])
+        iterations = options['iterations']
+        results = {}
+
+        # Tudo roda em uma transação desfeita no fim: o board real não é tocado
+        with transaction.atomic(), override_settings(BOARD_WRITE_BEHIND_SECONDS=0):
+            board = Board.get_instance()
+            for storage in ('json', 'gzip'):
+                with override_settings(BOARD_STORAGE=storage):
+                    board.content = content
+                    board.save()
+                    stored = (
+                        len(board.content_gzip) if storage == 'gzip'
+                        else len(json.dumps(content, separators=(',', ':')).encode())
+                    )
+                    results[storage] = {
+                        "stored_bytes": stored,
+                        "get": self.measure(iterations),
+                        "get_accept_gzip": self.measure(iterations, accept_encoding='gzip'),
+                    }
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for storage, result in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{storage}: {result["stored_bytes"]} bytes armazenados'))
+            for scenario in ('get', 'get_accept_gzip'):
+                data = result[scenario]
+                self.stdout.write(
+                    f'  {scenario:<16} {data["response_bytes"]:>10} bytes  '
+                    f'p50 {data["p50_ms"]:>8} ms  p95 {data["p95_ms"]:>8} ms'
+                )
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from board.models import Board
+
+
+class Command(BaseCommand):
+    help = 'Converte o conteúdo gravado do board para o formato de BOARD_STORAGE (ou o de --to)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=['json', 'gzip'], help='Formato de destino; padrão: BOARD_STORAGE')
+
+    def handle(self, *args, **options):
+        storage = options['to'] or settings.BOARD_STORAGE
+        with transaction.atomic():
+            board = Board.get_instance(for_update=True)
+            if board.storage == storage:
+                self.stdout.write(f'O board já está gravado em {storage}')
+                return
+            previous = board.storage
+            # Só troca a coluna: versão, ETag e histórico continuam os mesmos
+            board.encode_content(storage)
+            board.save(update_fields=['content_json', 'content_gzip'])
+        self.stdout.write(self.style.SUCCESS(f'Board convertido de {previous} para {storage}'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from board.models import Board, BoardRevision
+from board.blobs import extract_images
+from board.history import encode, decode
+
+
+class Command(BaseCommand):
+    help = 'Move as imagens embutidas no board (e no histórico) para o storage de mídia'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            board = Board.get_instance(for_update=True)
+            content, saved = extract_images(board.content or {})
+            if saved:
+                board.save_content(content)
+        self.stdout.write(f'Board: {saved} bytes removidos do JSON')
+
+        revisions_saved = 0
+        revisions = BoardRevision.objects.filter(board=board).only('data', 'size')
+        for revision in revisions.iterator():
+            value, extracted = extract_images(decode(revision.data))
+            if not extracted:
+                continue
+            data = encode(value)
+            revisions_saved += revision.size - len(data)
+            BoardRevision.objects.filter(pk=revision.pk).update(data=data, size=len(data))
+        self.stdout.write(f'Histórico: {revisions_saved} bytes comprimidos economizados')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Imagens extraídas com sucesso ({saved + revisions_saved} bytes no total)')
+        )
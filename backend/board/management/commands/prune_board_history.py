@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from board.models import Board
+from board.history import prune_revisions, compact_revisions
+
+
+class Command(BaseCommand):
+    help = 'Poda e recomprime o histórico de revisões do board'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-revisions', type=int, help='Quantidade máxima de revisões mantidas')
+        parser.add_argument('--max-age-days', type=int, help='Idade máxima das revisões, em dias')
+        parser.add_argument('--max-bytes', type=int, help='Tamanho total máximo do histórico, em bytes')
+        parser.add_argument('--no-compact', action='store_true', help='Apenas poda, sem recomprimir')
+
+    def handle(self, *args, **options):
+        board = Board.get_instance()
+        deleted = prune_revisions(
+            board,
+            max_revisions=options['max_revisions'],
+            max_age_days=options['max_age_days'],
+            max_bytes=options['max_bytes'],
+        )
+        self.stdout.write(f'{deleted} revisões removidas')
+
+        if not options['no_compact']:
+            saved = compact_revisions(board)
+            self.stdout.write(f'{saved} bytes economizados na recompressão')
+
+        self.stdout.write(self.style.SUCCESS('Histórico do board compactado com sucesso'))
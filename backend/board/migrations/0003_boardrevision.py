@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 07:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0002_board_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+                ('is_keyframe', models.BooleanField(default=False)),
+                ('chain_length', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='board.board')),
+            ],
+            options={
+                'ordering': ['-version'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'version'), name='unique_board_revision_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 08:20
+
+import gzip
+import json
+
+from django.db import migrations, models
+
+
+def decompress_content(apps, schema_editor):
+    # Ao desfazer, o conteúdo em gzip volta para a coluna JSON antes de ela ser a única
+    Board = apps.get_model('board', 'Board')
+    for board in Board.objects.filter(content_gzip__isnull=False):
+        board.content_json = json.loads(gzip.decompress(board.content_gzip))['content']
+        board.content_gzip = None
+        board.save(update_fields=['content_json', 'content_gzip'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('board', '0003_boardrevision'),
+    ]
+
+    operations = [
+        # Só o nome do atributo muda; a coluna continua sendo "content"
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='board',
+                    old_name='content',
+                    new_name='content_json',
+                ),
+                migrations.AlterField(
+                    model_name='board',
+                    name='content_json',
+                    field=models.JSONField(blank=True, db_column='content', default=dict, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='content_gzip',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        # Só o esquema: a conversão dos dados é feita pelo comando convert_board_storage
+        migrations.RunPython(migrations.RunPython.noop, decompress_content),
+    ]
@@ -1,8 +1,24 @@
+import gzip
+import json
+
+import orjson
+from django.conf import settings
 from django.db import models
 
+from realtime.broker import publish
+
+from .history import record_revision
+
 # Create your models here.
 class Board(models.Model):
-    content = models.JSONField(blank=True, null=True, default=dict)
+    # O conteúdo fica em uma das duas colunas conforme BOARD_STORAGE; o código
+    # usa sempre a propriedade `content`, que lê a coluna que estiver preenchida
+    content_json = models.JSONField(blank=True, null=True, default=dict, db_column='content')
+    # Payload completo do GET ({"id", "version", "content"}) comprimido com gzip,
+    # enviado como está para clientes que aceitam Content-Encoding: gzip
+    content_gzip = models.BinaryField(blank=True, null=True)
+    # Incrementada a cada escrita; exposta como ETag para cache e concorrência
+    version = models.PositiveBigIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -10,17 +26,117 @@ class Board(models.Model):
         verbose_name = "Board"
         verbose_name_plural = "Board"  # Singular porque só deve existir um
     
+    @property
+    def content(self):
+        if not hasattr(self, '_content'):
+            if self.content_gzip is not None:
+                self._content = orjson.loads(gzip.decompress(self.content_gzip))['content']
+            else:
+                self._content = self.content_json
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    @property
+    def storage(self):
+        """Formato em que o conteúdo está gravado: 'gzip' ou 'json'"""
+        return 'gzip' if self.content_gzip is not None else 'json'
+
+    def encode_content(self, storage=None):
+        """Grava o conteúdo na coluna de `storage` (por padrão, o BOARD_STORAGE atual)"""
+        if (storage or settings.BOARD_STORAGE) == 'gzip':
+            payload = {"id": self.pk, "version": self.version, "content": self.content}
+            self.content_gzip = gzip.compress(
+                json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode(),
+                settings.BOARD_GZIP_LEVEL,
+            )
+            self.content_json = None
+        else:
+            self.content_json = self.content
+            self.content_gzip = None
+
     def save(self, *args, **kwargs):
         # Garantir que só existe um board
         if not self.pk and Board.objects.exists():
             raise ValueError("Só pode existir um board no sistema")
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.encode_content()
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = [
+                field for field in update_fields if field != 'content'
+            ] + ['content_json', 'content_gzip']
         super().save(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('_content', None)
+        super().refresh_from_db(*args, **kwargs)
     
     @classmethod
-    def get_instance(cls):
+    def current_version(cls):
+        """Retorna a versão do board sem carregar o conteúdo (None se não existir)"""
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first()
+
+    @classmethod
+    async def acurrent_version(cls):
+        return await cls.objects.filter(pk=1).values_list('version', flat=True).afirst()
+
+    @classmethod
+    def get_instance(cls, for_update=False):
         """Retorna a instância única do board, criando se necessário"""
+        if for_update:
+            # Trava a linha até o fim da transação para que escritas concorrentes
+            # sejam aplicadas uma após a outra. O board quase sempre existe, então
+            # tenta o SELECT ... FOR UPDATE direto e só cria na primeira escrita
+            board = cls.objects.select_for_update().filter(pk=1).first()
+            if board is None:
+                cls.objects.get_or_create(pk=1, defaults={'content': {}})
+                board = cls.objects.select_for_update().get(pk=1)
+            return board
         board, _ = cls.objects.get_or_create(pk=1, defaults={'content': {}})
         return board
     
+    def save_content(self, content, delta=None):
+        """
+        Grava um novo conteúdo avançando a versão do board e registrando a
+        revisão no histórico. `delta` é o JSON Patch que levou ao conteúdo,
+        quando já conhecido, e evita recalcular a diferença.
+        """
+        previous = self.content
+        self.content = content
+        self.version += 1
+        self.save(update_fields=['content', 'version', 'updated_at'])
+        record_revision(self, previous, delta)
+
+        # Clientes conectados aplicam o patch; sem ele, buscam o board de novo
+        if delta is not None:
+            publish('board.patch', {"version": self.version, "patch": delta})
+        else:
+            publish('board.replaced', {"version": self.version})
+
+    def __str__(self):
+        return 'Board Principal'
+
+
+class BoardRevision(models.Model):
+    """Revisão do board: keyframe com o conteúdo completo ou delta comprimido"""
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='revisions')
+    version = models.PositiveBigIntegerField()
+    is_keyframe = models.BooleanField(default=False)
+    # Quantos deltas separam esta revisão do keyframe que inicia sua cadeia
+    chain_length = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-version']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'version'], name='unique_board_revision_version'),
+        ]
+
     def __str__(self):
-        return 'Board Principal'
\ No newline at end of file
+        return f'Board v{self.version}'
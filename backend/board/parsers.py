@@ -0,0 +1,6 @@
+from rest_framework.parsers import JSONParser
+
+
+class JSONPatchParser(JSONParser):
+    """Aceita corpos enviados como `application/json-patch+json` (RFC 6902)"""
+    media_type = 'application/json-patch+json'
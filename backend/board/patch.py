@@ -0,0 +1,199 @@
+"""Aplicação de JSON Patch (RFC 6902) sobre o conteúdo do board."""
+import copy
+
+VALID_OPS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class PatchError(ValueError):
+    """Documento de patch inválido ou que não pode ser aplicado."""
+
+
+class PatchConflict(PatchError):
+    """Uma operação `test` falhou: o conteúdo não está no estado esperado."""
+
+
+def parse_pointer(pointer):
+    """Converte um JSON Pointer (RFC 6901) na lista de chaves correspondente"""
+    if not isinstance(pointer, str):
+        raise PatchError("Path must be a string.")
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise PatchError(f"Invalid path: {pointer!r}.")
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer[1:].split('/')]
+
+
+def _array_index(container, key, allow_end=False):
+    if allow_end and key == '-':
+        return len(container)
+    if not key.isdigit() or (len(key) > 1 and key.startswith('0')):
+        raise PatchError(f"Invalid array index: {key!r}.")
+    index = int(key)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise PatchError(f"Array index out of range: {key!r}.")
+    return index
+
+
+def _resolve_parent(document, parts):
+    """Retorna o container que guarda o último segmento do caminho"""
+    node = document
+    for key in parts[:-1]:
+        if isinstance(node, dict):
+            if key not in node:
+                raise PatchError(f"Path not found: {key!r}.")
+            node = node[key]
+        elif isinstance(node, list):
+            node = node[_array_index(node, key)]
+        else:
+            raise PatchError(f"Path not found: {key!r}.")
+    return node
+
+
+def _get(document, parts):
+    if not parts:
+        return document
+    parent = _resolve_parent(document, parts)
+    key = parts[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path not found: {key!r}.")
+        return parent[key]
+    if isinstance(parent, list):
+        return parent[_array_index(parent, key)]
+    raise PatchError(f"Path not found: {key!r}.")
+
+
+def _add(document, parts, value):
+    if not parts:
+        return value
+    parent = _resolve_parent(document, parts)
+    key = parts[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, key, allow_end=True), value)
+    else:
+        raise PatchError(f"Path not found: {key!r}.")
+    return document
+
+
+def _remove(document, parts):
+    if not parts:
+        raise PatchError("Cannot remove the whole document.")
+    parent = _resolve_parent(document, parts)
+    key = parts[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path not found: {key!r}.")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, key))
+    raise PatchError(f"Path not found: {key!r}.")
+
+
+def _replace(document, parts, value):
+    if not parts:
+        return value
+    parent = _resolve_parent(document, parts)
+    key = parts[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path not found: {key!r}.")
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent[_array_index(parent, key)] = value
+    else:
+        raise PatchError(f"Path not found: {key!r}.")
+    return document
+
+
+def _value(operation):
+    if 'value' not in operation:
+        raise PatchError(f"Operation {operation['op']!r} requires a value.")
+    return operation['value']
+
+
+def apply_patch(document, operations):
+    """
+    Aplica as operações sobre `document` e retorna o documento resultante.
+
+    O documento é alterado no lugar para evitar copiar o board inteiro a cada
+    edição; quem chama só deve persistir o resultado se nenhuma exceção for
+    lançada, o que garante a atomicidade exigida pela RFC.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("Patch must be a list of operations.")
+
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in VALID_OPS:
+            raise PatchError(f"Invalid operation: {operation!r}.")
+
+        op = operation['op']
+        parts = parse_pointer(operation.get('path'))
+
+        if op == 'add':
+            document = _add(document, parts, _value(operation))
+        elif op == 'remove':
+            _remove(document, parts)
+        elif op == 'replace':
+            document = _replace(document, parts, _value(operation))
+        elif op == 'test':
+            if _get(document, parts) != _value(operation):
+                raise PatchConflict(f"Test failed at {operation['path']!r}.")
+        else:
+            source = parse_pointer(operation.get('from'))
+            if op == 'move':
+                if source == parts:
+                    continue
+                if parts[:len(source)] == source:
+                    raise PatchError("Cannot move a value into one of its children.")
+                value = _remove(document, source)
+            else:
+                value = copy.deepcopy(_get(document, source))
+            document = _add(document, parts, value)
+
+    return document
+
+
+def escape_pointer(key):
+    """Escapa um segmento de caminho para uso em um JSON Pointer"""
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def make_patch(source, target, path=''):
+    """
+    Gera as operações que transformam `source` em `target`.
+
+    Objetos são comparados chave a chave e listas posição a posição, de forma
+    que mover um elemento do canvas gera apenas a troca das coordenadas dele.
+    """
+    if source == target and type(source) is type(target):
+        return []
+
+    if isinstance(source, dict) and isinstance(target, dict):
+        operations = []
+        for key in source:
+            if key not in target:
+                operations.append({'op': 'remove', 'path': f'{path}/{escape_pointer(key)}'})
+        for key, value in target.items():
+            child = f'{path}/{escape_pointer(key)}'
+            if key in source:
+                operations.extend(make_patch(source[key], value, child))
+            else:
+                operations.append({'op': 'add', 'path': child, 'value': value})
+        return operations
+
+    if isinstance(source, list) and isinstance(target, list):
+        operations = []
+        common = min(len(source), len(target))
+        for index in range(common):
+            operations.extend(make_patch(source[index], target[index], f'{path}/{index}'))
+        for value in target[common:]:
+            operations.append({'op': 'add', 'path': f'{path}/-', 'value': value})
+        # Remove do fim para o início para manter os índices válidos
+        for index in range(len(source) - 1, common - 1, -1):
+            operations.append({'op': 'remove', 'path': f'{path}/{index}'})
+        return operations
+
+    return [{'op': 'replace', 'path': path, 'value': target}]
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from config.cache import bump
+from .models import Board
+
+
+# Invalida o cache de respostas do board; o write-behind, que não grava a cada
+# escrita, chama bump('board') ao confirmar cada uma em memória
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def board_changed(sender, **kwargs):
+    bump('board')
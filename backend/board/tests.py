@@ -1,3 +1,455 @@
-from django.test import TestCase
+import base64
+import copy
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from .blobs import BLOB_DIR, extract_images, store_data_url
+from .buffer import WriteBehindBuffer
+from .history import RevisionNotFound, prune_revisions, rebuild, record_revision
+from .models import Board, BoardRevision
+from .patch import PatchConflict, PatchError, apply_patch, make_patch
+
 
 # Create your tests here.
+@override_settings(BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='json', BOARD_HISTORY_KEYFRAME_INTERVAL=20)
+class WriteQueryCountTests(TestCase):
+    """Escritas: trava e lê a linha uma vez, grava só as colunas do conteúdo e registra a revisão"""
+
+    def setUp(self):
+        board = Board.get_instance()
+        board.save_content({"objects": [{"type": "Rect"}]})
+
+    def test_replace(self):
+        # SAVEPOINT, SELECT ... FOR UPDATE, UPDATE, última revisão, INSERT da revisão, RELEASE
+        with self.assertNumQueries(6) as queries:
+            response = self.client.put('/api/board/', {'content': {"objects": []}}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 3)
+        update = next(q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE'))
+        self.assertNotIn('"created_at"', update)
+
+    def test_patch(self):
+        operations = [{"op": "add", "path": "/objects/-", "value": {"type": "Circle"}}]
+        with self.assertNumQueries(6):
+            response = self.client.patch('/api/board/', operations, content_type='application/json-patch+json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_write_is_rejected_after_one_read(self):
+        # SAVEPOINT, SELECT ... FOR UPDATE, RELEASE
+        with self.assertNumQueries(3):
+            response = self.client.put(
+                '/api/board/', {'content': {"objects": []}}, content_type='application/json', HTTP_IF_MATCH='"1"',
+            )
+        self.assertEqual(response.status_code, 412)
+
+    def test_not_modified(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/board/', HTTP_IF_NONE_MATCH='"2"')
+        self.assertEqual(response.status_code, 304)
+
+
+class ApplyPatchTests(TestCase):
+    def test_operations(self):
+        document = {"objects": [{"type": "Rect"}], "background": "#fff"}
+        operations = [
+            {"op": "add", "path": "/objects/-", "value": {"type": "Circle"}},
+            {"op": "add", "path": "/objects/0", "value": {"type": "Line"}},
+            {"op": "replace", "path": "/background", "value": "#000"},
+            {"op": "copy", "from": "/objects/1", "path": "/selected"},
+            {"op": "move", "from": "/objects/2", "path": "/objects/0"},
+            {"op": "remove", "path": "/objects/1"},
+            {"op": "test", "path": "/selected/type", "value": "Rect"},
+        ]
+        self.assertEqual(apply_patch(document, operations), {
+            "objects": [{"type": "Circle"}, {"type": "Rect"}],
+            "background": "#000",
+            "selected": {"type": "Rect"},
+        })
+
+    def test_escaped_pointer(self):
+        document = apply_patch({}, [{"op": "add", "path": "/a~1b~0c", "value": 1}])
+        self.assertEqual(document, {"a/b~c": 1})
+
+    def test_failed_test_is_a_conflict(self):
+        with self.assertRaises(PatchConflict):
+            apply_patch({"version": 1}, [{"op": "test", "path": "/version", "value": 2}])
+
+    def test_move_into_own_child(self):
+        document = {"group": {"objects": []}}
+        with self.assertRaisesMessage(PatchError, 'children'):
+            apply_patch(document, [{"op": "move", "from": "/group", "path": "/group/objects/0"}])
+
+    def test_invalid_paths(self):
+        for operation in [
+            {"op": "remove", "path": "/missing"},
+            {"op": "replace", "path": "/objects/5", "value": 1},
+            {"op": "add", "path": "/objects/01", "value": 1},
+            {"op": "add", "path": "objects", "value": 1},
+            {"op": "add", "path": "/objects/-"},
+            {"op": "increment", "path": "/objects"},
+        ]:
+            with self.subTest(operation=operation), self.assertRaises(PatchError):
+                apply_patch({"objects": []}, [operation])
+
+    def test_make_patch_round_trip(self):
+        source = {"objects": [{"left": 1}, {"left": 2}, {"left": 3}], "a/b": 1}
+        target = {"objects": [{"left": 5}, {"left": 2}], "zoom": 2}
+        operations = make_patch(source, target)
+        self.assertEqual(apply_patch(copy.deepcopy(source), operations), target)
+        self.assertIn({"op": "replace", "path": "/objects/0/left", "value": 5}, operations)
+
+
+@override_settings(BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='json', RESPONSE_CACHE_BACKEND='off')
+class PatchViewTests(TestCase):
+    def setUp(self):
+        Board.get_instance().save_content({"objects": [{"type": "Rect", "left": 10}]})
+
+    def patch(self, operations):
+        return self.client.patch('/api/board/', operations, content_type='application/json-patch+json')
+
+    def test_applies_operations(self):
+        response = self.patch([{"op": "replace", "path": "/objects/0/left", "value": 20}])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('content', response.json())
+        self.assertEqual(Board.get_instance().content, {"objects": [{"type": "Rect", "left": 20}]})
+
+    def test_failed_test_returns_conflict_and_keeps_content(self):
+        version = Board.current_version()
+        response = self.patch([
+            {"op": "replace", "path": "/objects/0/left", "value": 20},
+            {"op": "test", "path": "/objects/0/type", "value": "Circle"},
+        ])
+        self.assertEqual(response.status_code, 409)
+        board = Board.get_instance()
+        self.assertEqual(board.version, version)
+        self.assertEqual(board.content, {"objects": [{"type": "Rect", "left": 10}]})
+
+    def test_move_into_own_child_is_unprocessable(self):
+        response = self.patch([{"op": "move", "from": "/objects", "path": "/objects/0/children"}])
+        self.assertEqual(response.status_code, 422)
+
+    def test_envelope_and_empty_patch(self):
+        response = self.client.patch(
+            '/api/board/', {"patch": [{"op": "add", "path": "/zoom", "value": 2}]}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.patch([])
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='json', RESPONSE_CACHE_BACKEND='off')
+class ConditionalRequestTests(TestCase):
+    """ETag da versão do board: If-None-Match no GET e If-Match nas escritas"""
+
+    def setUp(self):
+        Board.get_instance().save_content({"objects": [{"type": "Rect"}]})
+        self.version = Board.current_version()
+        self.etag = f'"{self.version}"'
+
+    def get(self, if_none_match):
+        return self.client.get('/api/board/', HTTP_IF_NONE_MATCH=if_none_match)
+
+    def write(self, method, if_match=None):
+        headers = {} if if_match is None else {"HTTP_IF_MATCH": if_match}
+        body = {
+            'post': {"content": {"objects": []}},
+            'put': {"content": {"objects": []}},
+            'patch': [{"op": "add", "path": "/zoom", "value": 2}],
+            'delete': None,
+        }[method]
+        content_type = 'application/json-patch+json' if method == 'patch' else 'application/json'
+        return getattr(self.client, method)('/api/board/', body, content_type=content_type, **headers)
+
+    def test_get_returns_the_etag(self):
+        response = self.client.get('/api/board/')
+        self.assertEqual((response.status_code, response['ETag']), (200, self.etag))
+
+    def test_get_not_modified(self):
+        # If-None-Match usa a comparação fraca: W/"v" também vale
+        for header in (self.etag, f'W/{self.etag}', '*', f'"0", {self.etag}'):
+            with self.subTest(header=header):
+                response = self.get(header)
+                self.assertEqual((response.status_code, response['ETag']), (304, self.etag))
+                self.assertEqual(response.content, b'')
+
+    def test_get_modified(self):
+        for header in ('"0"', f'W/"{self.version + 1}"', 'lixo'):
+            with self.subTest(header=header):
+                response = self.get(header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['content'], {"objects": [{"type": "Rect"}]})
+
+    def test_writes_with_a_stale_or_weak_etag_fail(self):
+        # If-Match usa a comparação forte: uma ETag fraca nunca coincide
+        for method in ('post', 'put', 'patch', 'delete'):
+            for header in ('"0"', f'W/{self.etag}'):
+                with self.subTest(method=method, header=header):
+                    response = self.write(method, header)
+                    self.assertEqual((response.status_code, response['ETag']), (412, self.etag))
+                    self.assertEqual(response.json(), {"error": 'Board was modified by another client.'})
+        board = Board.get_instance()
+        self.assertEqual((board.version, board.content), (self.version, {"objects": [{"type": "Rect"}]}))
+
+    def test_writes_with_a_matching_etag(self):
+        for method, expected_status in (('post', 200), ('put', 200), ('patch', 200), ('delete', 204)):
+            for header in ('{etag}', '*', '"0", {etag}', None):
+                with self.subTest(method=method, header=header):
+                    response = self.write(method, header and header.format(etag=self.etag))
+                    self.assertEqual(response.status_code, expected_status)
+                    self.version += 1
+                    self.etag = f'"{self.version}"'
+                    self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(Board.current_version(), self.version)
+
+    @override_settings(RESPONSE_CACHE_BACKEND='locmem')
+    def test_cached_get_not_modified(self):
+        caches['responses'].clear()
+        self.addCleanup(caches['responses'].clear)
+        self.assertEqual(self.client.get('/api/board/')['X-Cache'], 'MISS')
+        for header in (self.etag, f'W/{self.etag}', '*'):
+            with self.subTest(header=header):
+                response = self.get(header)
+                self.assertEqual((response.status_code, response['X-Cache']), (304, 'HIT'))
+        self.assertEqual(self.get('"0"').status_code, 200)
+
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+PNG_DATA_URL = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+
+
+@override_settings(BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='json', RESPONSE_CACHE_BACKEND='off')
+class BlobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Board.get_instance().save_content({"objects": [{"type": "Rect", "left": 10}]})
+
+    def stored_blobs(self):
+        root = os.path.join(self.media_root, BLOB_DIR)
+        return sorted(name for _, _, files in os.walk(root) for name in files)
+
+    def test_identical_images_are_stored_once(self):
+        content = {"objects": [{"type": "image", "src": PNG_DATA_URL}, {"type": "image", "src": PNG_DATA_URL}]}
+
+        content, saved = extract_images(content)
+
+        url = content["objects"][0]["src"]
+        self.assertEqual(content["objects"][1]["src"], url)
+        self.assertEqual(saved, 2 * (len(PNG_DATA_URL) - len(url)))
+        digest = hashlib.sha256(PNG).hexdigest()
+        self.assertEqual(self.stored_blobs(), [f'{digest}.png'])
+        self.assertEqual(store_data_url(PNG_DATA_URL), url)
+        self.assertEqual(len(self.stored_blobs()), 1)
+
+    def test_invalid_and_non_src_values_are_kept(self):
+        content = {
+            "objects": [{"type": "image", "src": 'data:image/png;base64,não é base64'}],
+            "note": PNG_DATA_URL,
+        }
+
+        self.assertEqual(extract_images(copy.deepcopy(content)), (content, 0))
+        self.assertIsNone(store_data_url('data:text/plain;base64,YQ=='))
+        self.assertEqual(self.stored_blobs(), [])
+
+    def test_failed_precondition_stores_nothing(self):
+        response = self.client.put(
+            '/api/board/', {"content": {"objects": [{"type": "image", "src": PNG_DATA_URL}]}},
+            content_type='application/json', HTTP_IF_MATCH='"999"',
+        )
+
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.stored_blobs(), [])
+
+    def test_rejected_patch_stores_nothing(self):
+        response = self.client.patch('/api/board/', [
+            {"op": "add", "path": "/objects/-", "value": {"type": "image", "src": PNG_DATA_URL}},
+            {"op": "remove", "path": "/missing"},
+        ], content_type='application/json-patch+json')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.stored_blobs(), [])
+
+    def test_patch_extracts_src_values_but_not_test_values(self):
+        Board.get_instance().save_content({"objects": [{"type": "Rect", "left": 10}], "note": PNG_DATA_URL})
+
+        response = self.client.patch('/api/board/', [
+            {"op": "test", "path": "/note", "value": PNG_DATA_URL},
+            {"op": "add", "path": "/objects/-", "value": {"type": "image", "src": PNG_DATA_URL}},
+            {"op": "add", "path": "/objects/0/src", "value": PNG_DATA_URL},
+        ], content_type='application/json-patch+json')
+
+        self.assertEqual(response.status_code, 200)
+        content = Board.get_instance().content
+        url = content["objects"][1]["src"]
+        self.assertTrue(url.endswith('.png') and BLOB_DIR in url)
+        self.assertEqual(content["objects"][0]["src"], url)
+        self.assertEqual(content["note"], PNG_DATA_URL)
+        self.assertEqual(len(self.stored_blobs()), 1)
+
+
+@override_settings(BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='json', BOARD_HISTORY_KEYFRAME_INTERVAL=3)
+class HistoryTests(TestCase):
+    def setUp(self):
+        self.board = Board.get_instance()
+        self.contents = {self.board.version: self.board.content}
+        for left in range(7):
+            self.board.save_content({"objects": [{"type": "Rect", "left": left}]})
+            self.contents[self.board.version] = self.board.content
+
+    def revisions(self):
+        return list(BoardRevision.objects.order_by('version').values_list('version', 'is_keyframe', 'chain_length'))
+
+    def test_keyframe_every_interval(self):
+        self.assertEqual(self.revisions(), [
+            (2, True, 0), (3, False, 1), (4, False, 2),
+            (5, True, 0), (6, False, 1), (7, False, 2),
+            (8, True, 0),
+        ])
+
+    def test_rebuild_every_version(self):
+        for version in range(2, 9):
+            with self.subTest(version=version):
+                self.assertEqual(rebuild(self.board, version), self.contents[version])
+        with self.assertRaises(RevisionNotFound):
+            rebuild(self.board, 1)
+
+    def write(self, content, previous_version):
+        previous = self.board.content
+        self.board.content = content
+        self.board.version += 3
+        self.board.save(update_fields=['content', 'version', 'updated_at'])
+        return record_revision(self.board, previous, previous_version=previous_version)
+
+    def test_grouped_writes_continue_the_chain(self):
+        # Escritas agrupadas pelo write-behind: a versão salta, mas parte da última revisão
+        revision = self.write({"objects": []}, previous_version=8)
+        self.assertEqual((revision.version, revision.is_keyframe), (11, False))
+        self.assertEqual(rebuild(self.board, 11), {"objects": []})
+
+    def test_gap_starts_a_new_chain(self):
+        revision = self.write({"objects": []}, previous_version=10)
+        self.assertTrue(revision.is_keyframe)
+        self.assertEqual(rebuild(self.board, 11), {"objects": []})
+
+    def test_prune_inside_a_chain_promotes_the_oldest_kept_revision(self):
+        # Mantém 6 e 7, que eram deltas da cadeia iniciada em 5
+        deleted = prune_revisions(self.board, max_revisions=3, max_age_days=0, max_bytes=0)
+
+        self.assertEqual(deleted, 4)
+        self.assertEqual(self.revisions(), [(6, True, 0), (7, False, 1), (8, True, 0)])
+        for version in (6, 7, 8):
+            self.assertEqual(rebuild(self.board, version), self.contents[version])
+        with self.assertRaises(RevisionNotFound):
+            rebuild(self.board, 5)
+
+    def test_prune_keeps_the_latest_revision(self):
+        prune_revisions(self.board, max_revisions=0, max_age_days=0, max_bytes=1)
+        self.assertEqual(self.revisions(), [(8, True, 0)])
+
+    def test_revision_endpoints(self):
+        response = self.client.get('/api/board/revisions/3/')
+        self.assertEqual(response.json()['content'], self.contents[3])
+        self.assertEqual(self.client.get('/api/board/revisions/1/').status_code, 404)
+
+        response = self.client.post('/api/board/revisions/3/restore/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 9)
+        self.assertEqual(Board.get_instance().content, self.contents[3])
+
+
+@override_settings(BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='json', RESPONSE_CACHE_BACKEND='off')
+class ConvertBoardStorageTests(TestCase):
+    def setUp(self):
+        Board.get_instance().save_content({"objects": [{"type": "Rect"}]})
+
+    def convert(self, *args):
+        out = io.StringIO()
+        call_command('convert_board_storage', *args, stdout=out)
+        return out.getvalue()
+
+    def test_converts_both_ways_keeping_the_version(self):
+        version = Board.current_version()
+
+        self.convert('--to', 'gzip')
+        board = Board.get_instance()
+        self.assertEqual((board.storage, board.version, board.content_json), ('gzip', version, None))
+        self.assertEqual(board.content, {"objects": [{"type": "Rect"}]})
+
+        with override_settings(BOARD_STORAGE='gzip'):
+            response = self.client.get('/api/board/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            response = self.client.get('/api/board/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(json.loads(b''.join(response.streaming_content))['version'], version)
+
+        self.assertIn('já está', self.convert('--to', 'gzip'))
+        self.convert()
+        board = Board.get_instance()
+        self.assertEqual((board.storage, board.content_gzip), ('json', None))
+        self.assertEqual(board.content, {"objects": [{"type": "Rect"}]})
+
+
+@override_settings(BOARD_STORAGE='json', RESPONSE_CACHE_BACKEND='off')
+class WriteBehindBufferTests(TestCase):
+    def setUp(self):
+        Board.get_instance()
+        self.buffer = WriteBehindBuffer(interval=60)
+        self.addCleanup(self.cancel_timer)
+
+    def cancel_timer(self):
+        if self.buffer._timer is not None:
+            self.buffer._timer.cancel()
+
+    def test_flush_writes_outside_the_lock(self):
+        self.buffer.stage({"objects": [1]})
+        self.buffer.stage({"objects": [2]})
+        acquired = []
+
+        def try_lock():
+            acquired.append(self.buffer.lock.acquire(timeout=1))
+            if acquired[-1]:
+                self.buffer.lock.release()
+
+        def record(*args, **kwargs):
+            # Outra thread (uma leitura ou escrita do board) não fica esperando a gravação
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return record_revision(*args, **kwargs)
+
+        with mock.patch('board.buffer.record_revision', side_effect=record):
+            self.buffer.flush()
+
+        self.assertEqual(acquired, [True])
+        board = Board.get_instance()
+        self.assertEqual((board.version, board.content), (3, {"objects": [2]}))
+        self.assertEqual(self.buffer.stats()['pending'], 0)
+        self.assertEqual(self.buffer.stats()['coalesced'], 1)
+
+    def test_failed_flush_keeps_pending_writes_and_rearms_the_timer(self):
+        self.buffer.stage({"objects": [1]})
+        self.cancel_timer()
+        self.buffer._timer = None
+
+        with mock.patch('board.buffer.Board.get_instance', side_effect=DatabaseError), self.assertLogs('board.buffer'):
+            self.buffer.flush()
+
+        self.assertEqual(self.buffer.stats()['pending'], 1)
+        self.assertIsNotNone(self.buffer._timer)
+        self.cancel_timer()
+        self.buffer.flush()
+        self.assertEqual(Board.get_instance().content, {"objects": [1]})
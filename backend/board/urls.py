@@ -1,6 +1,11 @@
 from django.urls import path
-from .views import BoardView
+from config.async_views import pick
+from .views import AsyncBoardView, BoardView, BoardRevisionListView, BoardRevisionDetailView, BoardRevisionRestoreView, BoardWriteBehindView
 
 urlpatterns = [
-    path("", BoardView.as_view()),
+    path("", pick(BoardView, AsyncBoardView).as_view()),
+    path("write-behind/", BoardWriteBehindView.as_view()),
+    path("revisions/", BoardRevisionListView.as_view()),
+    path("revisions/<int:version>/", BoardRevisionDetailView.as_view()),
+    path("revisions/<int:version>/restore/", BoardRevisionRestoreView.as_view()),
 ]
\ No newline at end of file
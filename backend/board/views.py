@@ -1,45 +1,287 @@
+import zlib
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Board
+from rest_framework.settings import api_settings
+from .models import Board, BoardRevision
+from .buffer import get_buffer, current_version, acurrent_version, readable_board, writable_board, commit_content, patch_content
+from .history import rebuild, RevisionNotFound
+from .blobs import extract_images, extract_patch_images, save_blobs
+from .parsers import JSONPatchParser
+from .patch import PatchError, PatchConflict
+from asgiref.sync import sync_to_async
+from config.async_views import AsyncAPIView
+from config.cache import cache_response, accepts_gzip, etag_matches
+from config.metrics import observe
+from config.replicas import read_replica
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
 from django.views.decorators.csrf import csrf_exempt
 
 # Error message constants
 CONTENT_REQUIRED_ERROR = "Content is required."
 BOARD_NOT_FOUND_ERROR = "Board not found."
+REVISION_NOT_FOUND_ERROR = "Revision not found."
+PATCH_REQUIRED_ERROR = "A list of JSON Patch operations is required."
+VERSION_MISMATCH_ERROR = "Board was modified by another client."
+
+
+def board_etag(version):
+    """ETag forte derivado da versão do board"""
+    return quote_etag(str(version))
+
+
+def board_response(board, status_code=status.HTTP_200_OK, include_content=True):
+    data = {"id": board.id, "version": board.version}
+    if include_content:
+        data["content"] = board.content
+    response = Response(data, status=status_code)
+    response['ETag'] = board_etag(board.version)
+    return response
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def gunzip_chunks(data):
+    """Descomprime o payload aos poucos para não materializar o JSON inteiro"""
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    view = memoryview(data)
+    for start in range(0, len(view), STREAM_CHUNK_SIZE):
+        chunk = decompressor.decompress(view[start:start + STREAM_CHUNK_SIZE])
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def compressed_board_row():
+    return Board.objects.filter(pk=1).values_list('version', 'content_gzip')
+
+
+def compressed_board_response(request, row):
+    """
+    Responde o GET direto com os bytes comprimidos guardados no banco, sem
+    descomprimir, interpretar e serializar o conteúdo. `row` é a linha de
+    `compressed_board_row()`. Retorna None se o board ainda não estiver
+    armazenado em gzip.
+    """
+    if row is None or row[1] is None:
+        return None
+    version, data = row
+
+    if accepts_gzip(request.headers.get('Accept-Encoding', '')):
+        response = HttpResponse(bytes(data), content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(gunzip_chunks(data), content_type='application/json')
+    response['ETag'] = board_etag(version)
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def precondition_failed(request, board):
+    """
+    Retorna uma resposta 412 quando o cabeçalho If-Match não corresponde à
+    versão atual do board, ou None se a escrita pode prosseguir.
+    """
+    if_match = request.headers.get('If-Match')
+    if not if_match or etag_matches(if_match, board_etag(board.version)):
+        return None
+    response = Response({"error": VERSION_MISMATCH_ERROR}, status=status.HTTP_412_PRECONDITION_FAILED)
+    response['ETag'] = board_etag(board.version)
+    return response
+
+
+def record_payload(request, response):
+    """Tamanho do board recebido nas escritas e enviado nas leituras (board_payload_bytes)"""
+    if request.method in ('POST', 'PUT', 'PATCH'):
+        size = request.META.get('CONTENT_LENGTH') or ''
+        if size.isdigit():
+            observe('board_payload_bytes', int(size), direction='received', method=request.method)
+        return
+    if request.method != 'GET' or response.status_code != 200 or response.streaming:
+        return
+
+    def record(response):
+        observe('board_payload_bytes', len(response.content), direction='sent', method=request.method)
+
+    if getattr(response, 'is_rendered', True):
+        record(response)
+    else:
+        response.add_post_render_callback(record)
+
 
 # Create your views here.
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('board'), name='dispatch')
+@method_decorator(read_replica, name='get')
 class BoardView(APIView):
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, JSONPatchParser]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record_payload(request, response)
+        return response
+
     def get(self, request):
-        board = Board.get_instance()
-        return Response({"id": board.id, "content": board.content})
-        
+        # Se o cliente já tem a versão atual, responde sem carregar o conteúdo
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            version = current_version()
+            if version is not None and etag_matches(if_none_match, board_etag(version), weak=True):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = board_etag(version)
+                return response
+
+        # Sem write-behind, o payload comprimido no banco já é a resposta pronta
+        if settings.BOARD_STORAGE == 'gzip' and get_buffer() is None:
+            response = compressed_board_response(request, compressed_board_row().first())
+            if response is not None:
+                return response
+
+        board = readable_board()
+        return board_response(board)
+
     def post(self, request):
         content = request.data.get('content')
 
         if not content:
             return Response({"error": CONTENT_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
         
-        board = Board.get_instance()
-        board.content = content
-        board.save()
-        return Response({"id": board.id, "content": board.content}, status=status.HTTP_200_OK)
+        with writable_board() as board:
+            failed = precondition_failed(request, board)
+            if failed:
+                return failed
+            # Imagens embutidas vão para o storage antes de entrar no JSON do
+            # board, e só depois da precondição, para um 412 não gravar nada
+            content, _ = extract_images(content)
+            commit_content(board, content)
+        return board_response(board)
     
     def put(self, request):
-        board = Board.get_instance()
-        
         content = request.data.get('content')
         if not content:
             return Response({"error": CONTENT_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
         
-        board.content = content
-        board.save()
-        return Response({"id": board.id, "content": board.content}, status=status.HTTP_200_OK)
+        with writable_board() as board:
+            failed = precondition_failed(request, board)
+            if failed:
+                return failed
+            # Imagens embutidas vão para o storage antes de entrar no JSON do
+            # board, e só depois da precondição, para um 412 não gravar nada
+            content, _ = extract_images(content)
+            commit_content(board, content)
+        return board_response(board)
+
+    def patch(self, request):
+        # Aceita o patch puro (RFC 6902) ou envelopado em {"patch": [...]}
+        operations = request.data
+        if isinstance(operations, dict):
+            operations = operations.get('patch')
+        if not isinstance(operations, list) or not operations:
+            return Response({"error": PATCH_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        with writable_board() as board:
+            failed = precondition_failed(request, board)
+            if failed:
+                return failed
+            # As URLs dos blobs entram no patch, mas os arquivos só são
+            # gravados se ele for aplicado
+            blobs = {}
+            operations = extract_patch_images(operations, blobs)
+            try:
+                content = patch_content(board, operations)
+            except PatchConflict as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+            except PatchError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+            save_blobs(blobs)
+            commit_content(board, content, delta=operations)
+
+        # Sem o conteúdo na resposta: o cliente já tem o que acabou de editar
+        return board_response(board, include_content=False)
         
     def delete(self, request):
+        with writable_board() as board:
+            failed = precondition_failed(request, board)
+            if failed:
+                return failed
+            commit_content(board, {})
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response['ETag'] = board_etag(board.version)
+        return response
+
+
+# Versão assíncrona (API_ASYNC_VIEWS): o GET não ocupa a thread das views
+# síncronas enquanto espera o banco; as escritas, que travam a linha do board
+# em uma transação, são as herdadas e rodam fora do event loop
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('board'), name='dispatch')
+@method_decorator(read_replica, name='get')
+class AsyncBoardView(AsyncAPIView, BoardView):
+    async def get(self, request):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            version = await acurrent_version()
+            if version is not None and etag_matches(if_none_match, board_etag(version), weak=True):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = board_etag(version)
+                return response
+
+        if settings.BOARD_STORAGE == 'gzip' and get_buffer() is None:
+            response = compressed_board_response(request, await compressed_board_row().afirst())
+            if response is not None:
+                return response
+
+        board = await sync_to_async(readable_board)()
+        return board_response(board)
+
+
+# Histórico de revisões do board
+class BoardRevisionListView(APIView):
+    def get(self, request):
+        board = Board.get_instance()
+        revisions = BoardRevision.objects.filter(board=board).values(
+            'version', 'is_keyframe', 'size', 'created_at'
+        )
+        return Response(list(revisions))
+
+
+class BoardRevisionDetailView(APIView):
+    def get(self, request, version):
         board = Board.get_instance()
-        board.content = {}
-        board.save()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        try:
+            content = rebuild(board, version)
+        except RevisionNotFound:
+            return Response({"error": REVISION_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"version": version, "content": content})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BoardRevisionRestoreView(APIView):
+    def post(self, request, version):
+        with writable_board() as board:
+            failed = precondition_failed(request, board)
+            if failed:
+                return failed
+            try:
+                content = rebuild(board, version)
+            except RevisionNotFound:
+                return Response({"error": REVISION_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+            # A restauração é uma nova escrita: o histórico posterior é preservado
+            commit_content(board, content)
+        return board_response(board)
+
+
+class BoardWriteBehindView(APIView):
+    def get(self, request):
+        buffer = get_buffer()
+        if buffer is None:
+            return Response({"enabled": False})
+        return Response({"enabled": True, **buffer.stats()})
@@ -0,0 +1,54 @@
+"""
+Base das views assíncronas da API, usadas com API_ASYNC_VIEWS sob ASGI.
+
+O APIView do DRF só despacha handlers síncronos, que o Django executa em uma
+única thread compartilhada por todas as requisições do worker: uma escrita
+lenta atrasa as leituras de todos. `AsyncAPIView` faz o mesmo ciclo do
+APIView.dispatch (request do DRF, negociação, autenticação, tratamento de
+exceções e finalize_response) no event loop, e as views que herdam dela usam
+o ORM assíncrono e I/O de arquivos fora do loop.
+
+Handlers que continuam síncronos (as escritas que dependem de transações,
+que o ORM assíncrono não oferece) são herdados da view original e rodam via
+sync_to_async, exatamente como antes.
+"""
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.functional import classproperty
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    @classproperty
+    def view_is_async(cls):
+        return True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # A autenticação pode consultar o banco (ex.: Basic): fora do event loop
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def pick(sync_view, async_view):
+    """A view da rota conforme API_ASYNC_VIEWS (lido ao carregar as URLs)"""
+    return async_view if settings.API_ASYNC_VIEWS else sync_view
@@ -0,0 +1,228 @@
+"""
+Cache de respostas dos GETs, invalidado por versão de recurso.
+
+Cada recurso ('lists', 'list:<id>', 'photos', 'board') tem um token de versão
+guardado no próprio cache e trocado a cada escrita (sinais de save/delete dos
+modelos e as escritas que não passam por eles). A chave de uma resposta inclui
+os tokens dos recursos de que ela depende, então uma escrita torna inalcançáveis
+exatamente as respostas afetadas, sem varrer nada. Um acerto lê só o cache:
+nenhuma consulta ao banco.
+
+Tokens são aleatórios, não contadores: se um for despejado pelo LRU, o novo
+token invalida tudo daquele recurso em vez de reaproveitar uma versão antiga.
+
+O backend é o cache 'responses' de CACHES (ver config/settings.py). Com o
+backend em memória, cada processo tem seus próprios tokens, o que só é correto
+com um único processo de aplicação.
+"""
+import hashlib
+import os
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .replicas import pinned
+
+VERSION_PREFIX = 'version:'
+RESPONSE_PREFIX = 'response:'
+
+# Cabeçalhos da view que fazem parte da resposta guardada
+STORED_HEADERS = ('Content-Type', 'Content-Encoding', 'ETag', 'Vary', 'Allow', 'Cache-Control', 'Last-Modified')
+
+
+def response_cache():
+    return caches['responses']
+
+
+def versions(resources):
+    """Token atual de cada recurso, criando os que ainda não existem"""
+    cache = response_cache()
+    keys = [VERSION_PREFIX + resource for resource in resources]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # add() não sobrescreve um token criado ao mesmo tempo por outro worker
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*resources):
+    """Invalida as respostas dos recursos depois do commit da escrita"""
+    if settings.RESPONSE_CACHE_BACKEND == 'off':
+        return
+
+    def run():
+        response_cache().set_many(
+            {VERSION_PREFIX + resource: uuid.uuid4().hex for resource in resources}, timeout=None,
+        )
+
+    transaction.on_commit(run)
+
+
+def accepts_gzip(header):
+    """
+    Indica se o Accept-Encoding aceita gzip, respeitando os q-values:
+    `gzip;q=0` recusa, e `*` vale para gzip quando ele não aparece sozinho.
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = [value.strip() for value in part.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    if 'gzip' in qualities:
+        return qualities['gzip'] > 0
+    if 'x-gzip' in qualities:
+        return qualities['x-gzip'] > 0
+    return qualities.get('*', 0) > 0
+
+
+def response_key(request, resources):
+    """Chave da resposta: versões, caminho, query string e o que muda a representação"""
+    vary = '|'.join((
+        request.get_full_path(),
+        request.headers.get('Accept', ''),
+        # Com `gzip;q=0` o cliente recusa gzip mesmo citando o nome
+        'gzip' if accepts_gzip(request.headers.get('Accept-Encoding', '')) else '',
+        # Um cliente fixado no primário não pode receber uma resposta da réplica
+        # guardada sob os tokens novos, anterior à escrita que ele acabou de fazer
+        'primary' if pinned(request) else '',
+        *versions(resources),
+    ))
+    return RESPONSE_PREFIX + hashlib.sha256(vary.encode()).hexdigest()
+
+
+def etag_matches(header, etag, weak=False):
+    """
+    Indica se `etag` está na lista de um cabeçalho If-Match/If-None-Match. O
+    If-None-Match usa a comparação fraca (`weak`), que ignora o prefixo W/; no
+    If-Match, uma ETag fraca nunca coincide.
+    """
+    etags = parse_etags(header)
+    if weak:
+        etags = [value[2:] if value.startswith('W/') else value for value in etags]
+    return '*' in etags or etag in etags
+
+
+def cached_response(request, entry):
+    status, headers, content = entry
+    etag = dict(headers).get('ETag')
+    if etag and etag_matches(request.headers.get('If-None-Match', ''), etag, weak=True):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+    else:
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def store_response(key, response):
+    """Guarda a resposta 200 de um GET; retorna a resposta marcada como MISS"""
+    if response.status_code != 200 or response.streaming or response.has_header('Set-Cookie'):
+        return response
+
+    def store(response):
+        headers = [(header, response[header]) for header in STORED_HEADERS if response.has_header(header)]
+        # Lida da réplica, a resposta pode ser anterior à escrita que gerou o
+        # token atual: vale só pelo atraso máximo da réplica (ver config/replicas.py)
+        timeout = settings.DB_REPLICA_MAX_LAG_SECONDS if getattr(response, 'from_replica', False) else DEFAULT_TIMEOUT
+        response_cache().set(key, (response.status_code, headers, response.content), timeout)
+
+    if getattr(response, 'is_rendered', True):
+        store(response)
+    else:
+        # Respostas do DRF só têm o corpo depois de renderizadas
+        response.add_post_render_callback(store)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_response(*resources):
+    """
+    Decorator de view (use com method_decorator em 'dispatch') que guarda as
+    respostas 200 dos GETs e as serve enquanto os recursos não mudarem. Os nomes
+    podem usar os parâmetros da URL, ex.: cache_response('list:{list_id}').
+    Funciona também com views assíncronas; o acesso ao cache sai do event loop.
+    """
+    def lookup(request, kwargs):
+        key = response_key(request, [resource.format(**kwargs) for resource in resources])
+        return key, response_cache().get(key)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                if request.method != 'GET' or settings.RESPONSE_CACHE_BACKEND == 'off':
+                    return await view(request, *args, **kwargs)
+
+                key, entry = await sync_to_async(lookup)(request, kwargs)
+                if entry is not None:
+                    return cached_response(request, entry)
+                return store_response(key, await view(request, *args, **kwargs))
+            return wrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != 'GET' or settings.RESPONSE_CACHE_BACKEND == 'off':
+                return view(request, *args, **kwargs)
+
+            key, entry = lookup(request, kwargs)
+            if entry is not None:
+                return cached_response(request, entry)
+            return store_response(key, view(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    Cache em arquivos que despeja os menos usados: cada leitura atualiza o
+    mtime do arquivo e, ao passar de MAX_ENTRIES, saem os de mtime mais antigo.
+    O FileBasedCache do Django escolhe os arquivos removidos ao acaso.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except OSError:
+                pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(name):
+            try:
+                return os.path.getmtime(name)
+            except OSError:
+                return time.time()
+
+        filelist.sort(key=last_used)
+        for name in filelist[:len(filelist) // self._cull_frequency]:
+            self._delete(name)
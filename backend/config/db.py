@@ -0,0 +1,89 @@
+"""
+Utilitários de banco compartilhados pelos apps.
+
+As duas funções escrevem com SQL próprio, em uma única consulta, e por isso
+não passam pelo ciclo de vida dos modelos: não disparam pre_save/post_save nem
+pre_delete/post_delete, não aplicam auto_now (passe `updated_at` em `values`)
+e não seguem cascatas de ForeignKey (on_delete). Quem chama é responsável pelo
+que os sinais fariam (invalidar o cache, publicar eventos, registrar
+tombstones). Só usam a API documentada de `Model._meta` para montar o SQL.
+"""
+from django.db import connections, router
+
+
+def where(model, connection, filters):
+    """Cláusula WHERE com igualdades nas colunas dos campos em `filters`"""
+    quote = connection.ops.quote_name
+    opts = model._meta
+    conditions, params = [], []
+    for name, value in filters.items():
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        if isinstance(value, (list, tuple, set)):
+            value = list(value)
+            conditions.append(f'{quote(field.column)} IN ({", ".join(["%s"] * len(value))})')
+            params.extend(field.get_db_prep_value(item, connection) for item in value)
+        else:
+            conditions.append(f'{quote(field.column)} = %s')
+            params.append(field.get_db_prep_value(value, connection))
+    return ' AND '.join(conditions), params
+
+
+def update_returning(model, fields, filters, **values):
+    """
+    Equivale a `model.objects.filter(**filters).update(**values)`, mas em vez da
+    contagem retorna as linhas alteradas como dicts com os campos `fields`, na
+    mesma consulta (UPDATE ... RETURNING; Postgres e SQLite >= 3.35). `filters`
+    são igualdades por campo (uma lista vira IN). Lista vazia significa que
+    nenhuma linha casou com o filtro. Valores inválidos para o campo levantam
+    ValidationError, como no update() do ORM.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    opts = model._meta
+
+    assignments, params = [], []
+    for name, value in values.items():
+        field = opts.get_field(name)
+        assignments.append(f'{quote(field.column)} = %s')
+        params.append(field.get_db_prep_save(value, connection))
+    condition, where_params = where(model, connection, filters)
+
+    columns = [opts.get_field(name) for name in fields]
+    returning = ', '.join(quote(field.column) for field in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {quote(opts.db_table)} SET {", ".join(assignments)} WHERE {condition} RETURNING {returning}',
+            params + where_params,
+        )
+        rows = cursor.fetchall()
+
+    # Os mesmos conversores que o ORM aplica na leitura (ex.: booleanos do SQLite)
+    converters = []
+    for field in columns:
+        col = field.get_col(opts.db_table)
+        converters.append((col, connection.ops.get_db_converters(col) + field.get_db_converters(connection)))
+    results = []
+    for row in rows:
+        result = {}
+        for name, (col, field_converters), value in zip(fields, converters, row):
+            for converter in field_converters:
+                value = converter(value, col, connection)
+            result[name] = value
+        results.append(result)
+    return results
+
+
+def delete_by_ids(model, ids, **filters):
+    """
+    Um único DELETE ... WHERE id IN (...), opcionalmente com igualdades em
+    outras colunas (`filters`), sem buscar as linhas antes. Retorna quantas
+    linhas foram apagadas.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    condition, params = where(model, connection, {"pk": ids, **filters})
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE {condition}', params)
+        return cursor.rowcount
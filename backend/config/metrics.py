@@ -0,0 +1,325 @@
+"""
+Métricas de desempenho por rota, no formato texto do Prometheus, e o cabeçalho
+Server-Timing.
+
+O middleware abre uma medição por requisição (em um ContextVar, que acompanha
+a view também quando ela roda em outra thread sob ASGI). As consultas ao banco
+são contadas e cronometradas por um execute_wrapper instalado em cada conexão;
+o parser, o renderer e o acesso a arquivos das fotos marcam as próprias fases
+com `timed`. No fim, a requisição alimenta histogramas por rota (latência,
+consultas, fases e tamanhos) e o detalhamento vai para o Server-Timing.
+
+Cada processo acumula os histogramas em memória. Com METRICS_DIR configurado,
+os processos gravam periodicamente um retrato em `<dir>/<pid>.json` e o
+/metrics de qualquer worker soma todos eles; o diretório deve começar vazio a
+cada implantação. Quando um worker termina (reciclado por max_requests, por
+exemplo), o gunicorn soma o retrato dele a `<dir>/archive.json` e o remove,
+então os contadores só crescem e um pid reaproveitado começa do zero.
+"""
+import atexit
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 256 B a 16 MB, de 4 em 4
+SIZE_BUCKETS = tuple(4 ** n for n in range(4, 13))
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Soma dos retratos dos workers já encerrados, em METRICS_DIR
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = '.lock'
+
+METRICS = {
+    'http_request_duration_seconds': ('Latência das requisições por rota', LATENCY_BUCKETS),
+    'http_request_phase_seconds': ('Tempo de cada fase da requisição (db, parse, serialize, storage)', LATENCY_BUCKETS),
+    'http_request_queries': ('Consultas ao banco por requisição', QUERY_BUCKETS),
+    'http_request_size_bytes': ('Tamanho do corpo das requisições', SIZE_BUCKETS),
+    'http_response_size_bytes': ('Tamanho do corpo das respostas (exceto streaming)', SIZE_BUCKETS),
+    'board_payload_bytes': ('Tamanho do board recebido nas escritas e enviado nas leituras', SIZE_BUCKETS),
+}
+
+
+class Registry:
+    """Histogramas do processo: (nome, rótulos) -> contagem por bucket, +Inf e soma"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self._timer = None
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+            self._timer = None
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][1]
+        key = (name, tuple(sorted((label, str(text)) for label, text in labels.items())))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(buckets) + 2)
+            series[bisect_left(buckets, value)] += 1
+            series[-1] += value
+            if settings.METRICS_DIR and self._timer is None:
+                self._timer = threading.Timer(settings.METRICS_FLUSH_SECONDS, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def snapshot(self):
+        with self.lock:
+            return [[name, list(labels), list(series)] for (name, labels), series in self.series.items()]
+
+    def flush(self):
+        """Grava o retrato do processo em METRICS_DIR para os outros workers"""
+        with self.lock:
+            self._timer = None
+            empty = not self.series
+        # Sem números não há o que gravar (nem settings no mestre do gunicorn)
+        if empty or not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_snapshot(os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json'), self.snapshot())
+
+    def collect(self):
+        """Histogramas deste processo somados aos retratos dos demais"""
+        snapshots = [self.snapshot()]
+        if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+            own = f'{os.getpid()}.json'
+            # Um worker arquivado aparece no arquivo ou no retrato dele, nunca nos dois
+            with directory_lock(settings.METRICS_DIR, fcntl.LOCK_SH):
+                for filename in os.listdir(settings.METRICS_DIR):
+                    if filename == own or not filename.endswith('.json'):
+                        continue
+                    snapshot = read_snapshot(os.path.join(settings.METRICS_DIR, filename))
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+        return merge(snapshots)
+
+
+@contextmanager
+def directory_lock(directory, operation):
+    with open(os.path.join(directory, LOCK_FILE), 'a') as file:
+        fcntl.flock(file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    with open(path + '.tmp', 'w') as file:
+        json.dump(snapshot, file)
+    # Quem lê nunca vê um arquivo pela metade
+    os.replace(path + '.tmp', path)
+
+
+def merge(snapshots):
+    """Soma retratos: (nome, rótulos) -> série"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, labels, series in snapshot:
+            if name not in METRICS or len(series) != len(METRICS[name][1]) + 2:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            total = merged.setdefault(key, [0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+    return merged
+
+
+def archive_worker(directory, pid):
+    """
+    Soma o retrato do worker `pid`, já encerrado, ao arquivo dos encerrados e
+    o remove. Chamado pelo mestre do gunicorn (child_exit em gunicorn.conf.py).
+    """
+    path = os.path.join(directory, f'{pid}.json')
+    snapshot = read_snapshot(path)
+    if snapshot is None:
+        return
+    archive = os.path.join(directory, ARCHIVE_FILE)
+    with directory_lock(directory, fcntl.LOCK_EX):
+        merged = merge([read_snapshot(archive) or [], snapshot])
+        write_snapshot(archive, [[name, [list(label) for label in labels], series]
+                                 for (name, labels), series in merged.items()])
+        os.remove(path)
+
+
+registry = Registry()
+atexit.register(registry.flush)
+if hasattr(os, 'register_at_fork'):
+    # Um worker criado por fork começa sem os números (e o timer) do processo pai
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition():
+    """Texto do /metrics no formato de exposição do Prometheus"""
+    merged = registry.collect()
+    lines = []
+    for name, (description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (series_name, labels), series in sorted(merged.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), series[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels((*labels, ("le", bound)))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_number(series[-1])}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+
+_current = contextvars.ContextVar('request_timing', default=None)
+
+
+@contextmanager
+def timed(phase):
+    """Soma o tempo do bloco à fase `phase` da requisição atual, se houver uma"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - start)
+
+
+def observe(name, value, **labels):
+    if settings.METRICS_ENABLED:
+        registry.observe(name, value, **labels)
+
+
+def record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    timing.queries += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add('db', time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_timing(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def server_timing(timing, elapsed):
+    """Valor do Server-Timing: cada fase, o restante da view ('app') e o total"""
+    entries = []
+    for phase, seconds in timing.phases.items():
+        entry = f'{phase};dur={seconds * 1000:.2f}'
+        if phase == 'db':
+            entry += f';desc="{timing.queries} queries"'
+        entries.append(entry)
+    app = max(elapsed - sum(timing.phases.values()), 0)
+    entries.append(f'app;dur={app * 1000:.2f}')
+    entries.append(f'total;dur={elapsed * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def finish(request, response, timing):
+    elapsed = time.perf_counter() - timing.start
+    # A rota da URL, não o caminho: /api/lists/7/ e /api/lists/8/ são a mesma série
+    match = request.resolver_match
+    route = match.route if match is not None else 'unmatched'
+    method = request.method
+
+    if settings.METRICS_ENABLED:
+        registry.observe(
+            'http_request_duration_seconds', elapsed, route=route, method=method, status=response.status_code,
+        )
+        registry.observe('http_request_queries', timing.queries, route=route, method=method)
+        for phase, seconds in timing.phases.items():
+            registry.observe('http_request_phase_seconds', seconds, route=route, method=method, phase=phase)
+        try:
+            request_size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            request_size = 0
+        if request_size:
+            registry.observe('http_request_size_bytes', request_size, route=route, method=method)
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', len(response.content), route=route, method=method)
+
+    if settings.METRICS_SERVER_TIMING:
+        response['Server-Timing'] = server_timing(timing, elapsed)
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Deve ser o primeiro de MIDDLEWARE para que o total cubra toda a requisição"""
+    # Conexões abertas antes do middleware ser carregado (ex.: nos testes)
+    for connection in connections.all(initialized_only=True):
+        install_query_timing(None, connection)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timing = RequestTiming()
+            token = _current.set(timing)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return finish(request, response, timing)
+    else:
+        def middleware(request):
+            timing = RequestTiming()
+            token = _current.set(timing)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return finish(request, response, timing)
+    return middleware
+
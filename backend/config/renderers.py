@@ -0,0 +1,40 @@
+"""
+Renderer JSON baseado no orjson, configurado em REST_FRAMEWORK.
+
+Produz os mesmos bytes do JSONRenderer do DRF com as configurações padrão
+(UTF-8 sem escapes, separadores compactos, U+2028/U+2029 escapados). Tipos
+que o orjson não conhece, e datas, passam pelo encoder do DRF. Saída indentada
+(API navegável, `; indent=N`) e inteiros fora de 64 bits usam o renderer
+padrão. Diferenças conhecidas: floats em notação científica (`1e16` em vez de
+`1e+16`) e NaN/Infinity, que viram null em vez de erro.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import timed
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Mesmo escape do JSONRenderer: a saída continua um subconjunto de JavaScript
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
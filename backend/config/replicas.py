@@ -0,0 +1,105 @@
+"""
+Leituras na réplica do banco (alias 'replica' de DATABASES, ver DB_REPLICA_HOST).
+
+Só os GETs marcados com `read_replica` leem da réplica; todo o resto, inclusive
+escritas feitas durante esses GETs, vai para o primário. A réplica fica atrás
+do primário por até DB_REPLICA_MAX_LAG_SECONDS, então um cliente que acabou de
+escrever não pode ler dela: `replica_middleware` marca as respostas das
+escritas com um cookie que vale por esse tempo, e enquanto ele vier nas
+requisições as leituras desse cliente vão para o primário.
+
+O cache de respostas guarda por no máximo o mesmo tempo o que foi lido da
+réplica: a leitura pode ter acontecido antes de a réplica receber a escrita que
+trocou o token de versão.
+"""
+import contextvars
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+REPLICA = 'replica'
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Acompanha a view também nas consultas feitas via sync_to_async
+_read_replica = contextvars.ContextVar('read_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _read_replica.get() and replica_configured():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sem isso, salvar um objeto lido da réplica gravaria nela
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+def read_replica(view):
+    """
+    Decorator de handler de GET (use com method_decorator em 'get') cujas
+    leituras podem ir para a réplica, se houver uma e o cliente não estiver
+    fixado no primário. Funciona com handlers síncronos e assíncronos.
+    """
+    def mark(response, use_replica):
+        response.from_replica = use_replica
+        return response
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            use_replica = replica_configured() and not pinned(request)
+            token = _read_replica.set(use_replica)
+            try:
+                return mark(await view(request, *args, **kwargs), use_replica)
+            finally:
+                _read_replica.reset(token)
+        return wrapped
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        use_replica = replica_configured() and not pinned(request)
+        token = _read_replica.set(use_replica)
+        try:
+            return mark(view(request, *args, **kwargs), use_replica)
+        finally:
+            _read_replica.reset(token)
+    return wrapped
+
+
+def pin(request, response):
+    if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=settings.DB_REPLICA_MAX_LAG_SECONDS, httponly=True, samesite='Lax',
+        )
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """Fixa no primário, por DB_REPLICA_MAX_LAG_SECONDS, o cliente que escreveu"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return pin(request, await get_response(request))
+    else:
+        def middleware(request):
+            return pin(request, get_response(request))
+    return middleware
@@ -50,9 +50,14 @@ INSTALLED_APPS = [
     'board',
     'lists',
     'photos',
+    'realtime',
+    'benchmarks',
+    'backup',
 ]
 
 MIDDLEWARE = [
+    'config.metrics.metrics_middleware',
+    'config.replicas.replica_middleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +86,14 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Conexões reaproveitadas entre requisições. Com DB_POOL (extra "pool", psycopg 3)
+# cada worker mantém um pool de DB_POOL_MIN_SIZE a DB_POOL_MAX_SIZE conexões, o
+# indicado sob ASGI, onde cada requisição roda em uma thread nova. Sem ele, cada
+# thread mantém a sua conexão por DB_CONN_MAX_AGE segundos, testada antes de ser
+# reutilizada. Workers x conexões por worker (e a réplica, e o broker de
+# eventos) precisam caber no max_connections do Postgres
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -89,9 +102,34 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', cast=int),
+        # O pool do Django exige CONN_MAX_AGE 0: devolver a conexão é papel dele
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Réplica de leitura opcional para os GETs mais frequentes (ver config/replicas.py),
+# com as mesmas credenciais do primário. Depois de escrever, o cliente lê do
+# primário por DB_REPLICA_MAX_LAG_SECONDS, o atraso máximo esperado da réplica
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+DB_REPLICA_MAX_LAG_SECONDS = config('DB_REPLICA_MAX_LAG_SECONDS', default=5, cast=int)
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT'], cast=int),
+        # Nos testes, a réplica é o próprio banco de teste
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['config.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,6 +173,118 @@ STATICFILES_DIRS = [BASE_DIR / "static"]  # para dev
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Arquivos das fotos: o Django autoriza e o nginx entrega via X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT = config('MEDIA_ACCEL_REDIRECT', default=not DEBUG, cast=bool)
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
+# Uploads de fotos em partes (retomáveis)
+PHOTO_UPLOAD_TEMP_DIR = config('PHOTO_UPLOAD_TEMP_DIR', default=str(MEDIA_ROOT / 'uploads'))
+PHOTO_UPLOAD_MAX_BYTES = config('PHOTO_UPLOAD_MAX_BYTES', default=50 * 1024 * 1024, cast=int)
+
+# Remoção de arquivos das fotos em segundo plano (ver photos/cleanup.py)
+PHOTO_CLEANUP_MAX_ATTEMPTS = config('PHOTO_CLEANUP_MAX_ATTEMPTS', default=5, cast=int)
+PHOTO_CLEANUP_RETRY_SECONDS = config('PHOTO_CLEANUP_RETRY_SECONDS', default=30, cast=int)
+PHOTO_ORPHAN_GRACE_HOURS = config('PHOTO_ORPHAN_GRACE_HOURS', default=24, cast=int)
+PHOTO_UPLOAD_EXPIRE_HOURS = config('PHOTO_UPLOAD_EXPIRE_HOURS', default=24, cast=int)
+
+# Derivados responsivos das fotos
+PHOTO_DERIVATIVE_WIDTHS = [int(w) for w in config('PHOTO_DERIVATIVE_WIDTHS', default='480,960,1600').split(',')]
+PHOTO_DERIVATIVE_QUALITY = config('PHOTO_DERIVATIVE_QUALITY', default=80, cast=int)
+PHOTO_DERIVATIVE_WORKERS = config('PHOTO_DERIVATIVE_WORKERS', default=2, cast=int)
+
+# Histórico do board: keyframe completo a cada N revisões, deltas entre eles,
+# e poda por quantidade, idade e tamanho total (0 desativa o limite)
+BOARD_HISTORY_KEYFRAME_INTERVAL = config('BOARD_HISTORY_KEYFRAME_INTERVAL', default=20, cast=int)
+BOARD_HISTORY_MAX_REVISIONS = config('BOARD_HISTORY_MAX_REVISIONS', default=500, cast=int)
+BOARD_HISTORY_MAX_AGE_DAYS = config('BOARD_HISTORY_MAX_AGE_DAYS', default=30, cast=int)
+BOARD_HISTORY_MAX_BYTES = config('BOARD_HISTORY_MAX_BYTES', default=50 * 1024 * 1024, cast=int)
+
+# Armazenamento do board: 'json' (JSONField) ou 'gzip' (payload comprimido,
+# servido sem descomprimir a clientes que aceitam gzip). A troca é gradual: as
+# duas colunas são lidas e a próxima escrita grava no formato configurado;
+# `manage.py convert_board_storage` converte o board na hora
+BOARD_STORAGE = config('BOARD_STORAGE', default='json')
+BOARD_GZIP_LEVEL = config('BOARD_GZIP_LEVEL', default=6, cast=int)
+
+# Write-behind do board: com valor > 0, as escritas são confirmadas em memória
+# e gravadas no banco no máximo a cada N segundos (indicado para um só worker)
+BOARD_WRITE_BEHIND_SECONDS = config('BOARD_WRITE_BEHIND_SECONDS', default=0, cast=float)
+
+# Eventos em tempo real (SSE em /api/events/). Com vários workers use
+# 'realtime.broker.PostgresBroker' para distribuir os eventos via LISTEN/NOTIFY
+REALTIME_BROKER = config('REALTIME_BROKER', default='realtime.broker.InProcessBroker')
+REALTIME_QUEUE_SIZE = config('REALTIME_QUEUE_SIZE', default=100, cast=int)
+REALTIME_HEARTBEAT_SECONDS = config('REALTIME_HEARTBEAT_SECONDS', default=15, cast=int)
+
+# Sincronização incremental das listas (/api/lists/changes/): por quantos dias
+# as remoções ficam registradas e quanto cada consulta volta no tempo para
+# cobrir transações que fizeram commit depois de gravar o updated_at
+LISTS_TOMBSTONE_RETENTION_DAYS = config('LISTS_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+LISTS_CHANGES_OVERLAP_SECONDS = config('LISTS_CHANGES_OVERLAP_SECONDS', default=5, cast=int)
+
+# Cache das respostas dos GETs (ver config/cache.py): 'locmem' (LRU em memória,
+# por processo: só para um único worker), 'file' (LRU em disco, compartilhado
+# entre workers da mesma máquina), 'redis' (qualquer servidor compatível, com
+# maxmemory-policy allkeys-lru; requer o extra "redis") ou 'off'
+RESPONSE_CACHE_BACKEND = config('RESPONSE_CACHE_BACKEND', default='locmem')
+RESPONSE_CACHE_LOCATION = config('RESPONSE_CACHE_LOCATION', default='')
+RESPONSE_CACHE_MAX_ENTRIES = config('RESPONSE_CACHE_MAX_ENTRIES', default=1000, cast=int)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'config.cache.LRUFileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'off': 'django.core.cache.backends.dummy.DummyCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': RESPONSE_CACHE_BACKENDS[RESPONSE_CACHE_BACKEND],
+        'LOCATION': RESPONSE_CACHE_LOCATION or {
+            'file': '/tmp/django-responses',
+            'redis': 'redis://localhost:6379/1',
+        }.get(RESPONSE_CACHE_BACKEND, 'responses'),
+        'TIMEOUT': RESPONSE_CACHE_TIMEOUT,
+        # Redis não usa MAX_ENTRIES: o limite é o maxmemory do servidor
+        'OPTIONS': {} if RESPONSE_CACHE_BACKEND == 'redis' else {'MAX_ENTRIES': RESPONSE_CACHE_MAX_ENTRIES},
+        'KEY_PREFIX': 'responses',
+    },
+}
+
+# Versões assíncronas das views de listas, board e fotos (config/async_views.py).
+# Para o modo ASGI (SERVER_MODE=asgi, ver gunicorn.conf.py); sob WSGI cada
+# requisição a uma view assíncrona roda em um event loop criado só para ela
+API_ASYNC_VIEWS = config('API_ASYNC_VIEWS', default=False, cast=bool)
+
+# Métricas por rota em /metrics (formato Prometheus) e cabeçalho Server-Timing.
+# Com vários workers, METRICS_DIR aponta para um diretório local compartilhado
+# (vazio a cada implantação) onde cada processo grava seus números a cada
+# METRICS_FLUSH_SECONDS; sem ele, o /metrics mostra só o worker que respondeu
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=5, cast=float)
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default=True, cast=bool)
+
+# JSON da API: 'orjson' (mesma saída, bem mais rápido) ou 'json' (padrão do DRF)
+API_JSON_BACKEND = config('API_JSON_BACKEND', default='orjson')
+API_JSON_CLASSES = {
+    'orjson': ('config.renderers.ORJSONRenderer', 'config.parsers.ORJSONParser'),
+    'json': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+}
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        API_JSON_CLASSES[API_JSON_BACKEND][0],
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        API_JSON_CLASSES[API_JSON_BACKEND][1],
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,493 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.test import AsyncRequestFactory, Client, RequestFactory, TestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from board.models import Board
+from board.views import BoardView, AsyncBoardView
+from lists.models import List, Item
+from lists.views import (
+    ListListView, ListDetailView, ItemListView, ItemDetailView,
+    AsyncListListView, AsyncListDetailView, AsyncItemListView, AsyncItemDetailView,
+)
+from photos.models import Photo, UploadSession
+from photos.uploads import temp_path, write_chunk
+from photos.views import PhotoListCreateView, AsyncPhotoListCreateView, AsyncUploadSessionView
+
+from .cache import accepts_gzip
+from .db import delete_by_ids, update_returning
+from .metrics import Registry, archive_worker, registry, write_snapshot
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .replicas import PIN_COOKIE
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_SERVER_TIMING=True, METRICS_DIR='', RESPONSE_CACHE_BACKEND='off')
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.list = List.objects.create(name='Mercado')
+        Item.objects.create(list=self.list, name='Arroz', position='i0')
+
+    def series(self, text, prefix):
+        return [line for line in text.splitlines() if line.startswith(prefix)]
+
+    def test_server_timing_breaks_down_the_request(self):
+        response = self.client.get(f'/api/lists/{self.list.id}/items/')
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    async def test_async_requests_count_queries_of_sync_views(self):
+        response = await self.async_client.get(f'/api/lists/{self.list.id}/items/')
+
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_metrics_are_labeled_by_route(self):
+        self.client.get(f'/api/lists/{self.list.id}/items/')
+        self.client.get(f'/api/lists/{self.list.id}/items/')
+        self.client.get('/api/lists/999999/items/')
+
+        text = self.client.get('/metrics').content.decode()
+        route = 'method="GET",route="api/lists/<int:list_id>/items/"'
+        self.assertIn(f'http_request_duration_seconds_count{{{route},status="200"}} 2', text)
+        self.assertIn(f'http_request_duration_seconds_count{{{route},status="404"}} 1', text)
+        # Dois GETs com 1 consulta e o 404, que confere se a lista existe, com 2
+        self.assertIn(f'http_request_queries_sum{{{route}}} 4', text)
+        self.assertIn(f'http_request_queries_bucket{{{route},le="1"}} 2', text)
+        self.assertTrue(self.series(text, f'http_response_size_bytes_count{{{route}}}'))
+
+    def test_board_payload_sizes(self):
+        content = {"objects": [{"type": "rect", "left": i} for i in range(50)]}
+        body = json.dumps({"content": content})
+        self.client.put('/api/board/', body, content_type='application/json')
+        self.client.get('/api/board/')
+
+        text = self.client.get('/metrics').content.decode()
+        self.assertIn(f'board_payload_bytes_sum{{direction="received",method="PUT"}} {len(body)}', text)
+        self.assertTrue(self.series(text, 'board_payload_bytes_count{direction="sent",method="GET"} 1'))
+
+    def test_workers_are_aggregated_through_metrics_dir(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+
+        with override_settings(METRICS_DIR=metrics_dir):
+            # Retrato de outro worker, como gravado pelo flush dele
+            other = Registry()
+            other.observe('http_request_queries', 3, route='api/lists/', method='GET')
+            with open(os.path.join(metrics_dir, '1.json'), 'w') as file:
+                json.dump(other.snapshot(), file)
+
+            self.client.get('/api/lists/')
+            text = self.client.get('/metrics').content.decode()
+
+        self.assertIn('http_request_queries_count{method="GET",route="api/lists/"} 2', text)
+        self.assertIn('http_request_queries_sum{method="GET",route="api/lists/"} 5', text)
+
+    def test_exited_workers_are_archived(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+
+        def worker_snapshot(pid, queries):
+            worker = Registry()
+            worker.observe('http_request_queries', queries, route='api/lists/', method='GET')
+            write_snapshot(os.path.join(metrics_dir, f'{pid}.json'), worker.snapshot())
+
+        def total():
+            with override_settings(METRICS_DIR=metrics_dir):
+                merged = Registry().collect()
+            return merged[('http_request_queries', (('method', 'GET'), ('route', 'api/lists/')))][-1]
+
+        worker_snapshot(101, 3)
+        worker_snapshot(102, 5)
+        archive_worker(metrics_dir, 101)
+        self.assertEqual(total(), 8)
+        self.assertEqual(sorted(os.listdir(metrics_dir)), ['.lock', '102.json', 'archive.json'])
+
+        # O pid reaproveitado começa do zero sem apagar os números do anterior
+        worker_snapshot(101, 1)
+        self.assertEqual(total(), 9)
+        archive_worker(metrics_dir, 101)
+        archive_worker(metrics_dir, 102)
+        archive_worker(metrics_dir, 103)
+        self.assertEqual(total(), 9)
+        self.assertEqual(sorted(os.listdir(metrics_dir)), ['.lock', 'archive.json'])
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get('/api/lists/')
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class JSONBackendTests(TestCase):
+    """O renderer e o parser com orjson produzem exatamente o mesmo que os do DRF"""
+
+    data = {
+        "name": 'Pão de açúcar ☕ 𝄞 "aspas" \\ \n\t\x00',
+        "separators": 'linha\u2028parágrafo\u2029fim',
+        "when": datetime(2026, 10, 18, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        "naive": datetime(2026, 10, 18, 12, 30),
+        "offset": datetime(2026, 10, 18, 9, 30, tzinfo=dt_timezone(timedelta(hours=-3))),
+        "date": date(2026, 10, 18),
+        "time": time(12, 30, 15, 500),
+        "duration": timedelta(days=1, seconds=5),
+        "decimals": [Decimal('1.10'), Decimal('0'), Decimal('-3.5')],
+        "uuid": uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        "numbers": [0, -1, 2 ** 53, 1.5, 0.1, True, False, None],
+        "nested": {"lists": [{"id": 1, "items": [{"id": 2, "name": 'Feijão', "completed": False}]}], "empty": {}},
+        7: 'chave inteira',
+    }
+
+    def test_renders_the_same_bytes(self):
+        for value in (self.data, [self.data], 'só texto', 10 ** 30, []):
+            with self.subTest(value=value):
+                self.assertEqual(ORJSONRenderer().render(value), JSONRenderer().render(value))
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_indented_output_uses_the_drf_renderer(self):
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type), JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_parses_the_same_values(self):
+        body = JSONRenderer().render(self.data) + b'  '
+        raw = '{"sep": "a\u2028b", "emoji": "𝄞", "n": [1, 2.5, null]}'.encode()
+        for payload in (body, raw):
+            with self.subTest(payload=payload):
+                self.assertEqual(
+                    ORJSONParser().parse(io.BytesIO(payload)), JSONParser().parse(io.BytesIO(payload)),
+                )
+        for parser in (ORJSONParser(), JSONParser()):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(b'{"a": '))
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='locmem', BOARD_WRITE_BEHIND_SECONDS=0, BOARD_STORAGE='gzip')
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        Board.get_instance().save_content({"objects": [{"type": "rect"}]})
+
+    def test_q_values(self):
+        for header, expected in [
+            ('gzip, deflate, br', True),
+            ('br;q=1.0, gzip;q=0.8', True),
+            ('gzip;q=0', False),
+            ('gzip; q=0.0, *;q=1', False),
+            ('*', True),
+            ('identity, *;q=0', False),
+            ('deflate', False),
+            ('', False),
+            ('GZIP;Q=0.5', True),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(accepts_gzip(header), expected)
+
+    def test_gzip_refused_by_q_value_is_not_served_from_the_gzip_entry(self):
+        response = self.client.get('/api/board/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((response['X-Cache'], response['Content-Encoding']), ('MISS', 'gzip'))
+        self.assertEqual(self.client.get('/api/board/', HTTP_ACCEPT_ENCODING='gzip')['X-Cache'], 'HIT')
+
+        # Sem gzip a resposta é descomprimida em streaming e não entra no cache
+        response = self.client.get('/api/board/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['content'], {"objects": [{"type": "rect"}]})
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='off')
+class AsyncViewTests(TestCase):
+    """As versões assíncronas respondem o mesmo que as views síncronas"""
+
+    factory = RequestFactory()
+    async_factory = AsyncRequestFactory()
+
+    def setUp(self):
+        self.list = List.objects.create(name='Mercado')
+        self.item = Item.objects.create(list=self.list, name='Arroz', position='i0')
+        Item.objects.create(list=self.list, name='Feijão', position='i1', completed=True)
+        List.objects.create(name='Casa')
+        for i in range(3):
+            Photo.objects.create(image=f'photos/{i:064x}.jpg', content_hash=f'{i:064x}', width=40, height=30)
+        Board.get_instance().save_content({"objects": [{"type": "rect"}]})
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, PHOTO_UPLOAD_TEMP_DIR=os.path.join(media_root, 'uploads'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def call(self, view, request, **kwargs):
+        handler = view.as_view()
+        if iscoroutinefunction(handler):
+            handler = async_to_sync(handler)
+        response = handler(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def assertSameResponse(self, sync_view, async_view, path, **kwargs):
+        expected = self.call(sync_view, self.factory.get(path), **kwargs)
+        actual = self.call(async_view, self.async_factory.get(path), **kwargs)
+        self.assertEqual((actual.status_code, actual.content), (expected.status_code, expected.content), path)
+
+    def test_reads(self):
+        list_id, item_id = self.list.id, self.item.id
+        self.assertSameResponse(ListListView, AsyncListListView, '/api/lists/')
+        self.assertSameResponse(ListListView, AsyncListListView, '/api/lists/?summary=1&items=1&limit=1')
+        self.assertSameResponse(ListDetailView, AsyncListDetailView, f'/api/lists/{list_id}/', pk=list_id)
+        self.assertSameResponse(ListDetailView, AsyncListDetailView, '/api/lists/999/', pk=999)
+        self.assertSameResponse(ItemListView, AsyncItemListView, f'/api/lists/{list_id}/items/', list_id=list_id)
+        self.assertSameResponse(ItemListView, AsyncItemListView, '/api/lists/999/items/', list_id=999)
+        self.assertSameResponse(
+            ItemDetailView, AsyncItemDetailView, f'/api/lists/{list_id}/items/{item_id}/',
+            list_id=list_id, item_id=item_id,
+        )
+        self.assertSameResponse(BoardView, AsyncBoardView, '/api/board/')
+        self.assertSameResponse(PhotoListCreateView, AsyncPhotoListCreateView, '/api/photos/?limit=2')
+        self.assertSameResponse(PhotoListCreateView, AsyncPhotoListCreateView, '/api/photos/?all=1')
+        self.assertSameResponse(PhotoListCreateView, AsyncPhotoListCreateView, '/api/photos/?cursor=x')
+
+    def test_board_not_modified(self):
+        request = self.async_factory.get('/api/board/', headers={'If-None-Match': f'"{Board.current_version()}"'})
+        self.assertEqual(self.call(AsyncBoardView, request).status_code, 304)
+
+    def test_writes_fall_back_to_the_sync_handlers(self):
+        request = self.async_factory.put(
+            f'/api/lists/{self.list.id}/', json.dumps({"name": 'Feira'}), content_type='application/json',
+        )
+        response = self.call(AsyncListDetailView, request, pk=self.list.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(List.objects.get(id=self.list.id).name, 'Feira')
+
+    def test_photo_upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'JPEG')
+        upload = lambda: SimpleUploadedFile('a.jpg', buffer.getvalue(), 'image/jpeg')
+
+        response = self.call(AsyncPhotoListCreateView, self.async_factory.post('/api/photos/', {'image': upload()}))
+        self.assertEqual(response.status_code, 201)
+        photo = Photo.objects.get(id=json.loads(response.content)['id'])
+        self.assertEqual((photo.width, photo.height), (40, 30))
+        self.assertTrue(photo.image.storage.exists(photo.image.name))
+
+        # O mesmo conteúdo reaproveita a foto
+        response = self.call(AsyncPhotoListCreateView, self.async_factory.post('/api/photos/', {'image': upload()}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_chunked_upload(self):
+        session = UploadSession.objects.create(filename='a.bin', size=10)
+
+        def put(start, data):
+            request = self.async_factory.put(
+                f'/api/photos/uploads/{session.id}/', data, content_type='application/octet-stream',
+                headers={'Content-Range': f'bytes {start}-{start + len(data) - 1}/10'},
+            )
+            return self.call(AsyncUploadSessionView, request, upload_id=session.id)
+
+        self.assertEqual(json.loads(put(0, b'01234').content)['offset'], 5)
+        self.assertEqual(put(0, b'01234').status_code, 409)
+        self.assertEqual(json.loads(put(5, b'56789').content)['offset'], 10)
+        with open(temp_path(session), 'rb') as file:
+            self.assertEqual(file.read(), b'0123456789')
+
+    def test_concurrent_chunks_do_not_share_the_file(self):
+        session = UploadSession.objects.create(filename='a.bin', size=10)
+        handler = AsyncUploadSessionView.as_view()
+        writing, release = threading.Event(), threading.Event()
+
+        def slow_write(*args):
+            # A primeira parte fica no meio da gravação até a segunda responder
+            if not writing.is_set():
+                writing.set()
+                release.wait(5)
+            return write_chunk(*args)
+
+        def request(data):
+            return self.async_factory.put(
+                f'/api/photos/uploads/{session.id}/', data, content_type='application/octet-stream',
+                headers={'Content-Range': 'bytes 0-4/10'},
+            )
+
+        async def second():
+            while not writing.is_set():
+                await asyncio.sleep(0.01)
+            try:
+                return await handler(request(b'ABCDE'), upload_id=session.id)
+            finally:
+                release.set()
+
+        async def both():
+            return await asyncio.gather(handler(request(b'01234'), upload_id=session.id), second())
+
+        with mock.patch('photos.views.write_chunk', slow_write):
+            first, other = async_to_sync(both)()
+        first.render()
+        other.render()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(other.status_code, 409)
+        self.assertEqual(json.loads(other.content)['error'], 'Another chunk is being written to this upload.')
+        with open(temp_path(session), 'rb') as file:
+            self.assertEqual(file.read(), b'01234')
+        session.refresh_from_db()
+        self.assertEqual((session.offset, session.writing_since), (5, None))
+
+
+class RawWriteTests(TestCase):
+    """update_returning e delete_by_ids escrevem sem o ciclo de vida dos modelos"""
+
+    def setUp(self):
+        self.market = List.objects.create(name='Mercado')
+        self.item = Item.objects.create(list=self.market, name='Arroz', position='a')
+        self.signals = []
+        for signal in (pre_save, post_save, pre_delete, post_delete):
+            signal.connect(self.record, sender=Item)
+            self.addCleanup(signal.disconnect, self.record, sender=Item)
+
+    def record(self, signal, **kwargs):
+        self.signals.append(signal)
+
+    def test_update_returning(self):
+        with self.assertNumQueries(1):
+            rows = update_returning(
+                Item, ['id', 'name', 'completed'], {"id": self.item.id, "list_id": self.market.id},
+                name='Feijão', completed=True,
+            )
+
+        self.assertEqual(rows, [{"id": self.item.id, "name": 'Feijão', "completed": True}])
+        self.assertEqual(self.signals, [])
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.name, self.item.completed), ('Feijão', True))
+        self.assertEqual(update_returning(Item, ['id'], {"id": self.item.id, "list_id": 0}, name='x'), [])
+
+    def test_update_returning_validates_values(self):
+        with self.assertRaises(ValidationError):
+            update_returning(Item, ['id'], {"id": self.item.id}, completed='talvez')
+
+    def test_delete_by_ids(self):
+        other = Item.objects.create(list=self.market, name='Feijão', position='b')
+        self.signals.clear()
+
+        self.assertEqual(delete_by_ids(Item, [self.item.id, other.id], list_id=0), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(delete_by_ids(Item, [self.item.id, other.id], list_id=self.market.id), 2)
+
+        self.assertEqual(self.signals, [])
+        self.assertFalse(Item.objects.exists())
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='off', BOARD_WRITE_BEHIND_SECONDS=0)
+class ReplicaTests(TestCase):
+    """Primário e réplica em bancos separados, com dados diferentes, para ver de onde cada leitura veio"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A réplica é criada aqui, não em DATABASES: o runner não a conhece, então
+        # ela só entra em `databases` depois de criada
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': 'file:replica_tests?mode=memory&cache=shared', 'OPTIONS': {},
+        }
+        cls.databases = {*cls.databases, 'replica'}
+        with connections['replica'].schema_editor() as editor:
+            for model in (List, Item, Photo, Board):
+                editor.create_model(model)
+        List.objects.using('replica').create(name='Réplica')
+        Photo.objects.using('replica').create(image=f'photos/{0:064x}.jpg', content_hash=f'{0:064x}')
+        Board.objects.using('replica').create(pk=1, content={"objects": []})
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.databases = cls.databases - {'replica'}
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.list = List.objects.create(name='Primário')
+        Board.get_instance().save_content({"objects": [{"type": "rect"}]})
+
+    def list_names(self):
+        return [row['name'] for row in self.client.get('/api/lists/').json()]
+
+    def test_routed_reads_use_the_replica(self):
+        self.assertEqual(self.list_names(), ['Réplica'])
+        self.assertEqual(len(self.client.get('/api/photos/?all=1').json()), 1)
+        self.assertEqual(self.client.get('/api/board/').json()['content'], {"objects": []})
+        # As demais leituras continuam no primário
+        self.assertEqual(self.client.get(f'/api/lists/{self.list.id}/').json()['name'], 'Primário')
+
+    def test_writes_go_to_the_primary_and_pin_the_client(self):
+        response = self.client.post('/api/lists/', {"name": 'Feira'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(List.objects.using('replica').filter(name='Feira').exists())
+        self.assertEqual(sorted(self.list_names()), ['Feira', 'Primário'])
+
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.list_names(), ['Réplica'])
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.post('/api/lists/', {}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(RESPONSE_CACHE_BACKEND='locmem', DB_REPLICA_MAX_LAG_SECONDS=0)
+    def test_replica_responses_are_cached_only_for_the_replica_lag(self):
+        self.assertEqual(self.client.get('/api/lists/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/lists/')['X-Cache'], 'MISS')
+
+        # Lidas do primário, as respostas ficam no cache normalmente
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertEqual(self.client.get('/api/lists/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/lists/')['X-Cache'], 'HIT')
+
+    @override_settings(RESPONSE_CACHE_BACKEND='locmem', DB_REPLICA_MAX_LAG_SECONDS=60)
+    def test_pinned_clients_do_not_get_cached_replica_responses(self):
+        reader, writer = Client(), Client()
+        self.assertEqual(reader.get('/api/lists/')['X-Cache'], 'MISS')
+
+        # A escrita troca o token; a réplica ainda não tem a lista nova e a
+        # resposta dela volta ao cache sob o token novo
+        response = writer.post('/api/lists/', {"name": 'Feira'}, content_type='application/json')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual([row['name'] for row in reader.get('/api/lists/').json()], ['Réplica'])
+        self.assertEqual(reader.get('/api/lists/')['X-Cache'], 'HIT')
+
+        response = writer.get('/api/lists/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(sorted(row['name'] for row in response.json()), ['Feira', 'Primário'])
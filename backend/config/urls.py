@@ -20,9 +20,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .views import MetricsView
+
 urlpatterns = [
     path('api/lists/', include('lists.urls')),
     path('api/photos/', include('photos.urls')),
     path('api/board/', include('board.urls')),
+    path('api/events/', include('realtime.urls')),
+    path('api/backup/', include('backup.urls')),
+    path('metrics', MetricsView.as_view()),
+    path(f'{settings.MEDIA_URL.strip("/")}/photos/', include('photos.media_urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from rest_framework.views import APIView
+
+from .metrics import exposition
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsView(APIView):
+    """Raspado pelo Prometheus; o nginx não expõe /metrics, só a rede interna alcança"""
+
+    def get(self, request):
+        if not settings.METRICS_ENABLED:
+            raise Http404
+        return HttpResponse(exposition(), content_type=PROMETHEUS_CONTENT_TYPE)
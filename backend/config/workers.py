@@ -0,0 +1,15 @@
+"""
+Worker do gunicorn para o modo ASGI (ver gunicorn.conf.py).
+"""
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    # O Django não implementa o protocolo lifespan
+    CONFIG_KWARGS = {**BaseUvicornWorker.CONFIG_KWARGS, "lifespan": "off"}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # worker_connections do gunicorn vira o limite de requisições simultâneas
+        # do uvicorn: acima dele o worker responde 503 na hora, sem fila sem fim
+        self.config.limit_concurrency = self.cfg.worker_connections
@@ -3,8 +3,16 @@
 echo "Running database migrations..."
 uv run python manage.py migrate
 
+# Retoma remoções pendentes e limpa uploads abandonados e arquivos órfãos
+echo "Cleaning up photo files..."
+uv run python manage.py cleanup_photo_files
+
+echo "Pruning list tombstones..."
+uv run python manage.py prune_list_tombstones
+
 echo "Collecting static files..."
 uv run python manage.py collectstatic --noinput
 
-echo "Starting Gunicorn server..."
-exec uv run gunicorn config.wsgi:application --bind 0.0.0.0:8000
+# Modo (SERVER_MODE=asgi|wsgi) e workers em gunicorn.conf.py
+echo "Starting Gunicorn (${SERVER_MODE:-asgi})..."
+exec uv run gunicorn
@@ -0,0 +1,77 @@
+"""
+Configuração do gunicorn, lida automaticamente do diretório da aplicação.
+
+SERVER_MODE=asgi (padrão): workers uvicorn servem config.asgi e cada um atende
+muitas conexões ao mesmo tempo; com API_ASYNC_VIEWS, leituras e uploads não
+esperam pela thread das views síncronas. SERVER_MODE=wsgi: workers síncronos
+servem config.wsgi, uma requisição por vez por worker; /api/events/ responde
+501, porque o WSGI não transmite o stream assíncrono de eventos.
+
+O padrão é um worker, porque o broker de eventos e o cache de respostas
+padrão ficam na memória do processo. Para usar mais (WEB_CONCURRENCY), o que
+fica na memória de cada processo precisa ser compartilhado:
+REALTIME_BROKER=realtime.broker.PostgresBroker, RESPONSE_CACHE_BACKEND=file ou
+redis, METRICS_DIR e BOARD_WRITE_BEHIND_SECONDS=0; do contrário o gunicorn
+avisa ao iniciar.
+"""
+
+# Importado pelo módulo: `config` é o nome de uma opção do próprio gunicorn
+import decouple
+
+SERVER_MODE = decouple.config('SERVER_MODE', default='asgi')
+
+bind = decouple.config('BIND', default='0.0.0.0:8000')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'config.workers.UvicornWorker'
+    # A concorrência vem do event loop; com os backends compartilhados, um
+    # processo por núcleo basta
+    workers = decouple.config('WEB_CONCURRENCY', default=1, cast=int)
+    # Requisições simultâneas por worker (limit_concurrency do uvicorn)
+    worker_connections = decouple.config('WORKER_CONNECTIONS', default=200, cast=int)
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'sync'
+    workers = decouple.config('WEB_CONCURRENCY', default=1, cast=int)
+
+# Uploads grandes e o board de vários MB passam dos 30 s padrão em conexões lentas
+timeout = decouple.config('WORKER_TIMEOUT', default=120, cast=int)
+graceful_timeout = 30
+# Conexões vindas do nginx, na mesma rede
+keepalive = 5
+forwarded_allow_ips = decouple.config('FORWARDED_ALLOW_IPS', default='*')
+
+# Recicla os workers aos poucos para conter o crescimento de memória
+max_requests = decouple.config('WORKER_MAX_REQUESTS', default=2000, cast=int)
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def per_process_state():
+    """Configurações cujo estado fica na memória de cada worker"""
+    found = []
+    if decouple.config('REALTIME_BROKER', default='realtime.broker.InProcessBroker') == 'realtime.broker.InProcessBroker':
+        found.append('REALTIME_BROKER=realtime.broker.InProcessBroker')
+    if decouple.config('RESPONSE_CACHE_BACKEND', default='locmem') == 'locmem':
+        found.append('RESPONSE_CACHE_BACKEND=locmem')
+    if decouple.config('BOARD_WRITE_BEHIND_SECONDS', default=0, cast=float) > 0:
+        found.append('BOARD_WRITE_BEHIND_SECONDS>0')
+    return found
+
+
+def child_exit(server, worker):
+    # Os números do worker encerrado vão para o arquivo dos encerrados
+    metrics_dir = decouple.config('METRICS_DIR', default='')
+    if metrics_dir:
+        from config.metrics import archive_worker
+        archive_worker(metrics_dir, worker.pid)
+
+
+def on_starting(server):
+    # Cada worker veria só os próprios eventos, invalidações e escritas pendentes
+    found = per_process_state()
+    if workers > 1 and found:
+        server.log.warning('%s workers com estado por processo (%s): use um worker ou backends compartilhados',
+                           workers, ', '.join(found))
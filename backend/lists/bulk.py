@@ -0,0 +1,195 @@
+"""
+Operações em lote sobre os itens de uma lista.
+
+Todas as operações de uma requisição são aplicadas em uma transação com um
+número fixo de consultas, qualquer que seja a quantidade: uma leitura dos itens
+(todos os da lista quando há movimentos, senão só os referenciados), um
+bulk_create, um bulk_update e um único DELETE ... WHERE id IN, com os
+tombstones dos itens apagados em um só INSERT.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from config.cache import bump
+from config.db import delete_by_ids
+
+from .changes import record_deletions
+from .models import Item, Tombstone
+from .positions import key_between, last_position, check_length
+from .serializers import ItemSerializer
+from .signals import publish_item
+
+ITEM_NOT_FOUND_ERROR = "Item not found."
+NAME_REQUIRED_ERROR = "Name is required."
+INVALID_OPERATION_ERROR = "Invalid operation."
+INVALID_COMPLETED_ERROR = "Completed must be a boolean."
+INVALID_MOVE_ERROR = "Provide 'after' and/or 'before' with ids of other items in the list."
+
+OPERATIONS = ('create', 'update', 'delete', 'move')
+
+
+def is_id(value):
+    # bool é subclasse de int, mas true/false não são ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate(operation):
+    """Retorna a mensagem de erro da operação, ou None se ela é válida"""
+    if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+        return INVALID_OPERATION_ERROR
+    if operation['op'] != 'create' and not is_id(operation.get('id')):
+        return INVALID_OPERATION_ERROR
+    if 'completed' in operation and not isinstance(operation['completed'], bool):
+        return INVALID_COMPLETED_ERROR
+    if operation['op'] == 'create' and not operation.get('name'):
+        return NAME_REQUIRED_ERROR
+    if operation['op'] == 'update':
+        if 'name' in operation and not operation['name']:
+            return NAME_REQUIRED_ERROR
+        if 'name' not in operation and 'completed' not in operation:
+            return INVALID_OPERATION_ERROR
+    if operation['op'] == 'move':
+        neighbours = [operation.get(key) for key in ('after', 'before')]
+        if all(n is None for n in neighbours) or operation['id'] in neighbours:
+            return INVALID_MOVE_ERROR
+        if any(n is not None and not is_id(n) for n in neighbours):
+            return INVALID_MOVE_ERROR
+    return None
+
+
+def move(order, item, after_id, before_id):
+    """
+    Reposiciona `item` em `order` (os itens da lista já ordenados) e retorna a
+    nova posição, ou None se os vizinhos não estão na lista ou estão fora de ordem.
+    """
+    original = order.index(item)
+    order.pop(original)
+    index = {other.id: i for i, other in enumerate(order) if other.id is not None}
+    if any(n is not None and n not in index for n in (after_id, before_id)):
+        order.insert(original, item)
+        return None
+
+    # Com só um vizinho, o outro é o item seguinte (ou anterior) a ele
+    if after_id is not None:
+        at = index[after_id] + 1
+        after = order[at - 1].position
+        if before_id is not None:
+            before = order[index[before_id]].position
+        else:
+            before = order[at].position if at < len(order) else None
+    else:
+        at = index[before_id]
+        before = order[at].position
+        after = order[at - 1].position if at > 0 else None
+
+    try:
+        item.position = key_between(after, before)
+    except ValueError:
+        order.insert(original, item)
+        return None
+    order.insert(at, item)
+    return item.position
+
+
+def apply_operations(list_id, operations):
+    """
+    Aplica as operações na ordem recebida e retorna um resultado por operação,
+    com o status HTTP que ela teria isoladamente. Operações inválidas ou sobre
+    itens inexistentes não impedem as demais.
+    """
+    errors = [validate(operation) for operation in operations]
+    valid = [operation for operation, error in zip(operations, errors) if error is None]
+    has_moves = any(operation['op'] == 'move' for operation in valid)
+
+    with transaction.atomic():
+        if has_moves:
+            # Movimentos precisam dos vizinhos: a lista inteira, já na ordem
+            order = list(Item.objects.filter(list_id=list_id).order_by('position', 'id'))
+            items = {item.id: item for item in order}
+            last = order[-1].position if order else None
+        else:
+            referenced = {operation['id'] for operation in valid if operation['op'] != 'create'}
+            items = {item.id: item for item in Item.objects.filter(list_id=list_id, id__in=referenced)}
+            order = None
+            last = last_position(list_id) if any(operation['op'] == 'create' for operation in valid) else None
+
+        results = []
+        created, updated, deleted = [], {}, {}
+        for operation, error in zip(operations, errors):
+            if error is not None:
+                results.append({"op": operation.get('op') if isinstance(operation, dict) else None,
+                                "status": 400, "error": error})
+                continue
+
+            op = operation['op']
+            if op == 'create':
+                # Novos itens entram no fim da lista
+                last = key_between(last, None)
+                item = Item(
+                    list_id=list_id, name=operation['name'],
+                    completed=operation.get('completed', False), position=last,
+                )
+                created.append(item)
+                if order is not None:
+                    order.append(item)
+                results.append({"op": op, "status": 201, "item": item})
+                continue
+
+            item = items.get(operation['id'])
+            if item is None:
+                results.append({"op": op, "id": operation['id'], "status": 404, "error": ITEM_NOT_FOUND_ERROR})
+                continue
+
+            if op == 'update':
+                for field in ('name', 'completed'):
+                    if field in operation:
+                        setattr(item, field, operation[field])
+                updated[item.id] = item
+                results.append({"op": op, "status": 200, "item": item})
+            elif op == 'move':
+                position = move(order, item, operation.get('after'), operation.get('before'))
+                if position is None:
+                    results.append({"op": op, "id": item.id, "status": 400, "error": INVALID_MOVE_ERROR})
+                    continue
+                last = max(last or '', position)
+                updated[item.id] = item
+                results.append({"op": op, "status": 200, "item": item})
+            else:
+                # Um item apagado deixa de existir para as operações seguintes
+                del items[item.id]
+                if order is not None:
+                    order.remove(item)
+                updated.pop(item.id, None)
+                deleted[item.id] = item
+                results.append({"op": op, "id": item.id, "status": 204})
+
+        if created:
+            Item.objects.bulk_create(created)
+        if updated:
+            # bulk_update ignora auto_now
+            now = timezone.now()
+            for item in updated.values():
+                item.updated_at = now
+            Item.objects.bulk_update(updated.values(), ['name', 'completed', 'position', 'updated_at'])
+        if deleted:
+            # Sem cascatas nem sinais por linha: um único DELETE ... WHERE id IN
+            delete_by_ids(Item, deleted)
+            record_deletions(Tombstone.ITEM, deleted.values())
+
+        longest = max((item.position for item in [*created, *updated.values()]), key=len, default='')
+        check_length(list_id, longest)
+
+        # bulk_* não disparam post_save/post_delete; os eventos saem no commit
+        if created or updated or deleted:
+            bump('lists', f'list:{list_id}')
+        for item in created:
+            publish_item('item.created', item)
+        for item in updated.values():
+            publish_item('item.updated', item)
+        for item in deleted.values():
+            publish_item('item.deleted', item)
+
+    for result in results:
+        if 'item' in result:
+            result['item'] = ItemSerializer(result['item']).data
+    return results
@@ -0,0 +1,98 @@
+"""
+Sincronização incremental de listas e itens.
+
+Listas e itens têm `updated_at`, e cada remoção deixa um `Tombstone`. O cliente
+guarda o cursor devolvido por `changes_since` e na próxima chamada recebe só o
+que foi criado, alterado ou apagado depois dele, lido pelos índices de
+`updated_at` e `deleted_at`.
+
+O cursor é o instante da consulta. Uma transação que ainda não tinha feito
+commit pode gravar um `updated_at` anterior a ele, então cada consulta volta
+`LISTS_CHANGES_OVERLAP_SECONDS` no tempo; as mudanças repetidas são inofensivas,
+já que o cliente aplica cada linha como upsert pelo id.
+
+Tombstones mais velhos que `LISTS_TOMBSTONE_RETENTION_DAYS` são podados, e um
+cursor anterior à janela não garante mais ver todas as remoções: nesse caso
+`changes_since` lança `CursorExpired` e o cliente recarrega tudo.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+
+from .models import List, Item, Tombstone
+from .serializers import ItemSerializer
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def encode_cursor(moment):
+    return urlsafe_base64_encode(moment.isoformat().encode())
+
+
+def decode_cursor(cursor):
+    """Instante do cursor, ou lança ValueError se inválido"""
+    moment = datetime.fromisoformat(urlsafe_base64_decode(cursor).decode())
+    if timezone.is_naive(moment):
+        raise ValueError(cursor)
+    return moment
+
+
+def retention_horizon(now):
+    return now - timedelta(days=settings.LISTS_TOMBSTONE_RETENTION_DAYS)
+
+
+def record_deletions(kind, objects):
+    """Grava os tombstones de listas ou itens apagados, em um único INSERT"""
+    Tombstone.objects.bulk_create(
+        Tombstone(kind=kind, object_id=obj.id, list_id=obj.id if kind == Tombstone.LIST else obj.list_id)
+        for obj in objects
+    )
+
+
+def changes_since(since=None, list_id=None):
+    """
+    Listas e itens alterados e ids apagados desde `since` (None = tudo), mais o
+    cursor para a próxima chamada. Com `list_id`, só os daquela lista.
+    """
+    now = timezone.now()
+    if since is not None and since < retention_horizon(now):
+        raise CursorExpired(since)
+
+    lists = List.objects.order_by('updated_at', 'id')
+    items = Item.objects.order_by('updated_at', 'id')
+    deleted = Tombstone.objects.none()
+    if since is not None:
+        start = since - timedelta(seconds=settings.LISTS_CHANGES_OVERLAP_SECONDS)
+        lists = lists.filter(updated_at__gt=start)
+        items = items.filter(updated_at__gt=start)
+        deleted = Tombstone.objects.filter(deleted_at__gt=start).order_by('deleted_at', 'id')
+    if list_id is not None:
+        lists = lists.filter(id=list_id)
+        items = items.filter(list_id=list_id)
+        deleted = deleted.filter(list_id=list_id)
+
+    # O cliente aplica as remoções depois dos upserts: ids não são reaproveitados
+    changes = {
+        "lists": list(lists.values('id', 'name')),
+        "items": list(items.values('list_id', *ItemSerializer.Meta.fields)),
+        "deleted": {"lists": [], "items": []},
+    }
+    for kind, object_id, list_id in deleted.values_list('kind', 'object_id', 'list_id'):
+        if kind == Tombstone.LIST:
+            changes["deleted"]["lists"].append(object_id)
+        else:
+            changes["deleted"]["items"].append({"id": object_id, "list_id": list_id})
+
+    changes["cursor"] = encode_cursor(now)
+    return changes
+
+
+def prune_tombstones(now=None):
+    """Remove os tombstones fora da janela de retenção; retorna quantos"""
+    horizon = retention_horizon(now or timezone.now())
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=horizon).delete()
+    return deleted
@@ -0,0 +1,98 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from lists.models import List, Item
+from lists.positions import evenly_spaced
+from lists.search import search, POSTGRES_SEARCH_SQL
+
+WORDS = [
+    'arroz', 'feijão', 'açúcar', 'café', 'pão', 'leite', 'manteiga', 'maçã', 'banana', 'limão',
+    'sabão', 'detergente', 'farinha', 'macarrão', 'tomate', 'cebola', 'alho', 'batata', 'cenoura',
+    'presente', 'aniversário', 'viagem', 'filme', 'série', 'livro', 'jantar', 'praia', 'montanha',
+    'integral', 'orgânico', 'grande', 'pequeno', 'verde', 'maduro', 'ralado', 'fatiado', 'caseiro',
+]
+
+# Termo exato, sem acento, plural, erro de digitação e pedaço de palavra
+QUERIES = ['açúcar', 'acucar', 'tomates', 'macarao', 'aniver']
+
+
+def synthetic_names(count, rng):
+    return [' '.join(rng.sample(WORDS, rng.randint(1, 4))).capitalize() for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência da busca em listas e itens com dezenas de milhares de itens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=200, help='Listas sintéticas')
+        parser.add_argument('--items', type=int, default=50000, help='Itens sintéticos no total')
+        parser.add_argument('--iterations', type=int, default=20, help='Buscas por termo')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def measure(self, query, iterations):
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            hits = search(query, 20)
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            "hits": len(hits),
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1], 2),
+        }
+
+    def indexes_used(self, query):
+        """Índices que aparecem no plano da consulta (só no Postgres)"""
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + POSTGRES_SEARCH_SQL, {"q": query, "limit": 20, "offset": 0})
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        return sorted({name for name in (
+            'list_name_fts_idx', 'list_name_trgm_idx', 'item_name_fts_idx', 'item_name_trgm_idx',
+        ) if name in plan})
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        per_list = max(options['items'] // max(options['lists'], 1), 1)
+        positions = evenly_spaced(per_list)
+        results = {"vendor": connection.vendor, "queries": {}}
+
+        # Tudo roda em uma transação desfeita no fim: as listas reais não são tocadas
+        with transaction.atomic():
+            lists = List.objects.bulk_create(List(name=name) for name in synthetic_names(options['lists'], rng))
+            Item.objects.bulk_create(
+                (
+                    Item(list=list_obj, name=name, position=position)
+                    for list_obj in lists
+                    for name, position in zip(synthetic_names(per_list, rng), positions)
+                ),
+                batch_size=2000,
+            )
+            results["items"] = len(lists) * per_list
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE lists_list, lists_item')
+
+            for query in QUERIES:
+                results["queries"][query] = self.measure(query, options['iterations'])
+                if connection.vendor == 'postgresql':
+                    results["queries"][query]["indexes"] = self.indexes_used(query)
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{results["items"]} itens em {len(lists)} listas ({results["vendor"]})'
+        ))
+        for query, data in results["queries"].items():
+            indexes = ', '.join(data.get('indexes', [])) or '-'
+            self.stdout.write(
+                f'  {query:<10} {data["hits"]:>3} resultados  p50 {data["p50_ms"]:>8} ms  '
+                f'p95 {data["p95_ms"]:>8} ms  índices: {indexes}'
+            )
@@ -0,0 +1,86 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from config.renderers import ORJSONRenderer
+from lists.models import List, Item
+from lists.positions import evenly_spaced
+from lists.serializers import ListSerializer, list_values
+
+
+class Command(BaseCommand):
+    help = 'Compara o GET /api/lists/ com serializers + json e com .values() + orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=50, help='Listas sintéticas')
+        parser.add_argument('--items', type=int, default=100, help='Itens por lista')
+        parser.add_argument('--iterations', type=int, default=20, help='Respostas montadas por cenário')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def measure(self, iterations, build):
+        timings = []
+        cpu = []
+        body = b''
+        for _ in range(iterations):
+            start, start_cpu = time.perf_counter(), time.process_time()
+            body = build()
+            timings.append(time.perf_counter() - start)
+            cpu.append(time.process_time() - start_cpu)
+        return body, {
+            "response_bytes": len(body),
+            "requests_per_second": round(1 / statistics.median(timings), 1),
+            "p50_ms": round(statistics.median(timings) * 1000, 2),
+            "cpu_ms_per_request": round(statistics.mean(cpu) * 1000, 2),
+        }
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        positions = evenly_spaced(options['items'])
+
+        def serializers_json():
+            lists = List.objects.prefetch_related('item_set').order_by('name')
+            return JSONRenderer().render(ListSerializer(lists, many=True).data)
+
+        def values_orjson():
+            return ORJSONRenderer().render(list_values(List.objects.order_by('name')))
+
+        # Tudo roda em uma transação desfeita no fim: as listas reais não são tocadas
+        with transaction.atomic():
+            List.objects.all().delete()
+            lists = List.objects.bulk_create(List(name=f'Lista {i:04d}') for i in range(options['lists']))
+            Item.objects.bulk_create(
+                (
+                    Item(list=list_obj, name=f'Item {j} da lista {list_obj.name}', completed=j % 3 == 0, position=position)
+                    for list_obj in lists
+                    for j, position in enumerate(positions)
+                ),
+                batch_size=1000,
+            )
+
+            results = {}
+            bodies = {}
+            for name, build in (('serializers_json', serializers_json), ('values_orjson', values_orjson)):
+                bodies[name], results[name] = self.measure(iterations, build)
+            transaction.set_rollback(True)
+
+        # Os dois caminhos têm que produzir a mesma resposta
+        results['same_payload'] = bodies['serializers_json'] == bodies['values_orjson']
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{options["lists"]} listas x {options["items"]} itens, {iterations} iterações'
+        ))
+        for name in ('serializers_json', 'values_orjson'):
+            data = results[name]
+            self.stdout.write(
+                f'  {name:<18} {data["response_bytes"]:>10} bytes  {data["requests_per_second"]:>8} req/s  '
+                f'p50 {data["p50_ms"]:>8} ms  cpu {data["cpu_ms_per_request"]:>8} ms'
+            )
+        self.stdout.write(f'  mesma resposta: {results["same_payload"]}')
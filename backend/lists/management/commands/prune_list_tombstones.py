@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from lists.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Remove os registros de listas e itens apagados fora da janela de retenção'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} tombstones removidos'))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+
+def evenly_spaced(count):
+    """Cópia de lists.positions.evenly_spaced como era nesta migração: chaves só com fração"""
+    length = 1
+    while BASE ** length <= count:
+        length += 1
+    keys = []
+    for i in range(1, count + 1):
+        value = i * BASE ** length // (count + 1)
+        digits = ''
+        for _ in range(length):
+            value, digit = divmod(value, BASE)
+            digits = DIGITS[digit] + digits
+        keys.append(digits.rstrip(DIGITS[0]))
+    return keys
+
+
+def backfill_positions(apps, schema_editor):
+    """Posições iniciais seguem a ordem atual (por id) de cada lista"""
+    Item = apps.get_model('lists', 'Item')
+    list_ids = Item.objects.values_list('list_id', flat=True).distinct()
+    for list_id in list_ids:
+        items = list(Item.objects.filter(list_id=list_id).order_by('id').only('id'))
+        for item, key in zip(items, evenly_spaced(len(items))):
+            item.position = key
+        Item.objects.bulk_update(items, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='item',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='position',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['list', 'position'], name='item_list_position_idx'),
+        ),
+    ]
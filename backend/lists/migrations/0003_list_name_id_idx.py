@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0002_item_position'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='list',
+            index=models.Index(fields=['name', 'id'], name='list_name_id_idx'),
+        ),
+    ]
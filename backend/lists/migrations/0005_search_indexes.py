@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 17:05
+
+from django.db import migrations
+
+# unaccent() é STABLE (depende do dicionário) e não pode ir em um índice; o
+# wrapper fixa o dicionário e é declarado IMMUTABLE
+CREATE_SQL = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+"""
+
+# As expressões precisam ser idênticas às de lists/search.py
+INDEXES = {
+    'list_name_fts_idx': "lists_list USING gin (to_tsvector('portuguese'::regconfig, immutable_unaccent(name)))",
+    'list_name_trgm_idx': "lists_list USING gin (immutable_unaccent(lower(name)) gin_trgm_ops)",
+    'item_name_fts_idx': "lists_item USING gin (to_tsvector('portuguese'::regconfig, immutable_unaccent(name)))",
+    'item_name_trgm_idx': "lists_item USING gin (immutable_unaccent(lower(name)) gin_trgm_ops)",
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    """Só no Postgres; nos outros bancos a busca usa o caminho sem índices"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_SQL)
+    for name, definition in INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    schema_editor.execute('DROP FUNCTION IF EXISTS immutable_unaccent(text)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0004_updated_at_tombstones'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
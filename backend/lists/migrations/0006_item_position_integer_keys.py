@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 19:10
+
+from django.db import migrations
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+ZERO_HEAD = DIGITS.index('i')
+
+
+def integer_keys(count):
+    """'i0', 'i1', ..., 'iz', 'j00', ...: as chaves do lists.positions.evenly_spaced atual"""
+    keys = []
+    length, value = 1, 0
+    for _ in range(count):
+        if value == BASE ** length:
+            length, value = length + 1, 0
+        digits = ''
+        remaining = value
+        for _ in range(length):
+            remaining, digit = divmod(remaining, BASE)
+            digits = DIGITS[digit] + digits
+        keys.append(DIGITS[ZERO_HEAD + length - 1] + digits)
+        value += 1
+    return keys
+
+
+def fraction_keys(count):
+    """As chaves só com fração do formato anterior (ver 0002_item_position)"""
+    length = 1
+    while BASE ** length <= count:
+        length += 1
+    keys = []
+    for i in range(1, count + 1):
+        value = i * BASE ** length // (count + 1)
+        digits = ''
+        for _ in range(length):
+            value, digit = divmod(value, BASE)
+            digits = DIGITS[digit] + digits
+        keys.append(digits.rstrip(DIGITS[0]))
+    return keys
+
+
+def renumber(generate):
+    """Renumera as posições de cada lista no formato de `generate`, mantendo a ordem"""
+    def run(apps, schema_editor):
+        Item = apps.get_model('lists', 'Item')
+        list_ids = Item.objects.values_list('list_id', flat=True).distinct()
+        for list_id in list_ids:
+            items = list(Item.objects.filter(list_id=list_id).order_by('position', 'id').only('id'))
+            for item, key in zip(items, generate(len(items))):
+                item.position = key
+            Item.objects.bulk_update(items, ['position'], batch_size=500)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0005_search_indexes'),
+    ]
+
+    operations = [
+        # As chaves passam a ter uma parte inteira de tamanho variável (ver lists/positions.py)
+        migrations.RunPython(renumber(integer_keys), renumber(fraction_keys)),
+    ]
@@ -1,9 +1,19 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class List(models.Model):
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Paginação por cursor na ordem (name, id)
+            models.Index(fields=['name', 'id'], name='list_name_id_idx'),
+            # Sincronização incremental (ver lists/changes.py)
+            models.Index(fields=['updated_at'], name='list_updated_at_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -13,7 +23,39 @@ class Item(models.Model):
     name = models.CharField(max_length=255)
     completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # auto_now não vale para update()/bulk_update(): esses caminhos definem o campo
+    updated_at = models.DateTimeField(auto_now=True)
     list = models.ForeignKey(List, on_delete=models.CASCADE, verbose_name='List')
+    # Chave fracionária em base 36 (ver lists/positions.py): mover é um UPDATE de uma linha
+    position = models.CharField(max_length=255, default='')
+
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['list', 'position'], name='item_list_position_idx'),
+            models.Index(fields=['updated_at'], name='item_updated_at_idx'),
+        ]
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class Tombstone(models.Model):
+    """Registro de uma lista ou item apagado, mantido pela janela de retenção"""
+    LIST = 'list'
+    ITEM = 'item'
+    KIND_CHOICES = [(LIST, 'List'), (ITEM, 'Item')]
+
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Lista do item apagado (ou a própria lista), para o cliente localizar o cache
+    list_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
@@ -0,0 +1,198 @@
+"""
+Posições fracionárias dos itens de uma lista.
+
+Cada item guarda uma chave em base 36 que ordena lexicograficamente; mover um
+item é gerar uma chave entre as dos vizinhos e atualizar uma única linha.
+
+A chave é uma parte inteira de tamanho variável seguida de uma fração. O
+primeiro caractere da parte inteira indica quantos dígitos ela tem: de 'i' a
+'z', inteiros com 1 a 18 dígitos, e de 'h' a '0', os negativos, com 1 a 18
+dígitos. Inserir no fim ou no começo só incrementa ou decrementa a parte
+inteira, então as chaves crescem um caractere a cada potência de 36 inserções.
+Só inserções repetidas entre os mesmos vizinhos alongam a fração; quando uma
+chave passa de REBALANCE_LENGTH a lista é renumerada em segundo plano.
+
+Só dígitos e letras minúsculas: a ordem é a mesma em qualquer collation.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+REBALANCE_LENGTH = 24
+
+# Cabeça dos inteiros com um dígito: 'i0' é o zero e a chave de uma lista vazia
+ZERO_HEAD = DIGITS.index('i')
+FIRST_KEY = 'i0'
+SMALLEST_INTEGER = DIGITS[0] * (ZERO_HEAD + 1)
+
+
+def integer_length(head):
+    """Quantos dígitos seguem a cabeça `head` na parte inteira"""
+    index = DIGITS.index(head)
+    return index - ZERO_HEAD + 1 if index >= ZERO_HEAD else ZERO_HEAD - index
+
+
+def split_key(key):
+    """Separa a chave em (parte inteira com a cabeça, fração); ValueError se inválida"""
+    if not key or any(char not in DIGITS for char in key) or key == SMALLEST_INTEGER:
+        raise ValueError(f'Chave de posição inválida: {key!r}')
+    length = integer_length(key[0]) + 1
+    integer, fraction = key[:length], key[length:]
+    # Sem zeros à direita na fração, senão não haveria chave logo antes dela
+    if len(integer) < length or fraction.endswith(DIGITS[0]):
+        raise ValueError(f'Chave de posição inválida: {key!r}')
+    return integer, fraction
+
+
+def increment(integer):
+    """Próxima parte inteira, ou None depois da maior"""
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        if digits[i] != DIGITS[-1]:
+            digits[i] = DIGITS[DIGITS.index(digits[i]) + 1]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[0]
+    # Todos os dígitos no máximo: passa para a cabeça seguinte
+    if head == DIGITS[-1]:
+        return None
+    head = DIGITS[DIGITS.index(head) + 1]
+    return head + DIGITS[0] * integer_length(head)
+
+
+def decrement(integer):
+    """Parte inteira anterior, ou None antes da menor"""
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        if digits[i] != DIGITS[0]:
+            digits[i] = DIGITS[DIGITS.index(digits[i]) - 1]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[-1]
+    if head == DIGITS[0]:
+        return None
+    head = DIGITS[DIGITS.index(head) - 1]
+    return head + DIGITS[-1] * integer_length(head)
+
+
+def midpoint(a, b):
+    """Fração estritamente entre `a` ('' = início) e `b` (None = fim)"""
+    if b is not None:
+        # Prefixo comum (tratando `a` como completado com zeros)
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n:
+            return b[:n] + midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b) // 2]
+    # Dígitos consecutivos: b[0] sozinho já fica entre os dois se b é mais longo
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + midpoint(a[1:], None)
+
+
+def key_between(a, b):
+    """Chave entre dois vizinhos; None em `a` ou `b` significa início ou fim"""
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f'{a!r} não é menor que {b!r}')
+    if a is None and b is None:
+        return FIRST_KEY
+
+    if a is None:
+        integer, fraction = split_key(b)
+        if fraction:
+            return integer
+        previous = decrement(integer)
+        return previous if previous is not None else integer + midpoint('', fraction)
+
+    integer, fraction = split_key(a)
+    following = increment(integer)
+    if b is None:
+        return following if following is not None else integer + midpoint(fraction, None)
+
+    integer_b, fraction_b = split_key(b)
+    if integer == integer_b:
+        return integer + midpoint(fraction, fraction_b)
+    if following is not None and following < b:
+        return following
+    return integer + midpoint(fraction, None)
+
+
+def keys_after(last, count):
+    """`count` chaves crescentes depois de `last`, para inserções no fim"""
+    keys = []
+    for _ in range(count):
+        last = key_between(last, None)
+        keys.append(last)
+    return keys
+
+
+def evenly_spaced(count):
+    """`count` chaves curtas e igualmente espaçadas (inteiros seguidos), usadas no rebalanceamento"""
+    return keys_after(None, count)
+
+
+def last_position(list_id):
+    """Maior posição da lista, lida pelo índice (list_id, position)"""
+    from .models import Item
+
+    return Item.objects.filter(list_id=list_id).order_by('-position').values_list('position', flat=True).first()
+
+
+def rebalance(list_id):
+    """Renumera as posições de uma lista com chaves curtas, mantendo a ordem"""
+    from config.cache import bump
+    from realtime.broker import publish
+    from .models import Item
+
+    with transaction.atomic():
+        items = list(Item.objects.select_for_update().filter(list_id=list_id).only('id', 'position'))
+        now = timezone.now()
+        for item, key in zip(items, evenly_spaced(len(items))):
+            item.position = key
+            item.updated_at = now
+        Item.objects.bulk_update(items, ['position', 'updated_at'], batch_size=500)
+        bump('lists', f'list:{list_id}')
+        publish('items.reordered', {"list_id": list_id})
+
+
+def run_rebalance(list_id):
+    try:
+        rebalance(list_id)
+    except Exception:
+        logger.exception('Falha ao rebalancear as posições da lista %s', list_id)
+    finally:
+        # Threads do pool não passam pelo ciclo de requisição do Django
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='item-positions')
+        return _executor
+
+
+def schedule_rebalance(list_id):
+    """Rebalanceia a lista em segundo plano depois do commit"""
+    transaction.on_commit(lambda: get_executor().submit(run_rebalance, list_id))
+
+
+def check_length(list_id, key):
+    """Agenda o rebalanceamento da lista se a chave ficou longa demais"""
+    if len(key) > REBALANCE_LENGTH:
+        schedule_rebalance(list_id)
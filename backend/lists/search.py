@@ -0,0 +1,98 @@
+"""
+Busca por nome em listas e itens.
+
+No Postgres, cada nome é indexado duas vezes, sem acentos: um tsvector em
+português (GIN), que casa palavras pelo radical ("compras" acha "comprar"), e
+trigramas (GIN com pg_trgm), que toleram erros de digitação e pedaços de
+palavras. As expressões das consultas abaixo são idênticas às dos índices
+criados na migração 0005; mudar uma exige mudar a outra.
+
+Nos outros bancos (SQLite nos testes) a busca é por substring sem acentos, com
+a relevância calculada em Python: serve para listas pequenas, não para produção.
+"""
+import difflib
+import unicodedata
+
+from django.db import connection
+from django.db.models import F, Func, Q
+from django.db.models.functions import Lower
+
+from .models import List, Item
+
+# Uma busca combina os dois sinais: a nota do texto completo e a semelhança por
+# trigramas entre o termo e a palavra mais parecida do nome. O termo entra
+# direto em cada condição (e não em uma CTE) para virar constante no plano e
+# os índices poderem ser usados
+TSQUERY = "websearch_to_tsquery('portuguese'::regconfig, immutable_unaccent(%(q)s))"
+TERM = "immutable_unaccent(lower(%(q)s))"
+
+POSTGRES_SEARCH_SQL = f"""
+SELECT 'list' AS kind, l.id, l.id AS list_id, l.name, l.name AS list_name,
+       ts_rank(to_tsvector('portuguese'::regconfig, immutable_unaccent(l.name)), {TSQUERY})
+       + word_similarity({TERM}, immutable_unaccent(lower(l.name))) AS rank
+FROM lists_list l
+WHERE to_tsvector('portuguese'::regconfig, immutable_unaccent(l.name)) @@ {TSQUERY}
+   OR {TERM} <%% immutable_unaccent(lower(l.name))
+UNION ALL
+SELECT 'item', i.id, i.list_id, i.name, l.name,
+       ts_rank(to_tsvector('portuguese'::regconfig, immutable_unaccent(i.name)), {TSQUERY})
+       + word_similarity({TERM}, immutable_unaccent(lower(i.name)))
+FROM lists_item i JOIN lists_list l ON l.id = i.list_id
+WHERE to_tsvector('portuguese'::regconfig, immutable_unaccent(i.name)) @@ {TSQUERY}
+   OR {TERM} <%% immutable_unaccent(lower(i.name))
+ORDER BY rank DESC, kind, id
+LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+HIT_FIELDS = ('kind', 'id', 'list_id', 'name', 'list_name', 'rank')
+
+
+def unaccent(text):
+    """Minúsculas e sem acentos, como o immutable_unaccent(lower(...)) do Postgres"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search(query, limit, offset=0):
+    """Os resultados de `offset` a `offset + limit`, do mais para o menos relevante"""
+    if connection.vendor == 'postgresql':
+        return search_postgres(query, limit, offset)
+    return search_fallback(query, limit, offset)
+
+
+def search_postgres(query, limit, offset):
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_SEARCH_SQL, {"q": query, "limit": limit, "offset": offset})
+        return [
+            {**dict(zip(HIT_FIELDS, row)), "rank": round(row[-1], 4)}
+            for row in cursor.fetchall()
+        ]
+
+
+def search_fallback(query, limit, offset):
+    term = unaccent(query).strip()
+    words = term.split()
+    if not words:
+        return []
+
+    # O filtro roda no banco; a função unaccent do SQLite é registrada em lists/signals.py
+    plain = Func(Lower(F('name')), function='unaccent')
+    matches = Q()
+    for word in words:
+        matches |= Q(plain__contains=word)
+
+    hits = [
+        {"kind": 'list', "id": row['id'], "list_id": row['id'], "name": row['name'], "list_name": row['name']}
+        for row in List.objects.annotate(plain=plain).filter(matches).values('id', 'name')
+    ]
+    hits += [
+        {"kind": 'item', **row}
+        for row in Item.objects.annotate(plain=plain).filter(matches).values('id', 'list_id', 'name', list_name=F('list__name'))
+    ]
+    for hit in hits:
+        name = unaccent(hit['name'])
+        found = sum(word in name for word in words) / len(words)
+        hit['rank'] = round(found + difflib.SequenceMatcher(None, term, name).ratio(), 4)
+
+    hits.sort(key=lambda hit: (-hit['rank'], hit['kind'], hit['id']))
+    return hits[offset:offset + limit]
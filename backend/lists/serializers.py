@@ -4,7 +4,7 @@ from .models import List, Item
 class ItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = Item
-        fields = ['id', 'name', 'completed']
+        fields = ['id', 'name', 'completed', 'position']
 
 
 class ListSerializer(serializers.ModelSerializer):
@@ -13,3 +13,35 @@ class ListSerializer(serializers.ModelSerializer):
     class Meta:
         model = List
         fields = ['id', 'name', 'items']
+
+
+# Caminho rápido das leituras: a mesma saída dos serializers acima, montada a
+# partir de .values() sem instanciar modelos nem passar pelos campos do DRF
+def item_values(items):
+    return list(items.values(*ItemSerializer.Meta.fields))
+
+
+def list_values(lists):
+    """Equivale a ListSerializer(lists, many=True).data, com duas consultas"""
+    rows = list(lists.values('id', 'name'))
+    items = {}
+    for item in Item.objects.filter(list__in=lists.values('id')).values('list_id', *ItemSerializer.Meta.fields):
+        items.setdefault(item.pop('list_id'), []).append(item)
+    for row in rows:
+        row['items'] = items.get(row['id'], [])
+    return rows
+
+
+# Versões para as views assíncronas (ORM assíncrono, mesmas consultas)
+async def aitem_values(items):
+    return [row async for row in items.values(*ItemSerializer.Meta.fields)]
+
+
+async def alist_values(lists):
+    rows = [row async for row in lists.values('id', 'name')]
+    items = {}
+    async for item in Item.objects.filter(list__in=lists.values('id')).values('list_id', *ItemSerializer.Meta.fields):
+        items.setdefault(item.pop('list_id'), []).append(item)
+    for row in rows:
+        row['items'] = items.get(row['id'], [])
+    return rows
@@ -0,0 +1,74 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from config.cache import bump
+from realtime.broker import publish
+from .models import List, Item, Tombstone
+from .changes import record_deletions
+from .search import unaccent
+
+
+def publish_list(event_type, data):
+    """Também usado pelo PUT de listas, que atualiza sem disparar sinais"""
+    publish(event_type, {"id": data['id'], "name": data['name']})
+
+
+@receiver(post_save, sender=List)
+def list_saved(sender, instance, created, **kwargs):
+    publish_list('list.created' if created else 'list.updated', {"id": instance.id, "name": instance.name})
+
+
+@receiver(post_delete, sender=List)
+def list_deleted(sender, instance, **kwargs):
+    record_deletions(Tombstone.LIST, [instance])
+    publish('list.deleted', {"id": instance.id})
+
+
+def publish_item(event_type, item):
+    """Também usado pelas operações em lote, que não disparam sinais"""
+    if event_type == 'item.deleted':
+        publish(event_type, {"id": item.id, "list_id": item.list_id})
+        return
+    publish(event_type, {
+        "id": item.id,
+        "list_id": item.list_id,
+        "name": item.name,
+        "completed": item.completed,
+        "position": item.position,
+    })
+
+
+@receiver(post_save, sender=Item)
+def item_saved(sender, instance, created, **kwargs):
+    publish_item('item.created' if created else 'item.updated', instance)
+
+
+@receiver(post_delete, sender=Item)
+def item_deleted(sender, instance, **kwargs):
+    record_deletions(Tombstone.ITEM, [instance])
+    publish_item('item.deleted', instance)
+
+
+
+# Invalida o cache de respostas: 'lists' cobre as listagens e a busca, e
+# 'list:<id>' só o que é daquela lista. As escritas que não disparam sinais
+# (UPDATE direto, operações em lote) chamam bump por conta própria
+@receiver(post_save, sender=List)
+@receiver(post_delete, sender=List)
+def list_changed(sender, instance, **kwargs):
+    bump('lists', f'list:{instance.id}')
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, instance, **kwargs):
+    bump('lists', f'list:{instance.list_id}')
+
+
+@receiver(connection_created)
+def register_unaccent(sender, connection, **kwargs):
+    """unaccent() para a busca sem Postgres (ver lists/search.py)"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'unaccent', 1, lambda text: None if text is None else unaccent(text), deterministic=True,
+        )
@@ -1,3 +1,477 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.renderers import JSONRenderer
+
+from config.renderers import ORJSONRenderer
+
+from .changes import decode_cursor, encode_cursor, prune_tombstones
+from .models import List, Item, Tombstone
+from .positions import REBALANCE_LENGTH, evenly_spaced, key_between, split_key
+from .serializers import ItemSerializer, ListSerializer, item_values, list_values
+from .views import first_items
+
 
 # Create your tests here.
+class WriteQueryCountTests(TestCase):
+    """Cada escrita é um único comando SQL sobre a linha (mais os registros que ela exige)"""
+
+    def setUp(self):
+        self.list = List.objects.create(name='Mercado')
+        self.item = Item.objects.create(list=self.list, name='Arroz', position='i0')
+        self.other = Item.objects.create(list=self.list, name='Feijão', position='i1')
+        self.url = f'/api/lists/{self.list.id}/items/{self.item.id}/'
+
+    def test_list_create(self):
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/lists/', {'name': 'Casa'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['items'], [])
+
+    def test_list_update(self):
+        # UPDATE ... RETURNING e a leitura dos itens, para manter o formato do GET
+        with self.assertNumQueries(2):
+            response = self.client.put(f'/api/lists/{self.list.id}/', {'name': 'Feira'}, content_type='application/json')
+        self.assertEqual(response.json(), self.client.get(f'/api/lists/{self.list.id}/').json())
+        self.assertEqual(response.json()['name'], 'Feira')
+        self.assertEqual([item['name'] for item in response.json()['items']], ['Arroz', 'Feijão'])
+
+        with self.assertNumQueries(1):
+            response = self.client.put('/api/lists/999/', {'name': 'Feira'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_item_create(self):
+        with self.assertNumQueries(2):
+            response = self.client.post(f'/api/lists/{self.list.id}/items/', {'name': 'Café'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(response.json()['position'], 'i1')
+
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/lists/999/items/', {'name': 'Café'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_item_update(self):
+        with self.assertNumQueries(1):
+            response = self.client.put(self.url, {'name': 'Arroz integral', 'completed': True}, content_type='application/json')
+        self.assertEqual(response.json(), {'id': self.item.id, 'name': 'Arroz integral', 'completed': True, 'position': 'i0'})
+
+    def test_item_partial_update(self):
+        with self.assertNumQueries(1) as queries:
+            response = self.client.patch(self.url, {'completed': True}, content_type='application/json')
+        self.assertEqual(response.json()['completed'], True)
+        self.assertEqual(response.json()['name'], 'Arroz')
+        # Só a coluna enviada (e updated_at) entra no UPDATE
+        update = queries.captured_queries[0]['sql']
+        self.assertIn('"completed"', update)
+        self.assertNotIn('"name" =', update)
+
+        with self.assertNumQueries(1):
+            response = self.client.patch(f'/api/lists/{self.list.id}/items/999/', {'completed': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+        with self.assertNumQueries(0):
+            response = self.client.patch(self.url, {'completed': 'sim'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_item_move(self):
+        with self.assertNumQueries(3):
+            response = self.client.post(f'{self.url}move/', {'after': self.other.id}, content_type='application/json')
+        self.assertGreater(response.json()['position'], 'i1')
+
+    def test_item_delete(self):
+        # SAVEPOINT, DELETE, INSERT do tombstone, RELEASE
+        with self.assertNumQueries(4):
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(Tombstone.objects.filter(kind=Tombstone.ITEM, object_id=self.item.id).exists())
+
+        with self.assertNumQueries(3):
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_item_delete_publishes_after_commit(self):
+        with mock.patch('realtime.broker.get_broker') as get_broker:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.delete(self.url)
+            get_broker.return_value.publish.assert_not_called()
+
+            for callback in callbacks:
+                callback()
+        get_broker.return_value.publish.assert_called_once_with(
+            'item.deleted', {"id": self.item.id, "list_id": self.list.id},
+        )
+
+
+class ValuesSerializationTests(TestCase):
+    """list_values/item_values rendem os mesmos bytes dos serializers do DRF"""
+
+    def setUp(self):
+        market = List.objects.create(name='Mercado ☕ 𝄞')
+        keys = evenly_spaced(3)
+        Item.objects.create(list=market, name='Pão\u2028de forma', position=keys[2])
+        Item.objects.create(list=market, name='"Arroz" \\ integral', position=keys[0], completed=True)
+        Item.objects.create(list=market, name='Feijão\u2029', position=keys[1])
+        List.objects.create(name='Casa')
+        self.market = market
+
+    def assertSameBytes(self, values, data):
+        self.assertEqual(ORJSONRenderer().render(values), JSONRenderer().render(data))
+
+    def test_lists(self):
+        for lists in (List.objects.order_by('name'), List.objects.filter(id=self.market.id), List.objects.none()):
+            with self.subTest(query=str(lists.query) if lists.exists() else 'none'):
+                self.assertSameBytes(list_values(lists), ListSerializer(lists, many=True).data)
+
+    def test_items(self):
+        items = Item.objects.filter(list=self.market).order_by('position', 'id')
+        self.assertSameBytes(item_values(items), ItemSerializer(items, many=True).data)
+        item = items.first()
+        self.assertSameBytes(item_values(Item.objects.filter(id=item.id))[0], ItemSerializer(item).data)
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='off')
+class ListSummaryTests(TestCase):
+    def setUp(self):
+        def create(name, *items):
+            instance = List.objects.create(name=name)
+            for key, (item, completed) in zip(evenly_spaced(len(items)), items):
+                Item.objects.create(list=instance, name=item, position=key, completed=completed)
+            return instance
+
+        # Fora de ordem e com nomes repetidos, para o desempate por id
+        self.zoo = create('Zoo', ('Ração', False))
+        self.market = create('Mercado', ('Arroz', True), ('Feijão', False), ('Café', True), ('Leite', False))
+        self.empty_market = create('Mercado')
+        self.home = create('Casa', ('Lâmpada', True), ('Sabão', False), ('Vassoura', False))
+
+    def summaries(self, **params):
+        return self.client.get('/api/lists/', {"summary": 1, **params})
+
+    def test_counts(self):
+        response = self.summaries()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"results": [
+            {"id": self.home.id, "name": 'Casa', "item_count": 3, "completed_count": 1},
+            {"id": self.market.id, "name": 'Mercado', "item_count": 4, "completed_count": 2},
+            {"id": self.empty_market.id, "name": 'Mercado', "item_count": 0, "completed_count": 0},
+            {"id": self.zoo.id, "name": 'Zoo', "item_count": 1, "completed_count": 0},
+        ], "next": None})
+
+    def test_cursor_pagination(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.summaries(**params).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen.extend(row['id'] for row in page['results'])
+            cursor = page['next']
+            if cursor is None:
+                break
+
+        # O empate em 'Mercado' divide as páginas sem repetir nem pular listas
+        self.assertEqual(seen, [self.home.id, self.market.id, self.empty_market.id, self.zoo.id])
+
+    def test_invalid_cursor(self):
+        def encode(value):
+            return urlsafe_base64_encode(json.dumps(value).encode())
+
+        for cursor in ('não é base64', encode('Casa'), encode(['Casa']), encode(['Casa', 'x']), encode(None)):
+            with self.subTest(cursor=cursor):
+                response = self.summaries(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": 'Invalid cursor.'})
+
+    def test_first_items_window(self):
+        results = self.summaries(items=2).json()['results']
+
+        self.assertEqual(
+            {row['name'] + str(row['id']): [item['name'] for item in row['items']] for row in results},
+            {
+                f'Casa{self.home.id}': ['Lâmpada', 'Sabão'],
+                f'Mercado{self.market.id}': ['Arroz', 'Feijão'],
+                f'Mercado{self.empty_market.id}': [],
+                f'Zoo{self.zoo.id}': ['Ração'],
+            },
+        )
+        self.assertEqual(set(results[0]['items'][0]), {'id', 'name', 'completed', 'position'})
+        self.assertNotIn('items', self.summaries().json()['results'][0])
+
+    def test_first_items_in_one_query(self):
+        with self.assertNumQueries(1):
+            items = first_items([self.market.id, self.home.id, self.empty_market.id], 3)
+
+        self.assertEqual([item['name'] for item in items[self.market.id]], ['Arroz', 'Feijão', 'Café'])
+        self.assertEqual(len(items[self.home.id]), 3)
+        self.assertNotIn(self.empty_market.id, items)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        self.list = List.objects.create(name='Mercado')
+        self.other = List.objects.create(name='Casa')
+        self.item = Item.objects.create(list=self.list, name='Arroz', position='i0')
+
+    def test_hit_without_queries(self):
+        first = self.client.get('/api/lists/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/lists/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+
+    def test_write_invalidates_only_affected_resources(self):
+        items_url = f'/api/lists/{self.list.id}/items/'
+        other_url = f'/api/lists/{self.other.id}/items/'
+        for url in ('/api/lists/', items_url, other_url):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'{items_url}{self.item.id}/', {'completed': True}, content_type='application/json')
+
+        response = self.client.get(items_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.json()[0]['completed'])
+        self.assertEqual(self.client.get('/api/lists/')['X-Cache'], 'MISS')
+        # Itens de outra lista continuam em cache
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'HIT')
+
+
+class BulkOperationTests(TestCase):
+    def setUp(self):
+        self.list = List.objects.create(name='Mercado')
+        self.create_items()
+        self.url = f'/api/lists/{self.list.id}/items/bulk/'
+
+    def create_items(self):
+        self.items = Item.objects.bulk_create(
+            Item(list=self.list, name=f'Item {i}', position=key) for i, key in enumerate(evenly_spaced(150))
+        )
+
+    def post(self, operations):
+        return self.client.post(self.url, {"operations": operations}, content_type='application/json')
+
+    def mixed(self, count):
+        """`count` operações de cada tipo (criar, atualizar, apagar e mover)"""
+        operations = []
+        for i in range(count):
+            operations += [
+                {"op": 'create', "name": f'Novo {i}'},
+                {"op": 'update', "id": self.items[i].id, "completed": True},
+                {"op": 'delete', "id": self.items[50 + i].id},
+                {"op": 'move', "id": self.items[100 + i].id, "before": self.items[0].id},
+            ]
+        return operations
+
+    def test_query_count_does_not_depend_on_the_number_of_operations(self):
+        # Lista, SAVEPOINT, itens, INSERT, UPDATE, DELETE, tombstones, RELEASE
+        for count in (1, 50):
+            with self.subTest(count=count), self.assertNumQueries(8):
+                response = self.post(self.mixed(count))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual({result['status'] for result in response.json()['results']}, {200, 201, 204})
+            Item.objects.filter(list=self.list).delete()
+            self.create_items()
+
+    def test_without_moves_reads_only_the_referenced_items(self):
+        operations = [{"op": 'update', "id": item.id, "name": 'Outro'} for item in self.items[:50]]
+        operations += [{"op": 'create', "name": 'Novo'}]
+        # Lista, SAVEPOINT, itens citados, última posição, INSERT, UPDATE, RELEASE
+        with self.assertNumQueries(7):
+            response = self.post(operations)
+        self.assertEqual(len(response.json()['results']), 51)
+
+    def test_booleans_are_not_ids(self):
+        response = self.post([
+            {"op": 'delete', "id": True},
+            {"op": 'move', "id": self.items[1].id, "after": False},
+        ])
+        self.assertEqual([result['status'] for result in response.json()['results']], [400, 400])
+        self.assertEqual(Item.objects.filter(list=self.list).count(), 150)
+
+
+class PositionKeyTests(TestCase):
+    def assertOrdered(self, keys):
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        for key in keys:
+            split_key(key)
+
+    def test_appends_grow_logarithmically(self):
+        keys = [key_between(None, None)]
+        for _ in range(2000):
+            keys.append(key_between(keys[-1], None))
+        self.assertOrdered(keys)
+        # 'i0'..'iz' e depois três dígitos: 36 + 36² chaves antes de crescer de novo
+        self.assertEqual(keys[:3], ['i0', 'i1', 'i2'])
+        self.assertEqual(max(map(len, keys)), 4)
+
+    def test_prepends_grow_logarithmically(self):
+        keys = [key_between(None, None)]
+        for _ in range(2000):
+            keys.insert(0, key_between(None, keys[0]))
+        self.assertOrdered(keys)
+        self.assertEqual(keys[-2:], ['hz', 'i0'])
+        self.assertEqual(max(map(len, keys)), 4)
+
+    def test_inserts_between_the_same_neighbours(self):
+        after, before = 'i0', 'i1'
+        keys = [after, before]
+        for _ in range(60):
+            before = key_between(after, before)
+            keys.insert(1, before)
+        self.assertOrdered(keys)
+        # Só a fração cresce, e devagar: o rebalanceamento é raro
+        self.assertLess(len(keys[1]), REBALANCE_LENGTH)
+
+    def test_move_between_tied_neighbours_defers_the_rebalance(self):
+        list_obj = List.objects.create(name='Mercado')
+        first = Item.objects.create(list=list_obj, name='Arroz', position='i0')
+        tied = [Item.objects.create(list=list_obj, name=name, position='i1') for name in ('Feijão', 'Café')]
+        last = Item.objects.create(list=list_obj, name='Sal', position='i2')
+
+        with mock.patch('lists.positions.rebalance') as rebalance, \
+                mock.patch('lists.views.schedule_rebalance') as schedule:
+            response = self.client.post(
+                f'/api/lists/{list_obj.id}/items/{first.id}/move/', {'after': tied[0].id}, content_type='application/json',
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('i1' < response.json()['position'] < last.position)
+        rebalance.assert_not_called()
+        schedule.assert_called_once_with(list_obj.id)
+
+    def test_invalid_keys(self):
+        for key in ('', 'a', 'i', 'i10', 'I0', 'i0-'):
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                split_key(key)
+        with self.assertRaises(ValueError):
+            key_between('i1', 'i0')
+
+
+@override_settings(LISTS_CHANGES_OVERLAP_SECONDS=5, LISTS_TOMBSTONE_RETENTION_DAYS=30, RESPONSE_CACHE_BACKEND='off')
+class ChangesTests(TestCase):
+    url = '/api/lists/changes/'
+
+    def setUp(self):
+        self.list = List.objects.create(name='Mercado')
+        self.other = List.objects.create(name='Casa')
+        self.item = Item.objects.create(list=self.list, name='Arroz', position='i0')
+        self.gone = Item.objects.create(list=self.list, name='Feijão', position='i1')
+        # Tudo que já existia foi alterado bem antes do cursor
+        self.cursor_time = timezone.now()
+        past = self.cursor_time - timedelta(minutes=10)
+        List.objects.update(updated_at=past)
+        Item.objects.update(updated_at=past)
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = encode_cursor(since)
+        return self.client.get(self.url, params)
+
+    def test_full_sync_without_cursor(self):
+        data = self.changes().json()
+        self.assertEqual({row['name'] for row in data['lists']}, {'Mercado', 'Casa'})
+        self.assertEqual(len(data['items']), 2)
+        self.assertEqual(data['deleted'], {"lists": [], "items": []})
+        self.assertLessEqual(self.cursor_time, decode_cursor(data['cursor']))
+
+    def test_only_changes_after_the_cursor(self):
+        Item.objects.filter(id=self.item.id).update(completed=True, updated_at=timezone.now())
+        gone_id, other_id = self.gone.id, self.other.id
+        self.gone.delete()
+        self.other.delete()
+
+        data = self.changes(self.cursor_time).json()
+        self.assertEqual(data['lists'], [])
+        self.assertEqual([(row['id'], row['completed']) for row in data['items']], [(self.item.id, True)])
+        self.assertEqual(data['deleted'], {
+            "lists": [other_id],
+            "items": [{"id": gone_id, "list_id": self.list.id}],
+        })
+
+    def test_overlap_catches_late_commits(self):
+        # Gravado com um updated_at anterior ao cursor, por uma transação que terminou depois
+        Item.objects.filter(id=self.item.id).update(updated_at=self.cursor_time - timedelta(seconds=3))
+        Item.objects.filter(id=self.gone.id).update(updated_at=self.cursor_time - timedelta(seconds=8))
+
+        data = self.changes(self.cursor_time).json()
+        self.assertEqual([row['id'] for row in data['items']], [self.item.id])
+
+    def test_filter_by_list(self):
+        Item.objects.create(list=self.other, name='Sabão', position='i0')
+        self.gone.delete()
+
+        data = self.changes(self.cursor_time, list=self.other.id).json()
+        self.assertEqual([row['name'] for row in data['items']], ['Sabão'])
+        self.assertEqual(data['deleted']['items'], [])
+
+    def test_cursor_before_the_retention_window_is_gone(self):
+        response = self.changes(timezone.now() - timedelta(days=31))
+        self.assertEqual(response.status_code, 410)
+
+        self.assertEqual(self.changes(timezone.now() - timedelta(days=29)).status_code, 200)
+        self.assertEqual(self.client.get(self.url, {'since': 'invalido'}).status_code, 400)
+
+    def test_prune_tombstones(self):
+        self.gone.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        item_id = self.item.id
+        self.item.delete()
+
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [item_id])
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='off')
+class SearchTests(TestCase):
+    """Caminho sem Postgres: substring sem acentos, relevância calculada em Python"""
+
+    def setUp(self):
+        self.market = List.objects.create(name='Mercado')
+        self.coffee_list = List.objects.create(name='Café da manhã')
+        Item.objects.create(list=self.market, name='Café', position='i0')
+        Item.objects.create(list=self.market, name='Café em pó extra forte', position='i1')
+        Item.objects.create(list=self.market, name='Pão de forma', position='i2')
+
+    def search(self, q, **params):
+        return self.client.get('/api/lists/search/', {'q': q, **params})
+
+    def test_ignores_accents_and_case(self):
+        results = self.search('CAFE').json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual({hit['kind'] for hit in results}, {'list', 'item'})
+
+    def test_closer_names_rank_first(self):
+        results = self.search('cafe').json()['results']
+        # O item chamado só "Café" casa melhor que os nomes mais longos
+        self.assertEqual(results[0]['name'], 'Café')
+        self.assertEqual(results[0]['list_name'], 'Mercado')
+        ranks = [hit['rank'] for hit in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_names_with_more_of_the_words_rank_first(self):
+        results = self.search('café forte').json()['results']
+        self.assertEqual(results[0]['name'], 'Café em pó extra forte')
+        # Qualquer uma das palavras basta para aparecer; "Pão de forma" não tem nenhuma
+        self.assertEqual([hit['name'] for hit in results], ['Café em pó extra forte', 'Café', 'Café da manhã'])
+
+    def test_pagination(self):
+        first = self.search('a', limit=2).json()
+        self.assertEqual(len(first['results']), 2)
+        second = self.search('a', limit=2, cursor=first['next']).json()
+        names = [hit['name'] for hit in first['results'] + second['results']]
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_query_is_required(self):
+        self.assertEqual(self.search('  ').status_code, 400)
+        self.assertEqual(self.search('inexistente').json(), {"results": [], "next": None})
@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import ListListView, ListDetailView, ItemListView, ItemDetailView
+from config.async_views import pick
+from .views import ListListView, ListDetailView, ItemListView, ItemDetailView, ItemBulkView, ItemMoveView, ListChangesView, ListSearchView
+from .views import AsyncListListView, AsyncListDetailView, AsyncItemListView, AsyncItemDetailView
 
 urlpatterns = [
-    path('', ListListView.as_view(), name='list-list'),
-    path('<int:pk>/', ListDetailView.as_view(), name='list-detail'),
-    path('<int:list_id>/items/', ItemListView.as_view(), name='item-list'),
-    path('<int:list_id>/items/<int:item_id>/', ItemDetailView.as_view(), name='item-detail'),
+    path('', pick(ListListView, AsyncListListView).as_view(), name='list-list'),
+    path('search/', ListSearchView.as_view(), name='list-search'),
+    path('changes/', ListChangesView.as_view(), name='list-changes'),
+    path('<int:pk>/', pick(ListDetailView, AsyncListDetailView).as_view(), name='list-detail'),
+    path('<int:list_id>/items/', pick(ItemListView, AsyncItemListView).as_view(), name='item-list'),
+    path('<int:list_id>/items/bulk/', ItemBulkView.as_view(), name='item-bulk'),
+    path('<int:list_id>/items/<int:item_id>/', pick(ItemDetailView, AsyncItemDetailView).as_view(), name='item-detail'),
+    path('<int:list_id>/items/<int:item_id>/move/', ItemMoveView.as_view(), name='item-move'),
 ]
 
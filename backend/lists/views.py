@@ -1,79 +1,175 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import List, Item
-from .serializers import ListSerializer, ItemSerializer
+from .models import List, Item, Tombstone
+from .serializers import ItemSerializer, item_values, list_values, aitem_values, alist_values
+from .bulk import apply_operations
+from .search import search
+from .changes import record_deletions, changes_since, decode_cursor as decode_changes_cursor, CursorExpired
+from .signals import publish_list, publish_item
+from .positions import key_between, check_length, schedule_rebalance
+from asgiref.sync import sync_to_async
+from config.async_views import AsyncAPIView
+from config.cache import cache_response, bump
+from config.db import delete_by_ids, update_returning
+from config.replicas import read_replica
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+import json
 
 # Error message constants
 NAME_REQUIRED_ERROR = "Name is required."
 LIST_NOT_FOUND_ERROR = "List not found."
 ITEM_NOT_FOUND_ERROR = "Item not found."
 NAME_AND_COMPLETED_REQUIRED_ERROR = "Name and completed are required."
+FIELDS_REQUIRED_ERROR = "Provide 'name' and/or 'completed'."
+INVALID_COMPLETED_ERROR = "Completed must be a boolean."
+OPERATIONS_REQUIRED_ERROR = "A list of operations is required."
+TOO_MANY_OPERATIONS_ERROR = "Too many operations in one request."
+INVALID_MOVE_ERROR = "Provide 'after' and/or 'before' with ids of other items in the list."
+INVALID_CURSOR_ERROR = "Invalid cursor."
+QUERY_REQUIRED_ERROR = "Query parameter 'q' is required."
+CURSOR_EXPIRED_ERROR = "Cursor is older than the retention window; fetch everything again."
+
+MAX_BULK_OPERATIONS = 1000
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_INLINE_ITEMS = 50
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_OFFSET = 1000
+
+
+def encode_cursor(row):
+    return urlsafe_base64_encode(json.dumps([row['name'], row['id']]).encode())
+
+
+def decode_cursor(cursor):
+    """Retorna (name, id) do cursor, ou lança ValueError se inválido"""
+    name, list_id = json.loads(urlsafe_base64_decode(cursor))
+    return str(name), int(list_id)
+
+
+def bounded(value, default, maximum):
+    try:
+        return min(max(int(value), 0), maximum)
+    except (TypeError, ValueError):
+        return default
+
+
+def first_items(list_ids, count):
+    """Os `count` primeiros itens de cada lista, em uma consulta com ROW_NUMBER()"""
+    rank = Window(RowNumber(), partition_by=F('list_id'), order_by=[F('position').asc(), F('id').asc()])
+    rows = (
+        Item.objects.filter(list_id__in=list_ids)
+        .annotate(rank=rank)
+        .filter(rank__lte=count)
+        .order_by('list_id', 'position', 'id')
+        .values('list_id', 'id', 'name', 'completed', 'position')
+    )
+    items = {}
+    for row in rows:
+        items.setdefault(row.pop('list_id'), []).append(row)
+    return items
+
+
+def list_summaries(request):
+    """
+    Listas com contagens calculadas no banco, paginadas por cursor em
+    (name, id). Com ?items=K, inclui só os K primeiros itens de cada lista.
+    """
+    lists = List.objects.annotate(
+        item_count=Count('item'),
+        completed_count=Count('item', filter=Q(item__completed=True)),
+    ).order_by('name', 'id')
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        try:
+            name, list_id = decode_cursor(cursor)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return Response({"error": INVALID_CURSOR_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        lists = lists.filter(Q(name__gt=name) | Q(name=name, id__gt=list_id))
+
+    limit = bounded(request.query_params.get('limit'), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+    page = list(lists.values('id', 'name', 'item_count', 'completed_count')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+
+    inline = bounded(request.query_params.get('items'), 0, MAX_INLINE_ITEMS)
+    if inline:
+        items = first_items([row['id'] for row in page], inline)
+        for row in page:
+            row['items'] = items.get(row['id'], [])
+    return Response({"results": page, "next": next_cursor})
+
 
 # Lista e criação de listas
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('lists'), name='dispatch')
+@method_decorator(read_replica, name='get')
 class ListListView(APIView):
     def get(self, request):
-        lists = List.objects.prefetch_related('item_set').order_by('name')
-        serializer = ListSerializer(lists, many=True)
-        return Response(serializer.data)
+        # Modo resumo: contagens e poucos itens; o resto vem sob demanda
+        if request.query_params.get('summary') in ('1', 'true'):
+            return list_summaries(request)
+
+        return Response(list_values(List.objects.order_by('name')))
 
     def post(self, request):
         name = request.data.get('name')
         if not name:
             return Response({"error": NAME_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
         list_obj = List.objects.create(name=name)
-        serializer = ListSerializer(list_obj)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Uma lista nova não tem itens: sem consulta para buscá-los
+        return Response({"id": list_obj.id, "name": list_obj.name, "items": []}, status=status.HTTP_201_CREATED)
 
 # Detalhes, atualização e remoção de uma lista
+@method_decorator(cache_response('list:{pk}'), name='dispatch')
 class ListDetailView(APIView):
     def get(self, request, pk):
-        try:
-            list_obj = List.objects.prefetch_related('item_set').get(id=pk)
-        except List.DoesNotExist:
+        lists = list_values(List.objects.filter(id=pk))
+        if not lists:
             return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-
-        serializer = ListSerializer(list_obj)
-        return Response(serializer.data)
+        return Response(lists[0])
 
     def put(self, request, pk):
-        try:
-            list_obj = List.objects.get(id=pk)
-        except List.DoesNotExist:
-            return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-
         name = request.data.get('name')
         if not name:
             return Response({"error": NAME_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
 
-        list_obj.name = name
-        list_obj.save()
-        serializer = ListSerializer(list_obj)
-        return Response(serializer.data)
+        # Um único UPDATE ... RETURNING; nenhuma linha alterada é um 404
+        rows = update_returning(List, ['id', 'name'], {"id": pk}, name=name, updated_at=timezone.now())
+        if not rows:
+            return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        bump('lists', f'list:{pk}')
+        publish_list('list.updated', rows[0])
+        # A resposta mantém o formato do GET, com os itens (uma segunda leitura)
+        return Response({**rows[0], "items": item_values(Item.objects.filter(list_id=pk))})
 
     def delete(self, request, pk):
-        try:
-            list_obj = List.objects.get(id=pk)
-        except List.DoesNotExist:
+        # A cascata remove os itens e registra os tombstones pelos sinais
+        deleted, _ = List.objects.filter(id=pk).delete()
+        if not deleted:
             return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-
-        list_obj.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('list:{list_id}'), name='dispatch')
 class ItemListView(APIView):
     def get(self, request, list_id):
-        try:
-            list_obj = List.objects.get(id=list_id)
-        except List.DoesNotExist:
+        items = item_values(Item.objects.filter(list_id=list_id).order_by('position', 'id'))
+        # Lista vazia ou inexistente? Só consulta a lista no caso ambíguo
+        if not items and not List.objects.filter(id=list_id).exists():
             return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-
-        items = Item.objects.filter(list=list_obj).order_by('id')
-        serializer = ItemSerializer(items, many=True)
-        return Response(serializer.data)
+        return Response(items)
 
     def post(self, request, list_id):
         name = request.data.get('name')
@@ -81,49 +177,254 @@ class ItemListView(APIView):
         if not name:
             return Response({"error": NAME_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            list_obj = List.objects.get(id=list_id)
-        except List.DoesNotExist:
+        # Existência da lista e última posição na mesma consulta
+        last = Item.objects.filter(list_id=OuterRef('id')).order_by('-position').values('position')[:1]
+        found = List.objects.filter(id=list_id).values_list(Subquery(last), flat=True)
+        if not found:
             return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
 
-        item = Item.objects.create(list=list_obj, name=name, completed=False)
+        # Novos itens entram no fim da lista
+        position = key_between(found[0], None)
+        item = Item.objects.create(list_id=list_id, name=name, completed=False, position=position)
+        check_length(list_id, position)
         serializer = ItemSerializer(item)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@method_decorator(cache_response('list:{list_id}'), name='dispatch')
 class ItemDetailView(APIView):
     def get(self, request, list_id, item_id):
-        try:
-            item = Item.objects.get(id=item_id, list_id=list_id)
-        except Item.DoesNotExist:
+        items = item_values(Item.objects.filter(id=item_id, list_id=list_id))
+        if not items:
             return Response({"error": ITEM_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-
-        serializer = ItemSerializer(item)
-        return Response(serializer.data)
+        return Response(items[0])
 
     def put(self, request, list_id, item_id):
-        try:
-            item = Item.objects.get(id=item_id, list_id=list_id)
-        except Item.DoesNotExist:
-            return Response({"error": ITEM_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-
         name = request.data.get('name')
         completed = request.data.get('completed')
 
         if name is None or completed is None:
             return Response({"error": NAME_AND_COMPLETED_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
 
-        item.name = name
-        item.completed = completed
-        item.save()
-        serializer = ItemSerializer(item)
-        return Response(serializer.data)
+        return update_item(list_id, item_id, name=name, completed=completed)
+
+    def patch(self, request, list_id, item_id):
+        # Atualização parcial: só as colunas enviadas (marcar como concluído
+        # altera completed e updated_at, nada mais)
+        fields = {key: request.data[key] for key in ('name', 'completed') if key in request.data}
+        if not fields:
+            return Response({"error": FIELDS_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if 'name' in fields and not fields['name']:
+            return Response({"error": NAME_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if 'completed' in fields and not isinstance(fields['completed'], bool):
+            return Response({"error": INVALID_COMPLETED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        return update_item(list_id, item_id, **fields)
 
     def delete(self, request, list_id, item_id):
+        with transaction.atomic():
+            # Um único DELETE ... WHERE, sem buscar o item antes
+            if not delete_by_ids(Item, [item_id], list_id=list_id):
+                return Response({"error": ITEM_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+            item = Item(id=item_id, list_id=list_id)
+            record_deletions(Tombstone.ITEM, [item])
+
+        # Depois do bloco: o evento e a invalidação só saem com o DELETE confirmado
+        bump('lists', f'list:{list_id}')
+        publish_item('item.deleted', item)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def update_item(list_id, item_id, **fields):
+    """Atualiza só os campos dados em um UPDATE ... RETURNING; 404 se nada mudou"""
+    try:
+        rows = update_returning(
+            Item, ['list_id', *ItemSerializer.Meta.fields], {"id": item_id, "list_id": list_id},
+            updated_at=timezone.now(),
+            **fields,
+        )
+    except ValidationError:
+        return Response({"error": INVALID_COMPLETED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+    if not rows:
+        return Response({"error": ITEM_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+
+    # UPDATE direto não dispara post_save: o evento e a invalidação saem daqui
+    bump('lists', f'list:{list_id}')
+    item = Item(**rows[0])
+    publish_item('item.updated', item)
+    return Response(ItemSerializer(item).data)
+
+
+def neighbour_positions(list_id, item_id, after_id, before_id):
+    """
+    Posições entre as quais o item deve ficar. Com só um dos vizinhos, o outro
+    é o item seguinte (ou anterior) a ele na lista. Lança Item.DoesNotExist se um
+    vizinho não pertence à lista.
+    """
+    ids = {i for i in (after_id, before_id) if i is not None}
+    neighbours = dict(
+        Item.objects.filter(list_id=list_id, id__in=ids).exclude(id=item_id).values_list('id', 'position')
+    )
+    if len(neighbours) != len(ids):
+        raise Item.DoesNotExist
+    after = neighbours.get(after_id)
+    before = neighbours.get(before_id)
+
+    # Busca o vizinho que faltou pelo índice (list_id, position), ignorando o próprio item
+    others = Item.objects.filter(list_id=list_id).exclude(id=item_id)
+    if after_id is not None and before_id is None:
+        before = others.filter(
+            Q(position__gt=after) | Q(position=after, id__gt=after_id)
+        ).order_by('position', 'id').values_list('position', flat=True).first()
+    elif before_id is not None and after_id is None:
+        after = others.filter(
+            Q(position__lt=before) | Q(position=before, id__lt=before_id)
+        ).order_by('-position', '-id').values_list('position', flat=True).first()
+    return after, before
+
+
+# Move um item para outra posição da lista alterando só a linha dele
+@method_decorator(csrf_exempt, name='dispatch')
+class ItemMoveView(APIView):
+    def post(self, request, list_id, item_id):
         try:
-            item = Item.objects.get(id=item_id, list_id=list_id)
+            after_id, before_id = (
+                None if request.data.get(key) is None else int(request.data.get(key))
+                for key in ('after', 'before')
+            )
+        except (TypeError, ValueError):
+            return Response({"error": INVALID_MOVE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        if (after_id is None and before_id is None) or item_id in (after_id, before_id):
+            return Response({"error": INVALID_MOVE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            after, before = neighbour_positions(list_id, item_id, after_id, before_id)
         except Item.DoesNotExist:
+            return Response({"error": INVALID_MOVE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        if before is not None and after is not None and after > before:
+            return Response({"error": INVALID_MOVE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        tied = after is not None and after == before
+        if tied:
+            # Vizinhos empatados (inserções concorrentes): o item vai logo depois
+            # do empate e a lista é renumerada em segundo plano, fora da requisição
+            before = (
+                Item.objects.filter(list_id=list_id, position__gt=after).exclude(id=item_id)
+                .order_by('position').values_list('position', flat=True).first()
+            )
+
+        position = key_between(after, before)
+        rows = update_returning(
+            Item, ['list_id', *ItemSerializer.Meta.fields], {"id": item_id, "list_id": list_id},
+            position=position,
+            updated_at=timezone.now(),
+        )
+        if not rows:
             return Response({"error": ITEM_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        # Depois do UPDATE, para a renumeração já encontrar a nova posição
+        if tied:
+            schedule_rebalance(list_id)
+        else:
+            check_length(list_id, position)
+
+        bump('lists', f'list:{list_id}')
+        item = Item(**rows[0])
+        publish_item('item.updated', item)
+        return Response(ItemSerializer(item).data)
+
+
+# Mudanças desde o cursor: o cliente mantém um cache e sincroniza só a diferença
+class ListChangesView(APIView):
+    def get(self, request):
+        since = request.query_params.get('since')
+        list_id = request.query_params.get('list')
+        try:
+            since = decode_changes_cursor(since) if since else None
+            list_id = int(list_id) if list_id else None
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return Response({"error": INVALID_CURSOR_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            return Response(changes_since(since, list_id))
+        except CursorExpired:
+            return Response({"error": CURSOR_EXPIRED_ERROR}, status=status.HTTP_410_GONE)
+
+
+# Busca nos nomes das listas e dos itens, do mais para o menos relevante
+@method_decorator(cache_response('lists'), name='dispatch')
+class ListSearchView(APIView):
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": QUERY_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = bounded(request.query_params.get('limit'), DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE) or DEFAULT_SEARCH_PAGE_SIZE
+        # Paginação por deslocamento: a ordem é pela relevância, não por uma chave única
+        offset = bounded(request.query_params.get('cursor'), 0, MAX_SEARCH_OFFSET)
+        hits = search(query, limit + 1, offset)
+        next_cursor = str(offset + limit) if len(hits) > limit and offset + limit <= MAX_SEARCH_OFFSET else None
+        return Response({"results": hits[:limit], "next": next_cursor})
 
-        item.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
 
+# Várias operações sobre os itens em uma única requisição e transação
+@method_decorator(csrf_exempt, name='dispatch')
+class ItemBulkView(APIView):
+    def post(self, request, list_id):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+
+        if not isinstance(operations, list) or not operations:
+            return Response({"error": OPERATIONS_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_BULK_OPERATIONS:
+            return Response({"error": TOO_MANY_OPERATIONS_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if not List.objects.filter(id=list_id).exists():
+            return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"results": apply_operations(list_id, operations)})
+
+
+# Versões assíncronas (API_ASYNC_VIEWS): as leituras usam o ORM assíncrono e as
+# escritas herdadas rodam fora do event loop (ver config/async_views.py)
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('lists'), name='dispatch')
+@method_decorator(read_replica, name='get')
+class AsyncListListView(AsyncAPIView, ListListView):
+    async def get(self, request):
+        if request.query_params.get('summary') in ('1', 'true'):
+            return await sync_to_async(list_summaries)(request)
+
+        return Response(await alist_values(List.objects.order_by('name')))
+
+    async def post(self, request):
+        name = request.data.get('name')
+        if not name:
+            return Response({"error": NAME_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        list_obj = await List.objects.acreate(name=name)
+        return Response({"id": list_obj.id, "name": list_obj.name, "items": []}, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(cache_response('list:{pk}'), name='dispatch')
+class AsyncListDetailView(AsyncAPIView, ListDetailView):
+    async def get(self, request, pk):
+        lists = await alist_values(List.objects.filter(id=pk))
+        if not lists:
+            return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        return Response(lists[0])
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('list:{list_id}'), name='dispatch')
+class AsyncItemListView(AsyncAPIView, ItemListView):
+    async def get(self, request, list_id):
+        items = await aitem_values(Item.objects.filter(list_id=list_id).order_by('position', 'id'))
+        if not items and not await List.objects.filter(id=list_id).aexists():
+            return Response({"error": LIST_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        return Response(items)
+
+
+@method_decorator(cache_response('list:{list_id}'), name='dispatch')
+class AsyncItemDetailView(AsyncAPIView, ItemDetailView):
+    async def get(self, request, list_id, item_id):
+        items = await aitem_values(Item.objects.filter(id=item_id, list_id=list_id))
+        if not items:
+            return Response({"error": ITEM_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        return Response(items[0])
@@ -0,0 +1,181 @@
+"""
+Remoção de arquivos das fotos fora do ciclo da requisição.
+
+Quem apaga fotos só enfileira os nomes dos arquivos (na mesma transação que
+remove os registros) e a fila é processada em uma thread em segundo plano.
+Falhas são tentadas de novo com espera crescente; o que sobrar, assim como
+arquivos sem registro e uploads abandonados, é reconciliado pelo comando
+cleanup_photo_files.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .uploads import discard
+
+logger = logging.getLogger(__name__)
+
+PHOTO_DIR = 'photos'
+BATCH_SIZE = 100
+
+
+def photo_files(photo):
+    """Original e derivados de uma foto"""
+    names = [variant['name'] for variant in photo.variants or []]
+    if photo.image:
+        names.insert(0, photo.image.name)
+    return names
+
+
+def enqueue(names, run=True):
+    """Enfileira arquivos para remoção; com `run`, a fila roda depois do commit"""
+    from .models import FileCleanup
+
+    now = timezone.now()
+    FileCleanup.objects.bulk_create([FileCleanup(name=name, next_attempt_at=now) for name in names])
+    if run:
+        transaction.on_commit(schedule)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.PHOTO_CLEANUP_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def process_due():
+    """
+    Remove os arquivos cuja vez já chegou. Retorna (removidos, pendentes), com
+    pendentes sendo os que falharam e ainda serão tentados de novo.
+    """
+    from .models import FileCleanup, Photo
+
+    removed = retried = 0
+    while True:
+        batch = list(FileCleanup.objects.filter(next_attempt_at__lte=timezone.now()).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        for entry in batch:
+            # Um upload novo pode ter reaproveitado o nome depois que a foto saiu
+            if Photo.objects.filter(image=entry.name).exists():
+                entry.delete()
+                continue
+            try:
+                default_storage.delete(entry.name)
+            except OSError as exc:
+                entry.attempts += 1
+                if entry.attempts >= settings.PHOTO_CLEANUP_MAX_ATTEMPTS:
+                    # Desiste; a reconciliação encontra o arquivo órfão depois
+                    logger.error('Desistindo de remover %s: %s', entry.name, exc)
+                    entry.delete()
+                    continue
+                entry.next_attempt_at = timezone.now() + retry_delay(entry.attempts)
+                entry.last_error = str(exc)
+                entry.save(update_fields=['attempts', 'next_attempt_at', 'last_error'])
+                retried += 1
+                continue
+            entry.delete()
+            removed += 1
+    return removed, retried
+
+
+def run_queue():
+    global _retry_timer
+    from .models import FileCleanup
+
+    try:
+        process_due()
+        # Agenda a próxima rodada para a primeira nova tentativa pendente
+        upcoming = FileCleanup.objects.order_by('next_attempt_at').first()
+        if upcoming is not None:
+            delay = (upcoming.next_attempt_at - timezone.now()).total_seconds()
+            with _executor_lock:
+                if _retry_timer is not None:
+                    _retry_timer.cancel()
+                _retry_timer = threading.Timer(max(delay, 0), schedule)
+                _retry_timer.daemon = True
+                _retry_timer.start()
+    except Exception:
+        logger.exception('Falha ao processar a fila de remoção de arquivos')
+    finally:
+        # Threads do pool não passam pelo ciclo de requisição do Django
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_retry_timer = None
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Uma thread basta: a fila é sequencial e não deve disputar o disco
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='photo-cleanup')
+        return _executor
+
+
+def schedule():
+    get_executor().submit(run_queue)
+
+
+def walk(path):
+    """Nomes de todos os arquivos abaixo de `path` no storage"""
+    try:
+        directories, files = default_storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from walk(f'{path}/{directory}')
+
+
+def find_orphans(grace):
+    """Arquivos em photos/ sem foto nem remoção pendente, mais antigos que `grace`"""
+    from .models import FileCleanup, Photo
+
+    referenced = set(FileCleanup.objects.values_list('name', flat=True))
+    for image, variants in Photo.objects.values_list('image', 'variants').iterator():
+        referenced.add(image)
+        referenced.update(variant['name'] for variant in variants or [])
+
+    # A folga protege arquivos de transações ainda abertas e derivados em geração
+    cutoff = timezone.now() - grace
+    for name in walk(PHOTO_DIR):
+        if name not in referenced and default_storage.get_modified_time(name) < cutoff:
+            yield name
+
+
+def reconcile_orphans(grace):
+    orphans = list(find_orphans(grace))
+    # Quem chama processa a fila em seguida (ver cleanup_photo_files)
+    enqueue(orphans, run=False)
+    return orphans
+
+
+def expire_uploads(max_age):
+    """Remove sessões de upload paradas há mais de `max_age` e partes sem sessão"""
+    from .models import UploadSession
+
+    cutoff = timezone.now() - max_age
+    expired = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard(session)
+        session.delete()
+        expired += 1
+
+    directory = settings.PHOTO_UPLOAD_TEMP_DIR
+    if os.path.isdir(directory):
+        active = {f'{session_id}.part' for session_id in UploadSession.objects.values_list('id', flat=True)}
+        for entry in os.scandir(directory):
+            if entry.name not in active and entry.stat().st_mtime < cutoff.timestamp():
+                os.remove(entry.path)
+                expired += 1
+    return expired
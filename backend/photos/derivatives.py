@@ -0,0 +1,145 @@
+"""
+Geração de derivados responsivos das fotos (várias larguras em WebP/AVIF).
+
+O processamento roda em um pool de threads limitado, fora do ciclo da
+requisição. JPEGs são decodificados em modo draft já reduzidos para a maior
+largura pedida, a orientação EXIF é aplicada aos pixels e os metadados não são
+copiados para os derivados.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from config.cache import bump
+
+from .cleanup import enqueue
+from .metadata import read_metadata
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'photos/derivatives'
+CONTENT_TYPES = {'WEBP': 'image/webp', 'AVIF': 'image/avif'}
+
+
+def derivative_formats():
+    """Formatos gerados: WebP sempre, AVIF quando o Pillow tem suporte"""
+    formats = ['WEBP']
+    if features.check('avif'):
+        formats.append('AVIF')
+    return formats
+
+
+def derivative_name(photo_id, width, image_format, data):
+    """Nome com o hash do conteúdo: o arquivo nunca muda e pode ser cacheado para sempre"""
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    return f'{DERIVATIVE_DIR}/{photo_id}/{width}-{digest}.{image_format.lower()}'
+
+
+def open_image(file, max_width):
+    image = Image.open(file)
+    if image.format == 'JPEG':
+        # Decodifica já em escala reduzida (1/2, 1/4, 1/8), poupando memória e
+        # CPU; o lado menor continua >= max_width mesmo após girar pelo EXIF
+        image.draft('RGB', (max_width, max_width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return image
+
+
+def generate_derivatives(photo):
+    """Gera e grava os derivados de uma foto. Retorna a lista de variantes"""
+    widths = sorted(settings.PHOTO_DERIVATIVE_WIDTHS)
+    with photo.image.open('rb') as file:
+        image = open_image(file, widths[-1])
+
+    variants = []
+    for width in widths:
+        # Não amplia: a maior variante é no máximo do tamanho do original
+        if width > image.width and variants:
+            break
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        for image_format in derivative_formats():
+            buffer = io.BytesIO()
+            # Sem exif/icc: os metadados do original não vão para os derivados
+            resized.save(buffer, image_format, quality=settings.PHOTO_DERIVATIVE_QUALITY)
+            name = derivative_name(photo.id, width, image_format, buffer.getvalue())
+            # Mesmo nome, mesmo conteúdo: regerar sem mudanças não grava nada
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({
+                "name": name,
+                "width": resized.width,
+                "height": resized.height,
+                "type": CONTENT_TYPES[image_format],
+            })
+    image.close()
+    return variants
+
+
+def process_photo(photo_id):
+    """Gera os derivados de uma foto e grava a lista de variantes no registro"""
+    from .models import Photo
+
+    try:
+        photo = Photo.objects.filter(pk=photo_id).first()
+        if photo is None:
+            return
+        fields = {"variants": generate_derivatives(photo)}
+        # Fotos anteriores aos metadados no registro ganham os seus aqui
+        if photo.width is None:
+            with photo.image.open('rb') as file:
+                fields.update(read_metadata(file))
+        Photo.objects.filter(pk=photo_id).update(**fields)
+        bump('photos')
+        # Derivados de uma geração anterior que não foram reaproveitados
+        current = {variant['name'] for variant in fields['variants']}
+        stale = [v['name'] for v in photo.variants or [] if v['name'] not in current]
+        if stale:
+            enqueue(stale)
+    except Exception:
+        logger.exception('Falha ao gerar derivados da foto %s', photo_id)
+    finally:
+        # Threads do pool não passam pelo ciclo de requisição do Django
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PHOTO_DERIVATIVE_WORKERS,
+                thread_name_prefix='photo-derivatives',
+            )
+        return _executor
+
+
+def schedule(photo_id):
+    """Agenda a geração dos derivados para depois do commit da transação"""
+    transaction.on_commit(lambda: get_executor().submit(process_photo, photo_id))
+
+
+def variant_urls(variants):
+    """Variantes para a listagem, com URLs e um srcset por tipo de imagem"""
+    items = [
+        {"url": default_storage.url(v['name']), "width": v['width'], "height": v['height'], "type": v['type']}
+        for v in variants or []
+    ]
+    srcset = {}
+    for item in items:
+        srcset.setdefault(item['type'], []).append(f"{item['url']} {item['width']}w")
+    return items, {content_type: ', '.join(entries) for content_type, entries in srcset.items()}
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from photos.cleanup import expire_uploads, find_orphans, process_due, reconcile_orphans
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de remoção de arquivos, remove uploads abandonados e arquivos órfãos das fotos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=int, default=settings.PHOTO_ORPHAN_GRACE_HOURS,
+            help='Idade mínima de um arquivo sem registro para ser removido',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Só lista os arquivos órfãos')
+
+    def handle(self, *args, **options):
+        grace = timedelta(hours=options['grace_hours'])
+
+        if options['dry_run']:
+            orphans = list(find_orphans(grace))
+            for name in orphans:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(f'{len(orphans)} arquivos órfãos'))
+            return
+
+        expired = expire_uploads(timedelta(hours=settings.PHOTO_UPLOAD_EXPIRE_HOURS))
+        orphans = reconcile_orphans(grace)
+        removed, retried = process_due()
+
+        if retried:
+            self.stdout.write(self.style.WARNING(f'{retried} arquivos falharam e serão tentados de novo'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{removed} arquivos removidos ({len(orphans)} órfãos), {expired} uploads abandonados limpos'
+        ))
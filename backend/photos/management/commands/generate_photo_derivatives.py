@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from photos.models import Photo
+from photos.derivatives import process_photo
+
+
+class Command(BaseCommand):
+    help = 'Gera os derivados responsivos (e os metadados faltantes) das fotos existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Fotos processadas em paralelo')
+        parser.add_argument('--all', action='store_true', help='Regera inclusive as fotos que já têm derivados')
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.all()
+        if not options['all']:
+            photos = photos.filter(Q(variants=[]) | Q(width__isnull=True))
+        photo_ids = list(photos.values_list('id', flat=True))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for done, _ in enumerate(executor.map(process_photo, photo_ids), start=1):
+                if done % 50 == 0:
+                    self.stdout.write(f'{done}/{len(photo_ids)} fotos processadas')
+
+        pending = Photo.objects.filter(id__in=photo_ids, variants=[]).count()
+        if pending:
+            self.stdout.write(self.style.WARNING(f'{pending} fotos falharam (veja o log)'))
+        self.stdout.write(self.style.SUCCESS(f'Derivados gerados para {len(photo_ids) - pending} fotos'))
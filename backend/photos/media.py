@@ -0,0 +1,147 @@
+"""
+Entrega dos arquivos das fotos.
+
+O Django só resolve o nome pedido para uma foto existente e decide os
+cabeçalhos de cache; os bytes são entregues pelo nginx via X-Accel-Redirect,
+que também atende Range e If-None-Match. Sem nginx (desenvolvimento), o
+arquivo é servido pelo próprio Django, com suporte aos mesmos cabeçalhos.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from .cleanup import PHOTO_DIR
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Originais são "<sha256>.<ext>" e derivados "<largura>-<sha256[:16]>.<ext>"
+CONTENT_HASHED_RE = re.compile(r'^(?:\d+-)?(?:[0-9a-f]{64}|[0-9a-f]{16})\.\w+$')
+DERIVATIVE_RE = re.compile(r'^derivatives/(\d+)/[^/]+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def resolve(name):
+    """Retorna o nome no storage se ele pertence a uma foto, senão None"""
+    from .models import Photo
+
+    if '..' in name.split('/'):
+        return None
+    storage_name = f'{PHOTO_DIR}/{name}'
+
+    match = DERIVATIVE_RE.match(name)
+    if match:
+        photo = Photo.objects.filter(pk=int(match.group(1))).only('variants').first()
+        if photo is None or not any(v['name'] == storage_name for v in photo.variants or []):
+            return None
+        return storage_name
+
+    if not Photo.objects.filter(image=storage_name).exists():
+        return None
+    return storage_name
+
+
+def file_etag(stat):
+    """Mesmo formato do ETag que o nginx gera para arquivos estáticos"""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def is_immutable(name):
+    return bool(CONTENT_HASHED_RE.match(os.path.basename(name)))
+
+
+def parse_range(header, size):
+    """
+    Retorna (início, fim) inclusivos de um Range de um só intervalo, ou None
+    se o cabeçalho não for suportado (a resposta vira o arquivo inteiro).
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-N: os últimos N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(size)
+    return start, end
+
+
+def media_response(request, name):
+    path = default_storage.path(name)
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    elif settings.MEDIA_ACCEL_REDIRECT:
+        # Nenhum byte passa pelo Python: o nginx lê o arquivo e atende o Range
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(f'{settings.MEDIA_ACCEL_PREFIX}{name}')
+    else:
+        response = file_response(request, path, stat, etag, content_type)
+
+    response['ETag'] = etag
+    if is_immutable(name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def file_response(request, path, stat, etag, content_type):
+    range_header = request.headers.get('Range')
+    # If-Range com outro ETag: o arquivo mudou, então vai inteiro
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, stat.st_size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(LimitedReader(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+class LimitedReader:
+    """Lê no máximo `remaining` bytes do arquivo, para respostas parciais"""
+
+    def __init__(self, file, remaining):
+        self.file = file
+        self.remaining = remaining
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
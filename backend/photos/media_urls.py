@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import PhotoFileView
+
+# Montado em MEDIA_URL + 'photos/', antes do static() de desenvolvimento
+urlpatterns = [
+    path("<path:name>", PhotoFileView.as_view()),
+]
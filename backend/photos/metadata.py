@@ -0,0 +1,54 @@
+"""Metadados das fotos calculados no upload e guardados no registro."""
+import hashlib
+
+from PIL import Image
+
+# Orientações EXIF que giram a imagem em 90°, trocando largura e altura
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+# A cor dominante é a mais frequente entre as da imagem reduzida a esta paleta
+PALETTE_COLORS = 8
+
+
+def read_metadata(file):
+    """
+    Lê dimensões (já considerando a orientação EXIF), tamanho em bytes e cor
+    dominante do arquivo, decodificando a imagem em escala bem reduzida.
+    """
+    position = file.tell()
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+            image.draft('RGB', (64, 64))
+            red, green, blue = dominant_color(image)
+    finally:
+        file.seek(position)
+
+    return {
+        "width": width,
+        "height": height,
+        "size": file.size,
+        "color": f'#{red:02x}{green:02x}{blue:02x}',
+    }
+
+
+def dominant_color(image):
+    """Cor (r, g, b) que cobre a maior área da imagem, após reduzi-la a poucas cores"""
+    image = image.convert('RGB')
+    image.thumbnail((64, 64))
+    quantized = image.quantize(colors=PALETTE_COLORS, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    return tuple(palette[index * 3:index * 3 + 3])
+
+
+def file_sha256(file, chunk_size=64 * 1024):
+    """SHA-256 do arquivo lido em blocos, sem carregá-lo inteiro na memória"""
+    digest = hashlib.sha256()
+    position = file.tell()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(position)
+    return digest.hexdigest()
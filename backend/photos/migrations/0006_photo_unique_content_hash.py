@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+def clear_duplicate_hashes(apps, schema_editor):
+    """Fotos duplicadas por uploads simultâneos: só a mais antiga mantém o hash"""
+    Photo = apps.get_model('photos', 'Photo')
+    duplicated = (
+        Photo.objects.exclude(content_hash='')
+        .values('content_hash')
+        .annotate(count=models.Count('id'), first=models.Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicated:
+        Photo.objects.filter(content_hash=row['content_hash']).exclude(id=row['first']).update(content_hash='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0005_filecleanup'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='photo',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('content_hash',), name='unique_photo_content_hash'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0007_uploadsession_writing_since'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photo',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -1,10 +1,62 @@
+import uuid
+
 from django.db import models
 
 # Create your models here.
 class Photo(models.Model):
     image = models.ImageField(upload_to='photos/')
     uploaded_at = models.DateField(auto_now_add=True)
+    # Derivados responsivos gerados em segundo plano (ver photos/derivatives.py)
+    variants = models.JSONField(blank=True, default=list)
+    # Metadados calculados no upload para a listagem não precisar abrir arquivos
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    color = models.CharField(max_length=7, blank=True, default='')
+    # SHA-256 do original: uploads repetidos reaproveitam a foto existente. O
+    # índice é o da restrição única parcial abaixo
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Paginação por cursor na ordem (uploaded_at, id)
+            models.Index(fields=['uploaded_at', 'id'], name='photo_uploaded_id_idx'),
+        ]
+        constraints = [
+            # Uploads simultâneos do mesmo conteúdo não criam duas fotos
+            models.UniqueConstraint(
+                fields=['content_hash'], condition=~models.Q(content_hash=''), name='unique_photo_content_hash',
+            ),
+        ]
     
     def __str__(self):
-        return f'Photo {self.id}'    
-    
\ No newline at end of file
+        return f'Photo {self.id}'
+
+
+class UploadSession(models.Model):
+    """Upload em partes: os bytes vão direto para um arquivo temporário em disco"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Quantos bytes já foram recebidos; a próxima parte deve começar aqui
+    offset = models.PositiveBigIntegerField(default=0)
+    # Início da gravação em andamento: a parte reserva a sessão em vez de
+    # travar a linha enquanto o cliente envia os bytes (ver photos/uploads.py)
+    writing_since = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Upload {self.id}'
+
+
+class FileCleanup(models.Model):
+    """Arquivo a remover do storage, processado em segundo plano (ver photos/cleanup.py)"""
+    name = models.CharField(max_length=255)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(db_index=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from config.cache import bump
+from .models import Photo
+
+
+# Invalida o cache de respostas da listagem de fotos
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def photo_changed(sender, **kwargs):
+    bump('photos')
@@ -1,3 +1,521 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+
+from .cleanup import enqueue, expire_uploads, process_due, reconcile_orphans
+from .derivatives import derivative_formats, generate_derivatives, variant_urls
+from .metadata import read_metadata
+from .models import FileCleanup, Photo, UploadSession
+from .uploads import temp_path, write_chunk
+from .views import UploadSessionView
 
 # Create your tests here.
+HASHED_NAME = 'photos/' + 'a' * 64 + '.jpg'
+CONTENT = bytes(range(256)) * 4
+
+
+class PhotoFileViewTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        default_storage.save(HASHED_NAME, ContentFile(CONTENT))
+        self.photo = Photo.objects.create(image=HASHED_NAME, content_hash='a' * 64)
+        self.url = '/media/' + HASHED_NAME
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True, MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_bytes_are_handed_to_nginx(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-99')
+
+        # Nenhum byte da foto passa pelo worker: o corpo é vazio e o nginx
+        # serve o arquivo (e o Range) a partir do X-Accel-Redirect
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + HASHED_NAME)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_conditional_request_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_unknown_file_is_not_served(self):
+        default_storage.save('photos/orphan.jpg', ContentFile(CONTENT))
+
+        for url in ('/media/photos/orphan.jpg', '/media/photos/../board/x.json', '/media/photos/derivatives/999/1.webp'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertNotIn('X-Accel-Redirect', response)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=False)
+    def test_range_without_nginx(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range com ETag antigo devolve o arquivo inteiro
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+
+@override_settings(RESPONSE_CACHE_BACKEND='off')
+class PhotoPaginationTests(TestCase):
+    def setUp(self):
+        # Ids fora da ordem das datas, com três fotos no mesmo dia
+        days = [date(2026, 1, 2), date(2026, 1, 3), date(2026, 1, 2), date(2026, 1, 1), date(2026, 1, 2)]
+        for index, day in enumerate(days):
+            photo = Photo.objects.create(image=f'photos/{index:064x}.jpg', content_hash=f'{index:064x}')
+            Photo.objects.filter(id=photo.id).update(uploaded_at=day)
+        self.expected = list(Photo.objects.order_by('uploaded_at', 'id').values_list('id', flat=True))
+
+    def test_pages_split_ties_by_id(self):
+        pages = []
+        response = self.client.get('/api/photos/', {"limit": 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append([photo['id'] for photo in body['results']])
+            if body['next'] is None:
+                break
+            response = self.client.get('/api/photos/', {"limit": 2, "cursor": body['next']})
+
+        self.assertEqual(pages, [self.expected[0:2], self.expected[2:4], self.expected[4:]])
+
+    def test_last_full_page_has_no_next(self):
+        body = self.client.get('/api/photos/', {"limit": 5}).json()
+        self.assertEqual(([photo['id'] for photo in body['results']], body['next']), (self.expected, None))
+
+    def test_invalid_cursor(self):
+        for raw in ('x', 'não é base64', b'2026-01-02', b'2026-13-01|1', b'2026-01-02|x', b'\xff|1'):
+            cursor = raw if isinstance(raw, str) else urlsafe_base64_encode(raw)
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/photos/', {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": 'Invalid cursor.'})
+
+    def test_all_returns_the_old_unpaginated_list(self):
+        for flag in ('1', 'true'):
+            with self.subTest(all=flag):
+                body = self.client.get('/api/photos/', {"all": flag, "limit": 2}).json()
+                self.assertIsInstance(body, list)
+                self.assertEqual([photo['id'] for photo in body], self.expected)
+        self.assertEqual(len(self.client.get('/api/photos/', {"all": '0', "limit": 2}).json()['results']), 2)
+
+
+class MetadataTests(TestCase):
+    def test_dominant_color_is_the_most_common_not_the_mean(self):
+        # Três quartos vermelhos e um quarto azul: a média seria um roxo
+        image = Image.new('RGB', (80, 80), (200, 0, 0))
+        image.paste((0, 0, 220), (0, 0, 40, 40))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+
+        metadata = read_metadata(ContentFile(buffer.getvalue(), name='a.png'))
+
+        self.assertEqual(metadata['color'], '#c80000')
+        self.assertEqual((metadata['width'], metadata['height']), (80, 80))
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, PHOTO_UPLOAD_TEMP_DIR=os.path.join(media_root, 'uploads'),
+            RESPONSE_CACHE_BACKEND='off',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'JPEG')
+        self.data = buffer.getvalue()
+        response = self.client.post(
+            '/api/photos/uploads/', {"filename": 'a.jpg', "size": len(self.data)}, content_type='application/json',
+        )
+        self.url = f'/api/photos/uploads/{response.json()["id"]}/'
+
+    def put(self, data, start=0):
+        return self.client.put(
+            self.url, data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + max(len(data), 1) - 1}/{len(self.data)}',
+        )
+
+    def test_empty_chunk_is_rejected(self):
+        response = self.put(b'')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).json()['offset'], 0)
+
+    def test_chunk_claims_the_session_while_it_is_written(self):
+        # A view síncrona direto, qualquer que seja API_ASYNC_VIEWS (a
+        # assíncrona é testada em config/tests.py)
+        session_id = UploadSession.objects.get().id
+        view = UploadSessionView.as_view()
+        responses = []
+
+        def put(data):
+            request = RequestFactory().put(
+                self.url, data, content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes 0-{len(data) - 1}/{len(self.data)}',
+            )
+            return view(request, upload_id=session_id).render()
+
+        def write_while_another_chunk_arrives(*args):
+            # Outra parte no mesmo offset chega enquanto esta é gravada
+            responses.append(put(self.data[:10]))
+            return write_chunk(*args)
+
+        with mock.patch('photos.views.write_chunk', side_effect=write_while_another_chunk_arrives):
+            response = put(self.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(responses[0].status_code, 409)
+        self.assertEqual(json.loads(responses[0].content)['error'], 'Another chunk is being written to this upload.')
+        session = UploadSession.objects.get()
+        self.assertEqual((session.offset, session.writing_since), (len(self.data), None))
+        with open(temp_path(session), 'rb') as file:
+            self.assertEqual(file.read(), self.data)
+
+    def test_failed_write_releases_the_claim(self):
+        with mock.patch('photos.views.write_chunk', side_effect=OSError('disco cheio')):
+            with self.assertRaises(OSError):
+                self.put(self.data)
+
+        session = UploadSession.objects.get()
+        self.assertEqual((session.offset, session.writing_since), (0, None))
+        self.assertEqual(self.put(self.data).status_code, 200)
+
+    def test_stale_claim_expires(self):
+        UploadSession.objects.update(writing_since=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.put(self.data).status_code, 200)
+
+    def test_same_content_finalized_concurrently_creates_one_photo(self):
+        self.assertEqual(self.put(self.data).status_code, 200)
+        digest = hashlib.sha256(self.data).hexdigest()
+        save = default_storage.save
+        winners = []
+
+        def save_after_another_upload(name, content):
+            # Outro upload do mesmo conteúdo termina depois da verificação de duplicata
+            winners.append(Photo.objects.create(image=save(name, ContentFile(self.data)), content_hash=digest))
+            return save(name, content)
+
+        with mock.patch.object(default_storage, 'save', side_effect=save_after_another_upload):
+            response = self.client.post(self.url + 'complete/')
+        winner = winners[0]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], winner.id)
+        self.assertEqual(Photo.objects.filter(content_hash=digest).count(), 1)
+        # O arquivo gravado pelo perdedor não fica órfão no storage
+        self.assertEqual(default_storage.listdir('photos')[1], [f'{digest}.jpg'])
+
+
+def jpeg(color='red', size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, PHOTO_UPLOAD_TEMP_DIR=os.path.join(self.media_root, 'uploads'),
+            RESPONSE_CACHE_BACKEND='off',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save(self, name, data=b'x', age=None):
+        name = default_storage.save(name, ContentFile(data))
+        if age is not None:
+            stamp = time.time() - age.total_seconds()
+            os.utime(default_storage.path(name), (stamp, stamp))
+        return name
+
+
+class PhotoBatchTests(MediaRootMixin, TestCase):
+    def upload(self, *files):
+        return self.client.post('/api/photos/batch/', {"images": list(files)})
+
+    def test_invalid_files_do_not_stop_the_others(self):
+        red = jpeg('red')
+        response = self.upload(
+            SimpleUploadedFile('a.jpg', red, 'image/jpeg'),
+            SimpleUploadedFile('b.jpg', b'not an image', 'image/jpeg'),
+            SimpleUploadedFile('c.jpg', red, 'image/jpeg'),
+        )
+
+        self.assertEqual(response.status_code, 201)
+        first, invalid, repeated = response.json()['results']
+        self.assertTrue(first['created'])
+        self.assertEqual(invalid, {"filename": 'b.jpg', "error": 'File is not a valid image.'})
+        self.assertEqual((repeated['created'], repeated['photo']['id']), (False, first['photo']['id']))
+        self.assertEqual(Photo.objects.count(), 1)
+
+    def test_only_repeated_or_invalid_files(self):
+        Photo.objects.create(image='photos/a.jpg', content_hash=hashlib.sha256(jpeg()).hexdigest())
+
+        response = self.upload(SimpleUploadedFile('a.jpg', jpeg(), 'image/jpeg'))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.upload(SimpleUploadedFile('b.jpg', b'not an image', 'image/jpeg'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/photos/batch/').status_code, 400)
+
+    def test_batch_size_is_limited(self):
+        with mock.patch('photos.views.MAX_BATCH_SIZE', 1):
+            response = self.upload(
+                SimpleUploadedFile('a.jpg', jpeg('red'), 'image/jpeg'),
+                SimpleUploadedFile('b.jpg', jpeg('blue'), 'image/jpeg'),
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Photo.objects.exists())
+
+    def test_delete_reports_missing_ids_and_queues_files(self):
+        photos = [
+            Photo.objects.create(
+                image=self.save(f'photos/{i}.jpg'), content_hash=f'{i:064x}',
+                variants=[{"name": self.save(f'photos/derivatives/{i}/480.webp'), "width": 480, "height": 360,
+                           "type": 'image/webp'}],
+            )
+            for i in range(2)
+        ]
+        ids = [photo.id for photo in photos]
+
+        response = self.client.post(
+            '/api/photos/batch/delete/', {"ids": [*ids, 999]}, content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"deleted": ids, "not_found": [999]})
+        self.assertFalse(Photo.objects.exists())
+        self.assertEqual(
+            sorted(FileCleanup.objects.values_list('name', flat=True)),
+            ['photos/0.jpg', 'photos/1.jpg', 'photos/derivatives/0/480.webp', 'photos/derivatives/1/480.webp'],
+        )
+
+    def test_delete_requires_a_list_of_ids(self):
+        for body in ({}, {"ids": []}, {"ids": 'x'}, {"ids": ['x']}):
+            with self.subTest(body=body):
+                response = self.client.post('/api/photos/batch/delete/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PHOTO_CLEANUP_RETRY_SECONDS=30, PHOTO_CLEANUP_MAX_ATTEMPTS=3)
+class CleanupTests(MediaRootMixin, TestCase):
+    def test_due_files_are_removed(self):
+        names = [self.save('photos/a.jpg'), self.save('photos/b.jpg')]
+        enqueue(names, run=False)
+
+        self.assertEqual(process_due(), (2, 0))
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+        self.assertFalse(FileCleanup.objects.exists())
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        enqueue([self.save('photos/a.jpg')], run=False)
+        entry = FileCleanup.objects.get()
+
+        with mock.patch.object(default_storage, 'delete', side_effect=OSError('disco ocupado')):
+            for attempt, delay in ((1, 30), (2, 60)):
+                before = timezone.now()
+                self.assertEqual(process_due(), (0, 1))
+                entry.refresh_from_db()
+                self.assertEqual((entry.attempts, entry.last_error), (attempt, 'disco ocupado'))
+                self.assertGreaterEqual(entry.next_attempt_at, before + timedelta(seconds=delay))
+                self.assertLessEqual(entry.next_attempt_at, timezone.now() + timedelta(seconds=delay))
+
+                # Antes da hora nada é tentado
+                self.assertEqual(process_due(), (0, 0))
+                FileCleanup.objects.update(next_attempt_at=timezone.now())
+
+            # A terceira falha esgota as tentativas; a reconciliação acha o arquivo depois
+            with self.assertLogs('photos.cleanup', 'ERROR'):
+                self.assertEqual(process_due(), (0, 0))
+        self.assertFalse(FileCleanup.objects.exists())
+        self.assertTrue(default_storage.exists('photos/a.jpg'))
+
+    def test_names_reused_by_a_photo_are_kept(self):
+        name = self.save('photos/a.jpg')
+        enqueue([name], run=False)
+        Photo.objects.create(image=name, content_hash='a' * 64)
+
+        self.assertEqual(process_due(), (0, 0))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(FileCleanup.objects.exists())
+
+    def test_reconcile_orphans(self):
+        old = timedelta(days=2)
+        photo = Photo.objects.create(
+            image=self.save('photos/kept.jpg', age=old), content_hash='a' * 64,
+            variants=[{"name": self.save('photos/derivatives/1/480.webp', age=old), "width": 480,
+                       "height": 360, "type": 'image/webp'}],
+        )
+        orphan = self.save('photos/derivatives/9/480.webp', age=old)
+        self.save('photos/recent.jpg')
+        queued = self.save('photos/queued.jpg', age=old)
+        enqueue([queued], run=False)
+
+        self.assertEqual(reconcile_orphans(timedelta(hours=1)), [orphan])
+        self.assertEqual(sorted(FileCleanup.objects.values_list('name', flat=True)), [orphan, queued])
+        self.assertEqual(process_due(), (2, 0))
+        self.assertTrue(default_storage.exists(photo.image.name))
+        self.assertTrue(default_storage.exists('photos/recent.jpg'))
+
+    def test_expire_uploads(self):
+        stale = UploadSession.objects.create(filename='a.jpg', size=10)
+        active = UploadSession.objects.create(filename='b.jpg', size=10)
+        UploadSession.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(days=2))
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        old = time.time() - 2 * 24 * 3600
+        for name in (temp_path(stale), temp_path(active), *(
+            os.path.join(self.media_root, 'uploads', f'{uuid.uuid4()}.part') for _ in range(2)
+        )):
+            with open(name, 'wb') as file:
+                file.write(b'x')
+        stray_old, stray_new = sorted(
+            entry.path for entry in os.scandir(os.path.join(self.media_root, 'uploads'))
+            if entry.path not in (temp_path(stale), temp_path(active))
+        )
+        os.utime(stray_old, (old, old))
+        os.utime(temp_path(active), (old, old))
+
+        self.assertEqual(expire_uploads(timedelta(hours=1)), 2)
+        self.assertEqual(list(UploadSession.objects.values_list('id', flat=True)), [active.id])
+        self.assertFalse(os.path.exists(temp_path(stale)))
+        self.assertFalse(os.path.exists(stray_old))
+        # A parte de uma sessão ativa fica, mesmo antiga; a sem sessão recente também
+        self.assertTrue(os.path.exists(temp_path(active)))
+        self.assertTrue(os.path.exists(stray_new))
+
+
+def rotated_jpeg(size=(600, 400)):
+    """JPEG gravado deitado, com EXIF dizendo para girar 90° (Orientation 6)"""
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'Câmera'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(PHOTO_DERIVATIVE_WIDTHS=[200, 320, 1000], PHOTO_DERIVATIVE_QUALITY=80)
+class DerivativeTests(MediaRootMixin, TestCase):
+    def photo(self, data):
+        return Photo.objects.create(image=self.save('photos/a.jpg', data), content_hash='a' * 64)
+
+    def test_widths_orientation_and_metadata(self):
+        variants = generate_derivatives(self.photo(rotated_jpeg()))
+
+        # Girada pelo EXIF a foto tem 400 de largura: 1000 ampliaria
+        formats = derivative_formats()
+        self.assertEqual(len(variants), 2 * len(formats))
+        webp = [v for v in variants if v['type'] == 'image/webp']
+        self.assertEqual([(v['width'], v['height']) for v in webp], [(200, 300), (320, 480)])
+        for variant in variants:
+            with default_storage.open(variant['name']) as file, Image.open(file) as image:
+                self.assertEqual(image.size, (variant['width'], variant['height']))
+                self.assertFalse(image.getexif())
+                self.assertNotIn('exif', image.info)
+
+    def test_small_originals_are_not_upscaled(self):
+        variants = generate_derivatives(self.photo(jpeg(size=(120, 90))))
+
+        webp = [v for v in variants if v['type'] == 'image/webp']
+        self.assertEqual([(v['width'], v['height']) for v in webp], [(120, 90)])
+
+    def test_regenerating_reuses_the_same_files(self):
+        photo = self.photo(rotated_jpeg())
+        first = generate_derivatives(photo)
+        self.assertEqual(generate_derivatives(photo), first)
+        self.assertEqual(len(default_storage.listdir(f'photos/derivatives/{photo.id}')[1]), len(first))
+
+    def test_variant_urls(self):
+        variants = [
+            {"name": 'photos/derivatives/1/200-a.webp', "width": 200, "height": 150, "type": 'image/webp'},
+            {"name": 'photos/derivatives/1/200-b.avif', "width": 200, "height": 150, "type": 'image/avif'},
+            {"name": 'photos/derivatives/1/320-c.webp', "width": 320, "height": 240, "type": 'image/webp'},
+        ]
+
+        items, srcset = variant_urls(variants)
+
+        self.assertEqual(items[0], {
+            "url": '/media/photos/derivatives/1/200-a.webp', "width": 200, "height": 150, "type": 'image/webp',
+        })
+        self.assertEqual(srcset, {
+            'image/webp': '/media/photos/derivatives/1/200-a.webp 200w, /media/photos/derivatives/1/320-c.webp 320w',
+            'image/avif': '/media/photos/derivatives/1/200-b.avif 200w',
+        })
+        self.assertEqual(variant_urls(None), ([], {}))
+
+
+@override_settings(PHOTO_DERIVATIVE_WIDTHS=[200], RESPONSE_CACHE_BACKEND='off')
+class GeneratePhotoDerivativesCommandTests(MediaRootMixin, TransactionTestCase):
+    """O comando processa as fotos em threads, que só veem dados já confirmados"""
+
+    def test_backfills_missing_variants_and_metadata(self):
+        pending = Photo.objects.create(image=self.save('photos/a.jpg', jpeg(size=(300, 200))), content_hash='a' * 64)
+        done = Photo.objects.create(
+            image=self.save('photos/b.jpg', jpeg(size=(300, 200))), content_hash='b' * 64, width=300, height=200,
+            variants=[{"name": 'photos/derivatives/2/200-x.webp', "width": 200, "height": 133, "type": 'image/webp'}],
+        )
+        broken = Photo.objects.create(image=self.save('photos/c.jpg', b'not an image'), content_hash='c' * 64)
+
+        out = io.StringIO()
+        with self.assertLogs('photos.derivatives', 'ERROR'):
+            call_command('generate_photo_derivatives', '--workers', '2', stdout=out)
+
+        pending.refresh_from_db()
+        self.assertEqual((pending.width, pending.height), (300, 200))
+        self.assertEqual({v['width'] for v in pending.variants}, {200})
+        # Já tinha derivados: fica como estava sem --all
+        done.refresh_from_db()
+        self.assertEqual(done.variants[0]['name'], 'photos/derivatives/2/200-x.webp')
+        broken.refresh_from_db()
+        self.assertEqual(broken.variants, [])
+        self.assertIn('1 fotos falharam', out.getvalue())
+        self.assertIn('Derivados gerados para 1 fotos', out.getvalue())
+
+        broken.delete()
+        call_command('generate_photo_derivatives', '--all', stdout=io.StringIO())
+        done.refresh_from_db()
+        self.assertNotEqual(done.variants[0]['name'], 'photos/derivatives/2/200-x.webp')
@@ -0,0 +1,173 @@
+"""
+Uploads de fotos em partes, retomáveis e com deduplicação por conteúdo.
+
+Cada parte é gravada direto no arquivo temporário da sessão, em blocos de
+tamanho fixo, e o SHA-256 é atualizado à medida que os bytes chegam. O hash
+parcial fica em memória no processo que recebeu as partes; se a sessão for
+retomada em outro worker, o arquivo é relido uma vez na finalização.
+"""
+import hashlib
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from config.metrics import timed
+
+from .metadata import read_metadata
+
+CHUNK_SIZE = 64 * 1024
+
+# Uma gravação que não terminou neste prazo (worker encerrado no meio) deixa
+# de bloquear a sessão
+WRITE_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Hash incremental de cada sessão ativa neste processo: {id: (offset, hasher)}
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class OffsetMismatch(ValueError):
+    """A parte enviada não começa onde o upload parou."""
+
+
+def temp_path(session):
+    return os.path.join(settings.PHOTO_UPLOAD_TEMP_DIR, f'{session.id}.part')
+
+
+def photo_name(digest, filename):
+    """Nome endereçado pelo conteúdo, mantendo a extensão original"""
+    extension = os.path.splitext(filename)[1].lower() or '.jpg'
+    return f'photos/{digest}{extension}'
+
+
+def claimable(upload_id, start, now):
+    """
+    A sessão, se uma parte a partir de `start` pode começar a ser gravada: o
+    offset bate e nenhuma outra parte está em gravação. A reserva é um UPDATE
+    nesta consulta, sem transação aberta enquanto o cliente envia os bytes.
+    """
+    from .models import UploadSession
+
+    return UploadSession.objects.filter(
+        Q(writing_since__isnull=True) | Q(writing_since__lt=now - WRITE_CLAIM_TIMEOUT),
+        id=upload_id, offset=start,
+    )
+
+
+def claimed(upload_id, claimed_at):
+    """A sessão enquanto a reserva feita em `claimed_at` ainda vale"""
+    from .models import UploadSession
+
+    return UploadSession.objects.filter(id=upload_id, writing_since=claimed_at)
+
+
+def write_chunk(session, start, stream, length):
+    """
+    Grava `length` bytes lidos de `stream` a partir de `start`. Retorna o novo
+    offset da sessão. A memória usada é de um bloco, qualquer que seja a parte.
+    """
+    if start != session.offset:
+        raise OffsetMismatch(session.offset)
+
+    if start == 0:
+        hasher = hashlib.sha256()
+    else:
+        with _hashers_lock:
+            cached = _hashers.get(session.id)
+        hasher = cached[1] if cached and cached[0] == start else None
+
+    os.makedirs(settings.PHOTO_UPLOAD_TEMP_DIR, exist_ok=True)
+    received = 0
+    with open(temp_path(session), 'r+b' if start else 'wb') as file:
+        file.seek(start)
+        file.truncate()
+        while received < length:
+            chunk = stream.read(min(CHUNK_SIZE, length - received))
+            if not chunk:
+                break
+            file.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            received += len(chunk)
+
+    offset = start + received
+    with _hashers_lock:
+        if hasher is not None:
+            _hashers[session.id] = (offset, hasher)
+        else:
+            _hashers.pop(session.id, None)
+    return offset
+
+
+def session_digest(session):
+    """SHA-256 do upload completo, do cache em memória ou relendo o arquivo"""
+    with _hashers_lock:
+        cached = _hashers.pop(session.id, None)
+    if cached and cached[0] == session.size:
+        return cached[1].hexdigest()
+
+    hasher = hashlib.sha256()
+    with open(temp_path(session), 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def discard(session):
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    try:
+        os.remove(temp_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def finalize(session):
+    """
+    Transforma o upload completo em uma Photo. Retorna (photo, created): se já
+    existe uma foto com o mesmo conteúdo, ela é devolvida e nada é gravado.
+    """
+    from .models import Photo
+
+    with timed('storage'):
+        digest = session_digest(session)
+    existing = Photo.objects.filter(content_hash=digest).first()
+    if existing is not None:
+        discard(session)
+        return existing, False
+
+    path = temp_path(session)
+    with timed('storage'), open(path, 'rb') as file:
+        metadata = read_metadata(File(file))
+        # O storage grava o arquivo em blocos, sem carregá-lo inteiro
+        name = default_storage.save(photo_name(digest, session.filename), File(file))
+
+    photo, created = create_photo(name, digest, metadata)
+    discard(session)
+    return photo, created
+
+
+def create_photo(name, digest, metadata):
+    """
+    Cria a foto do arquivo já gravado em `name`. Retorna (photo, created): se
+    outro upload do mesmo conteúdo criou a foto primeiro, a restrição única de
+    content_hash barra o INSERT e a foto dele é devolvida, sem o arquivo duplicado.
+    """
+    from .models import Photo
+
+    try:
+        with transaction.atomic():
+            return Photo.objects.create(image=name, content_hash=digest, **metadata), True
+    except IntegrityError:
+        existing = Photo.objects.filter(content_hash=digest).first()
+        if existing is None:
+            raise
+    if existing.image.name != name:
+        default_storage.delete(name)
+    return existing, False
@@ -1,7 +1,17 @@
 from django.urls import path
-from .views import PhotoListCreateView, PhotoDeleteView
+from config.async_views import pick
+from .views import (
+    PhotoListCreateView, PhotoDeleteView, PhotoBatchUploadView, PhotoBatchDeleteView,
+    UploadSessionCreateView, UploadSessionView, UploadSessionCompleteView,
+    AsyncPhotoListCreateView, AsyncPhotoBatchUploadView, AsyncUploadSessionView,
+)
 
 urlpatterns = [
-    path("", PhotoListCreateView.as_view()),
-    path("<int:photo_id>/", PhotoDeleteView.as_view())
+    path("", pick(PhotoListCreateView, AsyncPhotoListCreateView).as_view()),
+    path("<int:photo_id>/", PhotoDeleteView.as_view()),
+    path("batch/", pick(PhotoBatchUploadView, AsyncPhotoBatchUploadView).as_view()),
+    path("batch/delete/", PhotoBatchDeleteView.as_view()),
+    path("uploads/", UploadSessionCreateView.as_view()),
+    path("uploads/<uuid:upload_id>/", pick(UploadSessionView, AsyncUploadSessionView).as_view()),
+    path("uploads/<uuid:upload_id>/complete/", UploadSessionCompleteView.as_view()),
 ]
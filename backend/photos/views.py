@@ -1,45 +1,476 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Photo
+from .models import Photo, UploadSession
+from .derivatives import schedule, variant_urls
+from .cleanup import enqueue, photo_files
+from .media import resolve, media_response
+from .metadata import read_metadata, file_sha256
+from asgiref.sync import sync_to_async
+from config.async_views import AsyncAPIView
+from config.cache import cache_response
+from config.metrics import timed
+from config.replicas import read_replica
+from .uploads import write_chunk, finalize, discard, photo_name, create_photo, claimable, claimed
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.views.decorators.csrf import csrf_exempt
-import os
+from datetime import date
+import re
+from PIL import UnidentifiedImageError
 
 # Error message constants
 IMAGE_REQUIRED_ERROR = "Image is required."
 PHOTO_NOT_FOUND_ERROR = "Photo not found."
+INVALID_IMAGE_ERROR = "File is not a valid image."
+INVALID_CURSOR_ERROR = "Invalid cursor."
+UPLOAD_NOT_FOUND_ERROR = "Upload not found."
+UPLOAD_SIZE_ERROR = "Filename and a valid size are required."
+UPLOAD_TOO_LARGE_ERROR = "File is too large."
+CONTENT_RANGE_ERROR = "A valid Content-Range header is required."
+CHUNK_REQUIRED_ERROR = "Chunk body is required."
+OFFSET_MISMATCH_ERROR = "Chunk does not start at the current upload offset."
+UPLOAD_BUSY_ERROR = "Another chunk is being written to this upload."
+UPLOAD_INCOMPLETE_ERROR = "Upload is not complete."
+IMAGES_REQUIRED_ERROR = "At least one image is required."
+IDS_REQUIRED_ERROR = "A list of photo ids is required."
+BATCH_TOO_LARGE_ERROR = "Too many items in one batch."
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 500
+
+
+def photo_data(photo):
+    variants, srcset = variant_urls(photo.variants)
+    return {
+        "id": photo.id,
+        "url": photo.image.url,
+        "width": photo.width,
+        "height": photo.height,
+        "size": photo.size,
+        "color": photo.color,
+        "variants": variants,
+        "srcset": srcset,
+    }
+
+
+def encode_cursor(photo):
+    return urlsafe_base64_encode(f'{photo.uploaded_at.isoformat()}|{photo.id}'.encode())
+
+
+def decode_cursor(cursor):
+    """Retorna (uploaded_at, id) do cursor, ou lança ValueError se inválido"""
+    uploaded_at, photo_id = urlsafe_base64_decode(cursor).decode().split('|')
+    return date.fromisoformat(uploaded_at), int(photo_id)
+
+
+def store_image(image):
+    """
+    Valida e grava uma imagem enviada. Retorna (photo, created): a mesma imagem
+    enviada de novo reaproveita a foto já armazenada. Lança UnidentifiedImageError
+    ou OSError se o arquivo não for uma imagem válida.
+    """
+    with timed('storage'):
+        metadata = read_metadata(image)
+        digest = file_sha256(image)
+    existing = Photo.objects.filter(content_hash=digest).first()
+    if existing is not None:
+        return existing, False
+
+    # Grava o arquivo antes do INSERT para medir o storage separado do banco
+    with timed('storage'):
+        name = default_storage.save(photo_name(digest, image.name), image)
+    photo, created = create_photo(name, digest, metadata)
+    # Os derivados ficam prontos em segundo plano; até lá vale o original
+    if created:
+        schedule(photo.id)
+    return photo, created
+
+
+def read_upload(image):
+    return read_metadata(image), file_sha256(image)
+
+
+async def astore_image(image):
+    """
+    store_image para as views assíncronas. Ler e gravar o arquivo roda em uma
+    thread à parte, sem ocupar o event loop nem a thread das views síncronas.
+    """
+    with timed('storage'):
+        metadata, digest = await sync_to_async(read_upload, thread_sensitive=False)(image)
+    existing = await Photo.objects.filter(content_hash=digest).afirst()
+    if existing is not None:
+        return existing, False
+
+    with timed('storage'):
+        name = await sync_to_async(default_storage.save, thread_sensitive=False)(photo_name(digest, image.name), image)
+    photo, created = await sync_to_async(create_photo)(name, digest, metadata)
+    if created:
+        await sync_to_async(schedule)(photo.id)
+    return photo, created
+
+
+def delete_photos(photo_ids):
+    """
+    Apaga as fotos em uma transação e enfileira os arquivos para remoção em
+    segundo plano. Retorna os ids efetivamente apagados.
+    """
+    with transaction.atomic():
+        photos = list(Photo.objects.select_for_update().filter(id__in=photo_ids).only('id', 'image', 'variants'))
+        enqueue([name for photo in photos for name in photo_files(photo)])
+        Photo.objects.filter(id__in=[photo.id for photo in photos]).delete()
+    return [photo.id for photo in photos]
+
+
+def after_cursor(photos, cursor):
+    """Keyset: continua depois da última foto da página anterior usando o índice"""
+    if not cursor:
+        return photos
+    uploaded_at, photo_id = decode_cursor(cursor)
+    return photos.filter(Q(uploaded_at__gt=uploaded_at) | Q(uploaded_at=uploaded_at, id__gt=photo_id))
+
+
+def page_response(page, limit):
+    """`page` tem até limit + 1 fotos; a sobra só indica que há próxima página"""
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return Response({"results": [photo_data(p) for p in page[:limit]], "next": next_cursor})
+
+
+def page_size(value):
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
 
 # Create your views here.
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('photos'), name='dispatch')
+@method_decorator(read_replica, name='get')
 class PhotoListCreateView(APIView):
     def get(self, request):
-        photos = Photo.objects.all()
-        data = [{"id": p.id, "url": p.image.url} for p in photos]
-        return Response(data)
+        photos = Photo.objects.order_by('uploaded_at', 'id')
+
+        # Resposta antiga, sem paginação, mantida para clientes existentes
+        if request.query_params.get('all') in ('1', 'true'):
+            return Response([photo_data(p) for p in photos])
+
+        try:
+            photos = after_cursor(photos, request.query_params.get('cursor'))
+        except (ValueError, UnicodeDecodeError):
+            return Response({"error": INVALID_CURSOR_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = page_size(request.query_params.get('limit'))
+        return page_response(list(photos[:limit + 1]), limit)
     
     def post(self, request):
         image = request.FILES.get('image')
         
         if not image:
             return Response({"error": IMAGE_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
-        photo = Photo.objects.create(image=image)
-        return Response({"id": photo.id, "url": photo.image.url}, status=status.HTTP_201_CREATED)
+
+        try:
+            photo, created = store_image(image)
+        except (UnidentifiedImageError, OSError):
+            return Response({"error": INVALID_IMAGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(photo_data(photo), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
+class PhotoFileView(APIView):
+    def get(self, request, name):
+        storage_name = resolve(name)
+        if storage_name is not None:
+            try:
+                with timed('storage'):
+                    return media_response(request, storage_name)
+            except FileNotFoundError:
+                pass
+        return Response({"error": PHOTO_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+
+
 class PhotoDeleteView(APIView):
     def delete(self, request, photo_id):
-        try:
-            photo = Photo.objects.get(id=photo_id)        
-        except Photo.DoesNotExist:
+        # Os arquivos são removidos em segundo plano, depois do commit
+        if not delete_photos([photo_id]):
             return Response({"error": PHOTO_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Deletar o arquivo físico se existir
-        if photo.image and os.path.isfile(photo.image.path):
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def batch_response(results):
+    if not any("photo" in result for result in results):
+        return Response({"results": results}, status=status.HTTP_400_BAD_REQUEST)
+    created = any(result.get("created") for result in results)
+    return Response({"results": results}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+# Operações em lote: várias fotos em uma requisição
+@method_decorator(csrf_exempt, name='dispatch')
+class PhotoBatchUploadView(APIView):
+    def post(self, request):
+        images = request.FILES.getlist('images')
+
+        if not images:
+            return Response({"error": IMAGES_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if len(images) > MAX_BATCH_SIZE:
+            return Response({"error": BATCH_TOO_LARGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Cada arquivo é independente: um inválido não impede os outros
+        results = []
+        for image in images:
+            filename = image.name
             try:
-                os.remove(photo.image.path)
-            except OSError:
-                # Se não conseguir deletar o arquivo, continue com a exclusão do registro
-                pass
-        
-        photo.delete()
+                photo, created = store_image(image)
+            except (UnidentifiedImageError, OSError):
+                results.append({"filename": filename, "error": INVALID_IMAGE_ERROR})
+                continue
+            results.append({"filename": filename, "created": created, "photo": photo_data(photo)})
+        return batch_response(results)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class PhotoBatchDeleteView(APIView):
+    def post(self, request):
+        photo_ids = request.data.get('ids')
+
+        if not isinstance(photo_ids, list) or not photo_ids:
+            return Response({"error": IDS_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if len(photo_ids) > MAX_BATCH_SIZE:
+            return Response({"error": BATCH_TOO_LARGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            photo_ids = {int(photo_id) for photo_id in photo_ids}
+        except (TypeError, ValueError):
+            return Response({"error": IDS_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        deleted = delete_photos(photo_ids)
+        return Response({"deleted": sorted(deleted), "not_found": sorted(photo_ids - set(deleted))})
+
+
+def upload_data(session):
+    return {"id": str(session.id), "size": session.size, "offset": session.offset}
+
+
+# Upload em partes: cria a sessão, envia as partes com PUT e finaliza
+@method_decorator(csrf_exempt, name='dispatch')
+class UploadSessionCreateView(APIView):
+    def post(self, request):
+        filename = request.data.get('filename')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            size = 0
+
+        if not filename or size <= 0:
+            return Response({"error": UPLOAD_SIZE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if size > settings.PHOTO_UPLOAD_MAX_BYTES:
+            return Response({"error": UPLOAD_TOO_LARGE_ERROR}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        session = UploadSession.objects.create(filename=filename, size=size)
+        return Response(upload_data(session), status=status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class UploadSessionView(APIView):
+    def get(self, request, upload_id):
+        session = UploadSession.objects.filter(id=upload_id).first()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        # O cliente retoma o upload a partir deste offset
+        return Response(upload_data(session))
+
+    def put(self, request, upload_id):
+        match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return Response({"error": CONTENT_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = (int(value) for value in match.groups())
+        # Corpo vazio: o DRF não cria o stream
+        if request.stream is None:
+            return Response({"error": CHUNK_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = UploadSession.objects.filter(id=upload_id).first()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        if end < start or total != session.size or end >= session.size:
+            return Response({"error": CONTENT_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        # A parte reserva a sessão antes de tocar no arquivo, sem travar a linha
+        # enquanto um cliente lento envia os bytes: outra parte no mesmo offset
+        # não trunca nem intercala o .part, nem mistura o hash incremental
+        claimed_at = timezone.now()
+        if not claimable(upload_id, start, claimed_at).update(writing_since=claimed_at):
+            return self.conflict(upload_id, start)
+
+        session.offset = start
+        try:
+            # Lê o corpo direto do stream, sem passar pelos parsers do DRF
+            with timed('storage'):
+                offset = write_chunk(session, start, request.stream, end - start + 1)
+        except BaseException:
+            claimed(upload_id, claimed_at).update(writing_since=None)
+            raise
+
+        if not claimed(upload_id, claimed_at).update(offset=offset, writing_since=None, updated_at=timezone.now()):
+            # Sessão apagada, ou reservada por outra parte depois do prazo
+            return self.conflict(upload_id, start)
+        session.offset = offset
+        return Response(upload_data(session))
+
+    def conflict(self, upload_id, start):
+        session = UploadSession.objects.filter(id=upload_id).first()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        error = UPLOAD_BUSY_ERROR if session.offset == start else OFFSET_MISMATCH_ERROR
+        return Response({"error": error, **upload_data(session)}, status=status.HTTP_409_CONFLICT)
+
+    def delete(self, request, upload_id):
+        session = UploadSession.objects.filter(id=upload_id).first()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        discard(session)
+        session.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class UploadSessionCompleteView(APIView):
+    def post(self, request, upload_id):
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().filter(id=upload_id).first()
+            if session is None:
+                return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+            if session.offset != session.size:
+                return Response(
+                    {"error": UPLOAD_INCOMPLETE_ERROR, **upload_data(session)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            try:
+                photo, created = finalize(session)
+            except (UnidentifiedImageError, OSError):
+                discard(session)
+                session.delete()
+                return Response({"error": INVALID_IMAGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+            session.delete()
+
+        if not created:
+            return Response(photo_data(photo), status=status.HTTP_200_OK)
+        schedule(photo.id)
+        return Response(photo_data(photo), status=status.HTTP_201_CREATED)
+
+
+# Versões assíncronas (API_ASYNC_VIEWS): um upload lento ou grande não prende a
+# thread das views síncronas, e as demais requisições seguem pelo event loop
+async def request_files(request):
+    """Arquivos do multipart; o parser grava os temporários em disco, fora do event loop"""
+    return await sync_to_async(lambda: request.FILES, thread_sensitive=False)()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(cache_response('photos'), name='dispatch')
+@method_decorator(read_replica, name='get')
+class AsyncPhotoListCreateView(AsyncAPIView, PhotoListCreateView):
+    async def get(self, request):
+        photos = Photo.objects.order_by('uploaded_at', 'id')
+
+        if request.query_params.get('all') in ('1', 'true'):
+            return Response([photo_data(p) async for p in photos])
+
+        try:
+            photos = after_cursor(photos, request.query_params.get('cursor'))
+        except (ValueError, UnicodeDecodeError):
+            return Response({"error": INVALID_CURSOR_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = page_size(request.query_params.get('limit'))
+        return page_response([p async for p in photos[:limit + 1]], limit)
+
+    async def post(self, request):
+        image = (await request_files(request)).get('image')
+
+        if not image:
+            return Response({"error": IMAGE_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            photo, created = await astore_image(image)
+        except (UnidentifiedImageError, OSError):
+            return Response({"error": INVALID_IMAGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(photo_data(photo), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPhotoBatchUploadView(AsyncAPIView, PhotoBatchUploadView):
+    async def post(self, request):
+        images = (await request_files(request)).getlist('images')
+
+        if not images:
+            return Response({"error": IMAGES_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        if len(images) > MAX_BATCH_SIZE:
+            return Response({"error": BATCH_TOO_LARGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        for image in images:
+            filename = image.name
+            try:
+                photo, created = await astore_image(image)
+            except (UnidentifiedImageError, OSError):
+                results.append({"filename": filename, "error": INVALID_IMAGE_ERROR})
+                continue
+            results.append({"filename": filename, "created": created, "photo": photo_data(photo)})
+        return batch_response(results)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncUploadSessionView(AsyncAPIView, UploadSessionView):
+    async def get(self, request, upload_id):
+        session = await UploadSession.objects.filter(id=upload_id).afirst()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        return Response(upload_data(session))
+
+    async def put(self, request, upload_id):
+        match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return Response({"error": CONTENT_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = (int(value) for value in match.groups())
+        if request.stream is None:
+            return Response({"error": CHUNK_REQUIRED_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = await UploadSession.objects.filter(id=upload_id).afirst()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        if end < start or total != session.size or end >= session.size:
+            return Response({"error": CONTENT_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        # A mesma reserva da versão síncrona
+        claimed_at = timezone.now()
+        if not await claimable(upload_id, start, claimed_at).aupdate(writing_since=claimed_at):
+            return await self.conflict(upload_id, start)
+
+        session.offset = start
+        try:
+            with timed('storage'):
+                offset = await sync_to_async(write_chunk, thread_sensitive=False)(
+                    session, start, request.stream, end - start + 1,
+                )
+        except BaseException:
+            await claimed(upload_id, claimed_at).aupdate(writing_since=None)
+            raise
+
+        if not await claimed(upload_id, claimed_at).aupdate(offset=offset, writing_since=None, updated_at=timezone.now()):
+            return await self.conflict(upload_id, start)
+        session.offset = offset
+        return Response(upload_data(session))
+
+    async def conflict(self, upload_id, start):
+        session = await UploadSession.objects.filter(id=upload_id).afirst()
+        if session is None:
+            return Response({"error": UPLOAD_NOT_FOUND_ERROR}, status=status.HTTP_404_NOT_FOUND)
+        error = UPLOAD_BUSY_ERROR if session.offset == start else OFFSET_MISMATCH_ERROR
+        return Response({"error": error, **upload_data(session)}, status=status.HTTP_409_CONFLICT)
@@ -0,0 +1,153 @@
+"""
+Fan-out de eventos em tempo real para os clientes conectados.
+
+`InProcessBroker` entrega os eventos apenas aos clientes do próprio processo,
+o que basta com um único worker. Com vários workers, `PostgresBroker` publica
+via NOTIFY e cada processo repassa o que recebe por LISTEN aos seus clientes.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Limite de payload do NOTIFY no Postgres (8000 bytes) com folga
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+
+class Subscription:
+    """Fila de eventos de um cliente, consumida no event loop que a criou"""
+
+    def __init__(self, broker, max_queue):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def put(self, event):
+        if self.queue.full():
+            # Cliente lento: descarta o atraso e pede para ele recarregar tudo
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': 'resync', 'data': {}}
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, max_queue=None):
+        """Registra um cliente; deve ser chamado de dentro do event loop"""
+        subscription = Subscription(self, max_queue or settings.REALTIME_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, data):
+        self.deliver({'type': event_type, 'data': data})
+
+    def deliver(self, event):
+        """Entrega um evento aos clientes deste processo. Seguro entre threads"""
+        event = {**event, 'id': next(self._ids)}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Event loop já encerrado: o cliente saiu sem cancelar a inscrição
+                self.unsubscribe(subscription)
+
+
+class PostgresBroker(InProcessBroker):
+    """Distribui os eventos entre processos usando LISTEN/NOTIFY do Postgres"""
+
+    channel = 'lovelog_events'
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, max_queue=None):
+        self._ensure_listener()
+        return super().subscribe(max_queue)
+
+    def publish(self, event_type, data):
+        payload = json.dumps({'type': event_type, 'data': data}, separators=(',', ':'))
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            # Evento grande demais para o NOTIFY: avisa só que houve mudança e
+            # o cliente busca o estado atualizado pela API
+            payload = json.dumps({'type': event_type, 'data': {'truncated': True, **summary(data)}})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='realtime-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        db = settings.DATABASES['default']
+        while True:
+            try:
+                conn = psycopg2.connect(
+                    dbname=db['NAME'], user=db['USER'], password=db['PASSWORD'],
+                    host=db['HOST'], port=db['PORT'],
+                )
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.deliver(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                logger.exception('Conexão LISTEN perdida, reconectando')
+                threading.Event().wait(1)
+
+
+def summary(data):
+    """Campos pequenos que identificam o recurso alterado em um evento"""
+    return {key: data[key] for key in ('id', 'list_id', 'version') if key in data}
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.REALTIME_BROKER)()
+        return _broker
+
+
+def publish(event_type, data):
+    """Publica um evento depois que a transação atual for confirmada"""
+    transaction.on_commit(lambda: get_broker().publish(event_type, data))
@@ -0,0 +1,19 @@
+from django.test import TestCase
+
+
+class EventsTests(TestCase):
+    def test_wsgi_requests_are_refused(self):
+        # Sob o WSGI o gerador infinito nunca seria enviado
+        response = self.client.get('/api/events/')
+
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('ASGI', response.json()['error'])
+
+    async def test_stream_under_asgi(self):
+        response = await self.async_client.get('/api/events/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+        await stream.aclose()
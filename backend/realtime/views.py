@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .broker import get_broker
+
+ASGI_REQUIRED_ERROR = "Events are only available when served over ASGI (SERVER_MODE=asgi)."
+
+
+def format_event(event):
+    """Serializa um evento no formato text/event-stream"""
+    data = json.dumps(event['data'], separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+async def event_stream():
+    subscription = get_broker().subscribe()
+    try:
+        # Comentário inicial para o proxy liberar os cabeçalhos imediatamente
+        yield ': connected\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), settings.REALTIME_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Mantém a conexão viva através de proxies com timeout de inatividade
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        subscription.close()
+
+
+# Server-Sent Events com as mudanças do board e das listas. Só funciona
+# servido pelo ASGI: no WSGI o Django consome o gerador assíncrono inteiro
+# antes de responder, e como ele não termina nada seria enviado.
+async def events(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": ASGI_REQUIRED_ERROR}, status=501)
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
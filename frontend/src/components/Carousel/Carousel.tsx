@@ -11,29 +11,34 @@ import 'swiper/css/navigation';
 import 'swiper/css/pagination';
 
 export default function Carousel() {
-  const { photos, isLoading, error, uploadPhoto, deletePhoto } = usePhotos();
+  const { photos, isLoading, error, uploadPhoto, uploadPhotos, deletePhoto, loadMorePhotos } = usePhotos();
   const fileInputRef = useRef<HTMLInputElement>(null);
   const [uploading, setUploading] = useState(false);
   
   const handleFileUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
-    const file = event.target.files?.[0];
-    if (!file) return;
+    const files = Array.from(event.target.files ?? []);
+    if (files.length === 0) return;
 
     // Validar tipo de arquivo
-    if (!file.type.startsWith('image/')) {
+    if (files.some((file) => !file.type.startsWith('image/'))) {
       alert('Por favor, selecione apenas arquivos de imagem.');
       return;
     }
 
     // Validar tamanho (5MB máximo)
-    if (file.size > 5 * 1024 * 1024) {
+    if (files.some((file) => file.size > 5 * 1024 * 1024)) {
       alert('O arquivo deve ter no máximo 5MB.');
       return;
     }
 
     setUploading(true);
     try {
-      await uploadPhoto(file);
+      // Uma foto vai pelo upload retomável; várias, em um único lote
+      if (files.length === 1) {
+        await uploadPhoto(files[0]);
+      } else {
+        await uploadPhotos(files);
+      }
       // Limpar input
       if (fileInputRef.current) {
         fileInputRef.current.value = '';
@@ -77,6 +82,7 @@ export default function Carousel() {
           ref={fileInputRef}
           type="file"
           accept="image/*"
+          multiple
           onChange={handleFileUpload}
           className="hidden"
         />
@@ -102,14 +108,25 @@ export default function Carousel() {
           spaceBetween={20}
           slidesPerView={1}
           className="rounded-2xl overflow-hidden"
+          // Busca a próxima página quando faltam poucos slides para o fim
+          onSlideChange={(swiper) => {
+            if (swiper.activeIndex >= photos.length - 3) loadMorePhotos();
+          }}
         >
           {photos.map((photo, index) => (
-            <SwiperSlide key={photo.id || index} className="relative">
-              <img
-                src={photo.url}
-                alt={`Foto ${index + 1}`}
-                className="w-full h-[60vh] object-cover"
-              />
+            <SwiperSlide key={photo.id || index} className="relative" style={{ backgroundColor: photo.color || undefined }}>
+              <picture>
+                {/* Derivados responsivos; o navegador escolhe formato e largura */}
+                {Object.entries(photo.srcset ?? {}).map(([type, srcSet]) => (
+                  <source key={type} type={type} srcSet={srcSet} sizes="(max-width: 896px) 100vw, 896px" />
+                ))}
+                <img
+                  src={photo.url}
+                  alt={`Foto ${index + 1}`}
+                  loading={index === 0 ? 'eager' : 'lazy'}
+                  className="w-full h-[60vh] object-cover"
+                />
+              </picture>
               {/* Botão de excluir */}
               <button
                 onClick={() => handleDeletePhoto(photo.id)}
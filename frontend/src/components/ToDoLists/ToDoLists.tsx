@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useRef, useEffect } from 'react';
-import { PlusCircle, Trash2, Edit2, Check, X, Heart, Calendar, CheckCircle } from 'lucide-react';
+import { PlusCircle, Trash2, Edit2, Check, X, Heart, Calendar, CheckCircle, ChevronUp, ChevronDown } from 'lucide-react';
 import { TodoList, useLists } from '@/hooks/useLists';
 import { TodoItem, useItems } from '@/hooks/useItems';
 
@@ -9,7 +9,7 @@ import { TodoItem, useItems } from '@/hooks/useItems';
 export default function ToDoLists() {
   const { lists, isLoading, error, createList, updateList, deleteList } = useLists();
   const [activeListId, setActiveListId] = useState('');
-  const { items: activeListItems, createItem, updateItem, deleteItem } = useItems(activeListId);
+  const { items: activeListItems, createItem, updateItem, toggleItem, deleteItem, moveItem, bulkItems } = useItems(activeListId);
   const [isCreatingList, setIsCreatingList] = useState(false);
   const [newListTitle, setNewListTitle] = useState('');
   const [newTaskText, setNewTaskText] = useState('');
@@ -92,7 +92,7 @@ export default function ToDoLists() {
 
   const handleToggleTaskComplete = async (taskId: string, item: TodoItem) => {
     try {
-      await updateItem(taskId, {name: item.name, completed: !item.completed});
+      await toggleItem(taskId, !item.completed);
     } catch (err) {
       console.error("Erro ao atualizar task:", err);
     }
@@ -107,6 +107,29 @@ export default function ToDoLists() {
     }
   };
 
+  // Sobe ou desce uma tarefa uma posição
+  const handleMoveTask = async (index: number, direction: -1 | 1) => {
+    const task = activeListItems[index];
+    const neighbour = activeListItems[index + direction];
+    if (!task || !neighbour) return;
+    try {
+      await moveItem(task.id, direction < 0 ? { before: neighbour.id } : { after: neighbour.id });
+    } catch (err) {
+      console.error("Erro ao mover task:", err);
+    }
+  };
+
+  // Remove todas as tarefas concluídas em uma única requisição
+  const handleClearCompleted = async () => {
+    const completed = activeListItems.filter(item => item.completed);
+    if (completed.length === 0) return;
+    try {
+      await bulkItems(completed.map(item => ({ op: 'delete' as const, id: item.id })));
+    } catch (err) {
+      console.error("Erro ao limpar tarefas concluídas:", err);
+    }
+  };
+
   const startEditingTask = (taskId: string, name: string, completed: boolean) => {
     setEditingTask({ taskId, name: name, completed: completed });
   };
@@ -139,14 +162,12 @@ export default function ToDoLists() {
   };
 
   // Função para obter contagem de items por lista (para exibir na sidebar)
-  const getListItemCount = (listId: string) => {
-    // Como não temos acesso aos items de todas as listas simultaneamente,
-    // vamos usar uma aproximação baseada no activeListItems quando a lista está ativa
-    if (listId === activeListId) {
+  const getListItemCount = (list: TodoList) => {
+    // A lista ativa usa os itens carregados; as demais, a contagem do resumo
+    if (list.id === activeListId) {
       return activeListItems ? activeListItems.length : 0;
     }
-    // Para outras listas, poderia implementar um cache ou buscar do backend
-    return 0;
+    return list.item_count ?? 0;
   };
 
   // Renderização do componente
@@ -198,7 +219,7 @@ export default function ToDoLists() {
           {isLoading && <p className="text-gray-500">Carregando listas...</p>}
           {error && <p className="text-red-500">Erro: {error}</p>}
           {lists.map(list => {
-            const itemCount = getListItemCount(list.id);
+            const itemCount = getListItemCount(list);
 
             return (
               <div
@@ -208,11 +229,9 @@ export default function ToDoLists() {
               >
                 <div className="flex items-center">
                   <span className="font-medium">{list.name}</span>
-                  {activeListId === list.id && (
-                    <span className="ml-2 text-xs text-gray-500">
-                      ({itemCount})
-                    </span>
-                  )}
+                  <span className="ml-2 text-xs text-gray-500">
+                    ({itemCount})
+                  </span>
                 </div>
                 <button
                   className="text-red-500 opacity-50 hover:opacity-100"
@@ -238,8 +257,16 @@ export default function ToDoLists() {
                 <Calendar className="text-blue-500 mr-2" size={20} />
                 {activeList.name}
               </h2>
-              <div className="text-sm text-gray-500">
+              <div className="flex items-center gap-3 text-sm text-gray-500">
                 {getListStats(activeListItems).completed}/{getListStats(activeListItems).total} concluídas
+                {getListStats(activeListItems).completed > 0 && (
+                  <button
+                    className="text-red-500 hover:underline"
+                    onClick={handleClearCompleted}
+                  >
+                    Limpar concluídas
+                  </button>
+                )}
               </div>
             </div>
 
@@ -268,7 +295,7 @@ export default function ToDoLists() {
                     Nenhuma tarefa adicionada. Comece criando uma!
                   </div>
                 ) : (
-                  activeListItems.map((task) => {
+                  activeListItems.map((task, index) => {
                     const isEditing = editingTask.taskId === task.id;
 
                     return (
@@ -318,6 +345,20 @@ export default function ToDoLists() {
                             </>
                           ) : (
                             <>
+                              <button
+                                className="text-gray-400 disabled:opacity-30"
+                                disabled={index === 0}
+                                onClick={() => handleMoveTask(index, -1)}
+                              >
+                                <ChevronUp size={18} />
+                              </button>
+                              <button
+                                className="text-gray-400 disabled:opacity-30"
+                                disabled={index === activeListItems.length - 1}
+                                onClick={() => handleMoveTask(index, 1)}
+                              >
+                                <ChevronDown size={18} />
+                              </button>
                               <button
                                 className="text-blue-500"
                                 onClick={() => startEditingTask(task.id, task.name, task.completed)}
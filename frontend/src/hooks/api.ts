@@ -17,11 +17,18 @@ export async function createData(url: string, data: any) {
     return res.json();
 }
 
-export async function updateData(url: string, content: Record<string, any>) {
+export class HttpError extends Error {
+    constructor(message: string, public status: number) {
+        super(message);
+    }
+}
+
+export async function updateData(url: string, content: Record<string, any>, headers: Record<string, string> = {}) {
     const res = await fetch(`${API_URL}/${url}`, {
         method: "PUT",
         headers: {
             "Content-Type": "application/json",
+            ...headers,
         },
         body: JSON.stringify(content),
         cache: "no-store"
@@ -29,14 +36,53 @@ export async function updateData(url: string, content: Record<string, any>) {
 
     if (!res.ok) {
         const text = await res.text();
-        throw new Error(`Erro ao salvar em ${url}: ${res.status} - ${text}`);
+        throw new HttpError(`Erro ao salvar em ${url}: ${res.status} - ${text}`, res.status);
     }
 
     return res.json();
 }
 
-export async function fetchData(url: string) {
-    const res = await fetch(`${API_URL}/${url}/`, {
+export async function patchData(url: string, operations: unknown[], headers: Record<string, string> = {}) {
+    const res = await fetch(`${API_URL}/${url}`, {
+        method: "PATCH",
+        headers: {
+            "Content-Type": "application/json-patch+json",
+            ...headers,
+        },
+        body: JSON.stringify(operations),
+        cache: "no-store"
+    });
+
+    if (!res.ok) {
+        const text = await res.text();
+        throw new HttpError(`Erro ao salvar em ${url}: ${res.status} - ${text}`, res.status);
+    }
+
+    return res.json();
+}
+
+// Atualização parcial de um recurso: só os campos enviados são alterados
+export async function patchFields(url: string, fields: Record<string, any>) {
+    const res = await fetch(`${API_URL}/${url}`, {
+        method: "PATCH",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify(fields),
+        cache: "no-store"
+    });
+
+    if (!res.ok) {
+        const text = await res.text();
+        throw new HttpError(`Erro ao salvar em ${url}: ${res.status} - ${text}`, res.status);
+    }
+
+    return res.json();
+}
+
+export async function fetchData(url: string, params?: Record<string, string>) {
+    const query = params ? `?${new URLSearchParams(params)}` : '';
+    const res = await fetch(`${API_URL}/${url}/${query}`, {
         method: 'GET',
         headers: {
             "Content-Type": "application/json",
@@ -44,7 +90,7 @@ export async function fetchData(url: string) {
         cache: "no-store"
     });
 
-    if (!res.ok) throw new Error(`Erro ao buscar em ${url}`);
+    if (!res.ok) throw new HttpError(`Erro ao buscar em ${url}`, res.status);
     return res.json();
 }
 
@@ -77,3 +123,93 @@ export async function uploadFile(url: string, file: File) {
 
     return res.json();
 }
+
+export async function uploadFiles(url: string, files: File[]) {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('images', file));
+
+    const res = await fetch(`${API_URL}/${url}`, {
+        method: 'POST',
+        body: formData,
+        cache: "no-store",
+    });
+
+    if (!res.ok) {
+        const text = await res.text();
+        throw new Error(`Erro ao fazer upload em ${url}: ${res.status} - ${text}`);
+    }
+
+    return res.json();
+}
+
+// Upload em partes: se a conexão cair, retoma de onde o servidor parou
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const UPLOAD_RETRIES = 3;
+
+export async function uploadFileResumable(url: string, file: File) {
+    const session = await createData(url, { filename: file.name, size: file.size });
+    let offset = session.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+        const end = Math.min(offset + UPLOAD_CHUNK_SIZE, file.size);
+        try {
+            const res = await fetch(`${API_URL}/${url}${session.id}/`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                    'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+                },
+                body: file.slice(offset, end),
+                cache: 'no-store',
+            });
+            // Em 409 o servidor informa o offset correto para continuar
+            if (!res.ok && res.status !== 409) throw new HttpError(`Erro ao enviar parte: ${res.status}`, res.status);
+            offset = (await res.json()).offset;
+            retries = 0;
+        } catch (error) {
+            if (++retries > UPLOAD_RETRIES) throw error;
+            offset = (await fetchData(`${url}${session.id}`)).offset;
+        }
+    }
+
+    return createData(`${url}${session.id}/complete/`, {});
+}
+
+// Eventos em tempo real (Server-Sent Events) compartilhando uma única conexão
+export interface ServerEvent {
+    type: string;
+    data: any;
+}
+
+const EVENT_TYPES = [
+    'board.patch', 'board.replaced',
+    'list.created', 'list.updated', 'list.deleted',
+    'item.created', 'item.updated', 'item.deleted', 'items.reordered',
+    'resync',
+];
+
+const eventHandlers = new Set<(event: ServerEvent) => void>();
+let eventSource: EventSource | null = null;
+
+export function subscribeEvents(handler: (event: ServerEvent) => void) {
+    eventHandlers.add(handler);
+
+    if (!eventSource && typeof EventSource !== 'undefined') {
+        eventSource = new EventSource(`${API_URL}/events/`);
+        for (const type of EVENT_TYPES) {
+            eventSource.addEventListener(type, (message) => {
+                const event = { type, data: JSON.parse((message as MessageEvent).data) };
+                eventHandlers.forEach((h) => h(event));
+            });
+        }
+    }
+
+    return () => {
+        eventHandlers.delete(handler);
+        if (eventHandlers.size === 0 && eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    };
+}
@@ -0,0 +1,88 @@
+// Geração de JSON Patch (RFC 6902) entre duas versões do conteúdo do mural.
+// Compara as chaves de topo e os objetos do canvas posição a posição, o que
+// basta para mover, adicionar ou apagar elementos sem reenviar o mural todo.
+
+export type PatchOperation =
+    | { op: 'add' | 'replace'; path: string; value: unknown }
+    | { op: 'remove'; path: string };
+
+const escapeKey = (key: string) => key.replace(/~/g, '~0').replace(/\//g, '~1');
+
+const sameValue = (a: unknown, b: unknown) => JSON.stringify(a) === JSON.stringify(b);
+
+export function diffBoard(previous: Record<string, any>, next: Record<string, any>): PatchOperation[] {
+    const ops: PatchOperation[] = [];
+
+    for (const key of Object.keys(previous)) {
+        if (!(key in next)) {
+            ops.push({ op: 'remove', path: `/${escapeKey(key)}` });
+        }
+    }
+
+    for (const key of Object.keys(next)) {
+        const path = `/${escapeKey(key)}`;
+        if (!(key in previous)) {
+            ops.push({ op: 'add', path, value: next[key] });
+        } else if (key === 'objects' && Array.isArray(previous[key]) && Array.isArray(next[key])) {
+            ops.push(...diffObjects(previous[key], next[key], path));
+        } else if (!sameValue(previous[key], next[key])) {
+            ops.push({ op: 'replace', path, value: next[key] });
+        }
+    }
+
+    return ops;
+}
+
+function diffObjects(previous: unknown[], next: unknown[], path: string): PatchOperation[] {
+    const ops: PatchOperation[] = [];
+    const common = Math.min(previous.length, next.length);
+
+    for (let i = 0; i < common; i++) {
+        if (!sameValue(previous[i], next[i])) {
+            ops.push({ op: 'replace', path: `${path}/${i}`, value: next[i] });
+        }
+    }
+    for (let i = common; i < next.length; i++) {
+        ops.push({ op: 'add', path: `${path}/-`, value: next[i] });
+    }
+    // Remove do fim para o início para manter os índices válidos
+    for (let i = previous.length - 1; i >= common; i--) {
+        ops.push({ op: 'remove', path: `${path}/${i}` });
+    }
+
+    return ops;
+}
+
+const unescapeKey = (key: string) => key.replace(/~1/g, '/').replace(/~0/g, '~');
+
+// Aplica um patch recebido de outro cliente sobre uma cópia do conteúdo.
+// Retorna null se houver operação não suportada, e aí o mural é recarregado.
+export function applyBoardPatch(content: Record<string, any>, operations: PatchOperation[]): Record<string, any> | null {
+    const result = JSON.parse(JSON.stringify(content));
+
+    for (const operation of operations) {
+        const keys = operation.path.split('/').slice(1).map(unescapeKey);
+        if (keys.length === 0) return null;
+
+        let parent: any = result;
+        for (const key of keys.slice(0, -1)) {
+            parent = parent?.[Array.isArray(parent) ? Number(key) : key];
+        }
+        if (parent === null || typeof parent !== 'object') return null;
+
+        const last = keys[keys.length - 1];
+        if (Array.isArray(parent)) {
+            const index = last === '-' ? parent.length : Number(last);
+            if (operation.op === 'add') parent.splice(index, 0, operation.value);
+            else if (operation.op === 'replace') parent[index] = operation.value;
+            else if (operation.op === 'remove') parent.splice(index, 1);
+            else return null;
+        } else {
+            if (operation.op === 'add' || operation.op === 'replace') parent[last] = operation.value;
+            else if (operation.op === 'remove') delete parent[last];
+            else return null;
+        }
+    }
+
+    return result;
+}
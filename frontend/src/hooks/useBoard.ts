@@ -2,7 +2,8 @@
 
 import { useEffect, useState, useRef, useCallback } from 'react';
 import { Canvas, PencilBrush, IText, FabricImage, Path } from 'fabric';
-import { fetchData, updateData, deleteData } from '@/hooks/api';
+import { fetchData, updateData, patchData, deleteData, HttpError, subscribeEvents } from '@/hooks/api';
+import { diffBoard, applyBoardPatch } from '@/hooks/boardPatch';
 
 export const useBoard = () => {
     const canvasRef = useRef<HTMLCanvasElement>(null);
@@ -24,11 +25,38 @@ export const useBoard = () => {
         }
     };
 
+    // Último conteúdo confirmado pelo servidor, base para enviar só as diferenças
+    const lastSavedRef = useRef<Record<string, any> | null>(null);
+    // Versão do mural no servidor, enviada como If-Match para não sobrescrever outra aba
+    const versionRef = useRef<number | null>(null);
+
+    const versionHeaders = (): Record<string, string> =>
+        versionRef.current !== null ? { 'If-Match': `"${versionRef.current}"` } : {};
+
     // Função para salvar dados do mural
-    const saveBoard = async (content: JSON) => {
-        console.log('Salvando mural com conteúdo:', content);
+    const saveBoard = async (content: Record<string, any>) => {
+        // Clona para que mutações futuras do canvas não alterem a base do diff
+        const snapshot = JSON.parse(JSON.stringify(content));
         try {
-            return await updateData('board/', { content: content });
+            if (lastSavedRef.current) {
+                const operations = diffBoard(lastSavedRef.current, snapshot);
+                if (operations.length === 0) return null;
+                try {
+                    const response = await patchData('board/', operations, versionHeaders());
+                    lastSavedRef.current = snapshot;
+                    versionRef.current = response.version;
+                    return response;
+                } catch (error) {
+                    // Outra aba salvou antes: não sobrescreve o trabalho dela
+                    if (error instanceof HttpError && error.status === 412) throw error;
+                    // Servidor divergiu da nossa base: reenvia o mural completo
+                    console.warn('Patch do mural rejeitado, enviando conteúdo completo:', error);
+                }
+            }
+            const response = await updateData('board/', { content: snapshot }, versionHeaders());
+            lastSavedRef.current = snapshot;
+            versionRef.current = response.version;
+            return response;
         } catch (error) {
             console.error('Erro ao salvar mural:', error);
             throw error;
@@ -54,6 +82,7 @@ export const useBoard = () => {
         }
 
         debounceRef.current = setTimeout(async () => {
+            debounceRef.current = null;
             if (canvas && !saving) {
                 try {
                     setSaving(true);
@@ -62,7 +91,9 @@ export const useBoard = () => {
                     console.log('Auto-save realizado com sucesso');
                 } catch (err) {
                     console.error('Erro no auto-save:', err);
-                    setError('Erro ao salvar automaticamente. Tente salvar manualmente.');
+                    setError(err instanceof HttpError && err.status === 412
+                        ? 'O mural foi alterado em outra aba. Recarregue a página para ver a versão mais recente.'
+                        : 'Erro ao salvar automaticamente. Tente salvar manualmente.');
                 } finally {
                     setSaving(false);
                 }
@@ -126,6 +157,7 @@ export const useBoard = () => {
                 setLoading(true);
                 const response = await fetchBoard();
                 console.log('Dados do mural carregados:', response);
+                versionRef.current = response?.version ?? null;
 
                 if (response && response.content) {
                     const boardContent = typeof response.content === 'string'
@@ -133,6 +165,7 @@ export const useBoard = () => {
                         : response.content;
 
                     await fabricCanvas.loadFromJSON(boardContent);
+                    lastSavedRef.current = fabricCanvas.toJSON();
                     console.log('Mural carregado com sucesso');
                 }
             } catch (err) {
@@ -222,6 +255,8 @@ export const useBoard = () => {
             canvas.renderAll();
             try {
                 await deleteBoard();
+                lastSavedRef.current = null;
+                versionRef.current = null;
                 console.log('Mural limpo no servidor');
             } catch (err) {
                 console.error('Erro ao limpar mural no servidor:', err);
@@ -305,6 +340,32 @@ export const useBoard = () => {
         }
     };
 
+    // Recebe as edições feitas em outro dispositivo enquanto não há alterações locais pendentes
+    useEffect(() => {
+        if (!canvas) return;
+
+        return subscribeEvents(async ({ type, data }) => {
+            if (!type.startsWith('board.') && type !== 'resync') return;
+            if (versionRef.current !== null && data.version <= versionRef.current) return;
+            if (debounceRef.current || saving) return;
+
+            let content: Record<string, any> | null = null;
+            if (type === 'board.patch' && lastSavedRef.current && data.version === (versionRef.current ?? 0) + 1) {
+                content = applyBoardPatch(lastSavedRef.current, data.patch);
+            }
+            if (!content) {
+                const response = await fetchBoard();
+                content = response.content;
+                data = { version: response.version };
+            }
+
+            await canvas.loadFromJSON(content);
+            canvas.renderAll();
+            lastSavedRef.current = canvas.toJSON();
+            versionRef.current = data.version;
+        });
+    }, [canvas, saving]);
+
     // Auto-salvar quando houver mudanças
     useEffect(() => {
         if (!canvas) return;
@@ -1,10 +1,35 @@
-import { useEffect, useState, useCallback } from 'react';
-import { fetchData, createData, updateData, deleteData } from '@/hooks/api';
+import { useEffect, useState, useCallback, useRef } from 'react';
+import { fetchData, createData, updateData, patchFields, deleteData, subscribeEvents, HttpError } from '@/hooks/api';
 
 export interface TodoItem {
     id: string;
     name: string;
     completed: boolean;
+    // Chave fracionária: a ordem da lista é a ordem lexicográfica das posições
+    position?: string;
+}
+
+const byPosition = (a: TodoItem, b: TodoItem) =>
+    (a.position ?? '') < (b.position ?? '') ? -1 : (a.position ?? '') > (b.position ?? '') ? 1 : 0;
+
+export type BulkOperation =
+    | { op: 'create'; name: string; completed?: boolean }
+    | { op: 'update'; id: string; name?: string; completed?: boolean }
+    | { op: 'delete'; id: string }
+    | { op: 'move'; id: string; after?: string; before?: string };
+
+interface Changes {
+    items: (TodoItem & { list_id: string })[];
+    deleted: { lists: string[]; items: { id: string; list_id: string }[] };
+    cursor: string;
+}
+
+interface BulkResult {
+    op: BulkOperation['op'];
+    status: number;
+    id?: string;
+    item?: TodoItem;
+    error?: string;
 }
 
 export function useItems(listId: string) {
@@ -26,6 +51,34 @@ export function useItems(listId: string) {
         }
     }, [listId]);
 
+    // Sincroniza só o que mudou desde a última consulta; sem cursor (ou com um
+    // cursor expirado) busca todos os itens da lista
+    const cursor = useRef<string | null>(null);
+    const syncItems = useCallback(async () => {
+        if (!listId) return;
+        const full = !cursor.current;
+        const params: Record<string, string> = { list: listId };
+        if (cursor.current) params.since = cursor.current;
+        try {
+            const changes: Changes = await fetchData('lists/changes', params);
+            cursor.current = changes.cursor;
+            const removed = new Set(changes.deleted.items.map((i) => String(i.id)));
+            const changed = new Map(changes.items.map(({ id, name, completed, position }) =>
+                [String(id), { id, name, completed, position }]
+            ));
+            setItems((prev) => {
+                const kept = full ? [] : prev.filter((i) => !changed.has(String(i.id)));
+                return [...kept, ...changed.values()].filter((i) => !removed.has(String(i.id))).sort(byPosition);
+            });
+        } catch (err) {
+            if (err instanceof HttpError && err.status === 410 && cursor.current) {
+                cursor.current = null;
+                return syncItems();
+            }
+            setError(err instanceof Error ? err.message : 'Erro ao sincronizar itens');
+        }
+    }, [listId]);
+
     const getItem = useCallback(async (itemId: string) => {
         if (!listId || !itemId) return;
         setIsLoading(true);
@@ -72,6 +125,19 @@ export function useItems(listId: string) {
         }
     }, [listId]);
 
+    // Marca ou desmarca como concluído alterando só essa coluna
+    const toggleItem = useCallback(async (itemId: string, completed: boolean) => {
+        if (!listId || !itemId) return;
+        try {
+            const updatedItem = await patchFields(`lists/${listId}/items/${itemId}/`, { completed });
+            setItems((prev) => prev.map((i) => (i.id === itemId ? updatedItem : i)));
+            return updatedItem;
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Erro ao atualizar item');
+            return null;
+        }
+    }, [listId]);
+
     const deleteItem = useCallback(async (itemId: string) => {
         console.log("listId: ", listId);
         console.log("itemId: ", itemId);
@@ -87,18 +153,81 @@ export function useItems(listId: string) {
         }
     }, [listId]);
 
+    // Move o item para logo depois de `after` (ou antes de `before`)
+    const moveItem = useCallback(async (itemId: string, neighbours: { after?: string; before?: string }) => {
+        if (!listId || !itemId) return;
+        try {
+            const movedItem = await createData(`lists/${listId}/items/${itemId}/move/`, neighbours);
+            setItems((prev) => prev.map((i) => i.id === itemId ? movedItem : i).sort(byPosition));
+            return movedItem;
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Erro ao mover item');
+            return null;
+        }
+    }, [listId]);
+
+    // Várias operações em uma única requisição (ex.: limpar as concluídas)
+    const bulkItems = useCallback(async (operations: BulkOperation[]) => {
+        if (!listId || operations.length === 0) return [];
+        try {
+            const { results } = await createData(`lists/${listId}/items/bulk/`, { operations });
+            setItems((prev) => {
+                let next = prev;
+                results.forEach((result: BulkResult) => {
+                    if (result.op === 'delete' && result.status === 204) {
+                        next = next.filter((i) => String(i.id) !== String(result.id));
+                    } else if (result.item) {
+                        const item = result.item;
+                        next = next.some((i) => String(i.id) === String(item.id))
+                            ? next.map((i) => String(i.id) === String(item.id) ? item : i)
+                            : [...next, item];
+                    }
+                });
+                return next.sort(byPosition);
+            });
+            return results;
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Erro ao atualizar itens');
+            return [];
+        }
+    }, [listId]);
+
     useEffect(() => {
-        getItems();
-    }, [getItems]);
+        cursor.current = null;
+        syncItems();
+    }, [syncItems]);
+
+    // Mantém os itens sincronizados com as mudanças feitas em outros dispositivos
+    useEffect(() => subscribeEvents(({ type, data }) => {
+        if (type === 'resync' || (type === 'items.reordered' && String(data.list_id) === String(listId))) {
+            syncItems();
+            return;
+        }
+        if (!type.startsWith('item.') || String(data.list_id) !== String(listId)) return;
+
+        const sameId = (id: unknown) => String(id) === String(data.id);
+        if (type === 'item.deleted') {
+            setItems((prev) => prev.filter((i) => !sameId(i.id)));
+        } else {
+            const item = { id: data.id, name: data.name, completed: data.completed, position: data.position };
+            setItems((prev) => (prev.some((i) => sameId(i.id))
+                ? prev.map((i) => sameId(i.id) ? item : i)
+                : [...prev, item]).sort(byPosition));
+        }
+    }), [listId, syncItems]);
 
     return {
         items,
         isLoading,
         error,
         getItems,
+        syncItems,
         getItem,
         createItem,
         updateItem,
+        toggleItem,
         deleteItem,
+        moveItem,
+        bulkItems,
     };
 }
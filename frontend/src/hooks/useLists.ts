@@ -1,25 +1,38 @@
 import { useState, useEffect, useCallback } from 'react';
-import { fetchData, updateData, deleteData, createData } from '@/hooks/api';
+import { fetchData, updateData, deleteData, createData, subscribeEvents } from '@/hooks/api';
 import { TodoItem } from '@/hooks/useItems';
 
 export interface TodoList {
     id: string;
     name: string;
     items: TodoItem[];
+    // Contagens do modo resumo; os itens da lista ativa vêm de useItems
+    item_count?: number;
+    completed_count?: number;
 }
 
+const LISTS_PAGE_SIZE = '100';
+
 export function useLists() {
     const [lists, setLists] = useState<TodoList[]>([]);
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
-    // Busca todas as listas (sem os itens)
+    // Busca todas as listas em modo resumo (só as contagens, sem os itens)
     const getLists = useCallback(async () => {
         setIsLoading(true);
         setError(null);
         try {
-            const data = await fetchData('lists');
-            setLists(data);
+            const all: TodoList[] = [];
+            let cursor: string | null = null;
+            do {
+                const params: Record<string, string> = { summary: '1', limit: LISTS_PAGE_SIZE };
+                if (cursor) params.cursor = cursor;
+                const data = await fetchData('lists', params);
+                all.push(...data.results.map((list: TodoList) => ({ ...list, items: [] })));
+                cursor = data.next;
+            } while (cursor);
+            setLists(all);
         } catch (err) {
             setError(err instanceof Error ? err.message : 'Erro ao buscar listas');
         } finally {
@@ -64,8 +77,9 @@ export function useLists() {
         setError(null);
         try {
             const updatedList = await updateData(`lists/${listId}/`, partialList);
+            // A resposta traz só id e nome; contagens e itens continuam os mesmos
             setLists((prev) =>
-                prev.map((item) => (item.id === listId ? updatedList : item))
+                prev.map((item) => (item.id === listId ? { ...item, name: updatedList.name } : item))
             );
             return updatedList;
         } catch (err) {
@@ -96,6 +110,26 @@ export function useLists() {
         getLists();
     }, [getLists]);
 
+    // Aplica as mudanças feitas em outros dispositivos sem buscar tudo de novo
+    useEffect(() => subscribeEvents(({ type, data }) => {
+        const sameId = (id: unknown) => String(id) === String(data.id);
+        const inList = (list: TodoList) => String(list.id) === String(data.list_id);
+
+        if (type === 'list.created') {
+            setLists((prev) => prev.some((l) => sameId(l.id)) ? prev : [...prev, { ...data, items: [] }]);
+        } else if (type === 'list.updated') {
+            setLists((prev) => prev.map((l) => sameId(l.id) ? { ...l, name: data.name } : l));
+        } else if (type === 'list.deleted') {
+            setLists((prev) => prev.filter((l) => !sameId(l.id)));
+        } else if (type === 'item.created') {
+            setLists((prev) => prev.map((l) => inList(l) ? { ...l, item_count: (l.item_count ?? 0) + 1 } : l));
+        } else if (type === 'item.deleted') {
+            setLists((prev) => prev.map((l) => inList(l) ? { ...l, item_count: Math.max((l.item_count ?? 1) - 1, 0) } : l));
+        } else if (type === 'resync') {
+            getLists();
+        }
+    }), [getLists]);
+
     return {
         lists,
         isLoading,
@@ -1,23 +1,40 @@
 import { useState, useEffect, useCallback } from 'react';
-import { fetchData, deleteData, uploadFile } from './api';
+import { fetchData, createData, deleteData, uploadFileResumable, uploadFiles } from './api';
+
+export interface PhotoVariant {
+    url: string;
+    width: number;
+    height: number;
+    type: string;
+}
 
 interface Image {
     id?: number;
     url: string;
+    width?: number | null;
+    height?: number | null;
+    // Cor dominante, usada como placeholder enquanto a imagem carrega
+    color?: string;
+    variants?: PhotoVariant[];
+    // srcset pronto por tipo de imagem (image/avif, image/webp)
+    srcset?: Record<string, string>;
 }
 
 export function usePhotos() {
     const [photos, setPhotos] = useState<Image[]>([]);
     const [isLoading, setIsLoading] = useState<boolean>(false);
     const [error, setError] = useState<string | null>(null);
+    // Cursor da próxima página de fotos (null quando não há mais)
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
 
-    // Buscar todas as fotos
+    // Buscar a primeira página de fotos
     const getPhotos = useCallback(async () => {
         setIsLoading(true);
         setError(null);
         try {
             const data = await fetchData('photos');
-            setPhotos(data);
+            setPhotos(data.results);
+            setNextCursor(data.next);
         } catch (err) {
             setError(err instanceof Error ? err.message : 'Erro ao buscar fotos');
         } finally {
@@ -25,13 +42,26 @@ export function usePhotos() {
         }
     }, []);
 
+    // Buscar a próxima página, se houver
+    const loadMorePhotos = useCallback(async () => {
+        if (!nextCursor) return;
+        try {
+            const data = await fetchData('photos', { cursor: nextCursor });
+            setPhotos((prev: Image[]) => [...prev, ...data.results]);
+            setNextCursor(data.next);
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Erro ao buscar fotos');
+        }
+    }, [nextCursor]);
+
     // Upload de nova foto
     const uploadPhoto = useCallback(async (file: File) => {
         setIsLoading(true);
         setError(null);
         try {
-            const newPhoto = await uploadFile('photos/', file);
-            setPhotos((prev: Image[]) => [...prev, newPhoto]);
+            const newPhoto = await uploadFileResumable('photos/uploads/', file);
+            // Upload repetido devolve a foto que já existe no álbum
+            setPhotos((prev: Image[]) => prev.some((p) => p.id === newPhoto.id) ? prev : [...prev, newPhoto]);
             return newPhoto;
         } catch (err) {
             setError(err instanceof Error ? err.message : 'Erro ao fazer upload da foto');
@@ -41,6 +71,28 @@ export function usePhotos() {
         }
     }, []);
 
+    // Upload de várias fotos em uma única requisição
+    const uploadPhotos = useCallback(async (files: File[]) => {
+        setIsLoading(true);
+        setError(null);
+        try {
+            const data = await uploadFiles('photos/batch/', files);
+            const uploaded: Image[] = data.results
+                .filter((result: { photo?: Image }) => result.photo)
+                .map((result: { photo: Image }) => result.photo);
+            setPhotos((prev: Image[]) => [
+                ...prev,
+                ...uploaded.filter((photo) => !prev.some((p) => p.id === photo.id)),
+            ]);
+            return uploaded;
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Erro ao fazer upload das fotos');
+            return [];
+        } finally {
+            setIsLoading(false);
+        }
+    }, []);
+
     // Excluir foto
     const deletePhoto = useCallback(async (photoId: number) => {
         setIsLoading(true);
@@ -57,6 +109,22 @@ export function usePhotos() {
         }
     }, []);
 
+    // Excluir várias fotos de uma vez
+    const deletePhotos = useCallback(async (photoIds: number[]) => {
+        setIsLoading(true);
+        setError(null);
+        try {
+            const data = await createData('photos/batch/delete/', { ids: photoIds });
+            setPhotos((prev: Image[]) => prev.filter(item => !data.deleted.includes(item.id)));
+            return true;
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Erro ao excluir fotos');
+            return false;
+        } finally {
+            setIsLoading(false);
+        }
+    }, []);
+
     // Carregar fotos automaticamente
     useEffect(() => {
         getPhotos();
@@ -67,7 +135,11 @@ export function usePhotos() {
         isLoading,
         error,
         getPhotos,
+        loadMorePhotos,
+        hasMorePhotos: nextCursor !== null,
         uploadPhoto,
+        uploadPhotos,
         deletePhoto,
+        deletePhotos,
     };
 }
\ No newline at end of file